@@ -1,7 +1,13 @@
+import contextvars
+import hashlib
 import importlib
 import os
+import re
 import sys
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError, wait as futures_wait
 
 # Ensure project root is in path so `knowledge` package can be imported
 _api_dir = os.path.dirname(os.path.abspath(__file__))
@@ -9,7 +15,7 @@ _project_root = os.path.dirname(_api_dir)
 if _project_root not in sys.path:
     sys.path.insert(0, _project_root)
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, g, request, jsonify, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -21,6 +27,31 @@ from supabase import create_client as create_supabase_client
 # Platform knowledge: use module import so we can reload on each request (edits to data.py apply immediately)
 import knowledge.data as knowledge_data
 from knowledge.data import SECURITY_PROTOCOL  # Imported for clarity; values are read via knowledge_data after reload
+from knowledge.faq import get_faq_table, match_faq
+from knowledge.manual_index import best_section, get_index
+from knowledge import tenants as knowledge_tenants
+
+from domu_ai.breaker import CircuitBreaker, InflightLimiter
+from domu_ai.cassette import Cassette, request_key
+from domu_ai.context_cache import ContextCacheManager, is_cache_error
+from domu_ai.corpus import Corpus
+from domu_ai.digest import DigestStore, match as match_digest, render as render_digest
+from domu_ai.intake import PayloadTooLarge, check_limits, install_json_provider, read_json_body
+from domu_ai.keys import KeyPool, is_quota_error
+from domu_ai.memcheck import top_sites
+from domu_ai.metrics import ClassStats
+from domu_ai.policy import load_policy, select_policy
+from domu_ai.profiling import ProfileHook, profiled
+from domu_ai.retry import RetryBudget, call_with_retry
+from domu_ai.search_rank import compact_results
+from domu_ai.search_store import SearchStore, normalize_terms
+from domu_ai.sessions import new_conversation_id, session_store_from_env, valid_conversation_id
+from domu_ai.shared_cache import SharedCache
+from domu_ai.singleflight import SingleFlight
+from domu_ai import trace as request_trace
+from domu_ai.usage import (
+    USAGE_FIELDS, UsageTotals, add_usage, estimate_cost_usd, prompt_split, tool_output_chars, usage_from_response,
+)
 
 # Load env from .env, .env.local (Vercel injects env vars at runtime)
 load_dotenv()
@@ -28,12 +59,45 @@ load_dotenv(".env.local")
 
 app = Flask(__name__)
 CORS(app)
+install_json_provider(app)  # orjson for jsonify when installed (domu_ai/intake.py)
 
 # Align with Next.js Domu route: multi-turn + tool calls (search) need enough wall time.
 # Inner search can take up to SEARCH_TOOL_TIMEOUT_S; the outer cap must exceed that plus model time.
 MAX_HISTORY_MESSAGES = 20
 GEMINI_WALL_TIMEOUT_S = 55
 SEARCH_TOOL_TIMEOUT_S = 12
+# Fetch a few extra candidates, then dedupe/rerank/trim them locally (domu_ai/search_rank.py).
+SEARCH_CANDIDATES = 8
+SEARCH_RESULTS = 3
+SEARCH_BODY_TOKENS = 100
+# Explicit tool loop: model turns whose function calls are run, and their total tool time. Past either cap the
+# model is told to finish with what it has. All calls of one turn run concurrently on a shared pool.
+MAX_TOOL_ROUNDS = int(os.getenv("DOMU_MAX_TOOL_ROUNDS", "3"))
+MAX_TOOL_TIME_S = float(os.getenv("DOMU_MAX_TOOL_TIME_S", str(2 * SEARCH_TOOL_TIMEOUT_S)))
+TOOL_POOL_WORKERS = int(os.getenv("DOMU_TOOL_WORKERS", "16"))
+FINISH_INSTRUCTION = (
+    "Tool limit reached. Do not call any more tools: finish your answer now with the information you "
+    "already have, and briefly say what you could not look up."
+)
+
+# FAQ fast path: answer fixed manual facts locally (no model call) above this confidence.
+FAQ_CONFIDENCE_THRESHOLD = float(os.getenv("DOMU_FAQ_THRESHOLD", "0.8"))
+FAQ_FAST_PATH_ENABLED = os.getenv("DOMU_FAQ_FAST_PATH", "1") != "0"
+
+# Degraded mode: when the model is saturated or failing, answer from the local manual index instead.
+MAX_INFLIGHT_MODEL_CALLS = int(os.getenv("DOMU_MAX_INFLIGHT", "32"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DOMU_BREAKER_FAILURES", "5"))
+BREAKER_RESET_S = float(os.getenv("DOMU_BREAKER_RESET_S", "30"))
+# Retries for transient upstream errors (domu_ai/retry.py): at most this share of calls may be retried.
+RETRY_BUDGET_RATIO = float(os.getenv("DOMU_RETRY_RATIO", "0.1"))
+RETRY_MAX_ATTEMPTS = int(os.getenv("DOMU_RETRY_MAX_ATTEMPTS", "3"))
+SUPABASE_RETRY_WINDOW_S = 3
+# Chat-log rows waiting for the background writer; beyond this, new rows are dropped (logged).
+CHAT_LOG_QUEUE_MAX = int(os.getenv("DOMU_CHAT_LOG_QUEUE", "256"))
+DEGRADED_NOTICE = (
+    "⚠️ **Limited mode:** I can't reach my AI model right now, so here is the most relevant part of the "
+    "Domu Match manual instead. For anything else, please try again in a few minutes."
+)
 
 
 def _app_gemini_model() -> str:
@@ -42,25 +106,191 @@ def _app_gemini_model() -> str:
     return raw or "gemini-2.5-flash-lite"
 
 
+# --- Request coalescing: identical concurrent searches / prompts run once ---
+
+_search_flight = SingleFlight("search")
+_generate_flight = SingleFlight("generate")
+_class_stats = ClassStats()
+_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_S)
+_model_limiter = InflightLimiter(MAX_INFLIGHT_MODEL_CALLS)
+_key_pool = KeyPool.from_env()  # GEMINI_API_KEYS and/or GEMINI_API_KEY / GOOGLE_API_KEY
+_retry_budget = RetryBudget(RETRY_BUDGET_RATIO)  # Shared by model and Supabase calls
+load_policy(strict=True)  # A bad DOMU_GENERATION_POLICY fails startup instead of individual requests
+_usage_totals = UsageTotals()
+_profile_hook = ProfileHook.from_env()  # None unless DOMU_PROFILE=1 (then chat() is wrapped)
+_digest_store = DigestStore.from_env()  # Precomputed per-city digests (python -m domu_ai.digest refresh)
+_corpus = Corpus.from_env()  # Curated trusted pages (python -m domu_ai.corpus ingest)
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_POOL_WORKERS, thread_name_prefix="domu-tool")
+# Chat-log inserts (with their retries) run here, off the response path.
+_log_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="domu-log")
+_log_slots = threading.BoundedSemaphore(CHAT_LOG_QUEUE_MAX)
+_session_store = session_store_from_env(MAX_HISTORY_MESSAGES)  # conversation_id -> history (domu_ai/sessions.py)
+# Provider-side cache of the static prompt prefix; None unless DOMU_CONTEXT_CACHE=1 (domu_ai/context_cache.py)
+_context_cache = ContextCacheManager.from_env(lambda key: _key_pool.client(key))
+if os.getenv("DOMU_TRACEMALLOC") == "1" and not tracemalloc.is_tracing():
+    tracemalloc.start(10)  # Per-stage allocations + /debug/memory (noticeable overhead; debugging only)
+
+
+def _normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation so trivially different queries share a key."""
+    return re.sub(r"\s+", " ", (query or "").lower()).strip().rstrip("?!.")
+
+
+def _prompt_version(system_prompt: str) -> str:
+    """Short, stable hash identifying the exact system prompt sent to the model."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:12]
+
+
+# --- Durable search store (SQLite + FTS5 near-duplicate lookup; lazy init) ---
+
+_search_store = None
+_search_store_failed = False
+
+
+def _get_search_store():
+    global _search_store, _search_store_failed
+    if _search_store is None and not _search_store_failed:
+        try:
+            _search_store = SearchStore.from_env()
+        except Exception as e:
+            print("[Domu AI] Search store unavailable:", repr(e))
+        _search_store_failed = _search_store is None
+    return _search_store
+
+
+# --- Cross-worker shared cache (mmap; only when DOMU_SHARED_CACHE_PATH is set) ---
+
+_shared_cache = None
+_shared_cache_failed = False
+
+
+def _get_shared_cache():
+    global _shared_cache, _shared_cache_failed
+    if _shared_cache is None and not _shared_cache_failed:
+        try:
+            _shared_cache = SharedCache.from_env()
+        except Exception as e:
+            print("[Domu AI] Shared cache unavailable:", repr(e))
+        _shared_cache_failed = _shared_cache is None
+    return _shared_cache
+
+
+# --- Search cassette (record/replay raw search results; only when DOMU_SEARCH_CASSETTE is set) ---
+
+_search_cassette = None
+_search_cassette_failed = False
+
+
+def _get_search_cassette():
+    global _search_cassette, _search_cassette_failed
+    if _search_cassette is None and not _search_cassette_failed:
+        try:
+            _search_cassette = Cassette.from_env()
+        except Exception as e:
+            print("[Domu AI] Search cassette unavailable:", repr(e))
+        _search_cassette_failed = _search_cassette is None
+    return _search_cassette
+
+
 # --- search_internet tool (with timeout to avoid hanging) ---
 
 
-def search_internet(query: str) -> dict:
+def search_internet(query: str, timeout_s: float = SEARCH_TOOL_TIMEOUT_S) -> dict:
     """Search the internet for recent information. Use this when you need current events, news, or real-time data."""
+    trace = request_trace.current()
+    if trace is None:
+        return _search_internet(query, None, timeout_s)
+    trace.tool_call()
+    with trace.stage("search"):
+        return _search_internet(query, trace, timeout_s)
+
+
+# Declared explicitly (public types only) instead of being derived from the callable on every request.
+SEARCH_TOOL = types.Tool(function_declarations=[
+    types.FunctionDeclaration(
+        name="search_internet",
+        description=search_internet.__doc__,  # timeout_s is internal, not declared to the model
+        parameters=types.Schema(
+            type=types.Type.OBJECT,
+            properties={"query": types.Schema(type=types.Type.STRING, description="What to search for")},
+            required=["query"],
+        ),
+    )
+])
+
+
+def _search_internet(query: str, trace, timeout_s: float = SEARCH_TOOL_TIMEOUT_S) -> dict:
+    # Lookup order: curated corpus (trusted pages, when recall is strong) -> shared memory (hot, all workers)
+    # -> SQLite store (durable) -> DuckDuckGo. With a search cassette every lookup goes to the cassette, so
+    # record and replay runs see the same results whatever the local caches hold.
+    cassette = _get_search_cassette()
+    corpus = _corpus if cassette is None else None
+    if corpus is not None:
+        try:
+            local = corpus.search(query, limit=SEARCH_RESULTS, body_tokens=SEARCH_BODY_TOKENS)
+            if local:
+                if trace is not None:
+                    trace.bump("search_corpus_hits")
+                return {"results": local}
+        except Exception as e:
+            print("[Domu AI] Corpus lookup failed:", repr(e))
+
+    shared = _get_shared_cache() if cassette is None else None
+    shared_key = " ".join(normalize_terms(query))
+    if shared is not None and shared_key:
+        hot = shared.get_search(shared_key)
+        if hot is not None:
+            if trace is not None:
+                trace.bump("search_shared_hits")
+            return {"results": hot}
+
+    store = _get_search_store() if cassette is None else None
+    if store is not None:
+        try:
+            stored = store.get(query)
+            if stored is not None:
+                if shared is not None and shared_key:
+                    shared.put_search(shared_key, stored)
+                if trace is not None:
+                    trace.bump("search_store_hits")
+                return {"results": stored}
+        except Exception as e:
+            print("[Domu AI] Search store lookup failed:", repr(e))
 
     def _do_search():
-        results = list(DDGS().text(query, max_results=3))
-        return [{"title": r.get("title", ""), "body": r.get("body", ""), "href": r.get("href", "")} for r in results]
+        if cassette is not None:
+            results = cassette.call(
+                "search",
+                request_key(query, SEARCH_CANDIDATES),
+                lambda: list(DDGS().text(query, max_results=SEARCH_CANDIDATES)),
+            )
+        else:
+            results = list(DDGS().text(query, max_results=SEARCH_CANDIDATES))
+        results = compact_results(query, results, limit=SEARCH_RESULTS, body_tokens=SEARCH_BODY_TOKENS)
+        if store is not None:
+            try:
+                store.put(query, results)
+            except Exception as e:
+                print("[Domu AI] Search store write failed:", repr(e))
+        if shared is not None and shared_key and results:
+            shared.put_search(shared_key, results)
+        return results
+
+    if trace is not None:
+        trace.bump("search_misses")
 
+    # No `with` block: leaving it would wait for a hung search and defeat the timeout.
+    ex = ThreadPoolExecutor(max_workers=1)
     try:
-        with ThreadPoolExecutor(max_workers=1) as ex:
-            future = ex.submit(_do_search)
-            results = future.result(timeout=SEARCH_TOOL_TIMEOUT_S)
+        future = ex.submit(_search_flight.do, _normalize_query(query), _do_search)
+        results = future.result(timeout=min(timeout_s, SEARCH_TOOL_TIMEOUT_S))
         return {"results": results}
     except FuturesTimeoutError:
         return {"error": "Search timed out", "results": []}
     except Exception as e:
         return {"error": str(e), "results": []}
+    finally:
+        ex.shutdown(wait=False)
 
 
 # --- Supabase client (lazy init to avoid cold-start overhead) ---
@@ -78,28 +308,136 @@ def _get_supabase():
     return _supabase_client
 
 
-def _save_to_supabase(user_message: str, assistant_reply: str) -> None:
-    """Save chat exchange to Supabase. Fails silently if table missing or config absent."""
+def _insert_chat_log(sb, row: dict) -> None:
+    call_with_retry(
+        lambda attempt: sb.table("domu_ai_chat_log").insert(row).execute(),
+        _retry_budget,
+        deadline=time.monotonic() + SUPABASE_RETRY_WINDOW_S,
+        max_attempts=RETRY_MAX_ATTEMPTS,
+    )
+
+
+def _save_to_supabase(user_message: str, assistant_reply: str, extra: dict = None) -> None:
+    """Save chat exchange to Supabase in the background. Fails silently if table missing or config absent.
+
+    `extra` holds optional columns (token usage, ...). If the insert with them fails (e.g. the
+    migration adding them has not run yet), the plain exchange is still saved. The insert and its
+    retries run on _log_pool, so the response never waits for Supabase; when CHAT_LOG_QUEUE_MAX rows
+    are already waiting, the row is dropped.
+    """
     try:
         sb = _get_supabase()
         if sb is None:
             return
-        sb.table("domu_ai_chat_log").insert(
-            {"user_message": user_message, "assistant_reply": assistant_reply}
-        ).execute()
+        if not _log_slots.acquire(blocking=False):
+            print("[Domu AI] Chat log queue full; dropping a log row")
+            return
+        try:
+            _log_pool.submit(_write_chat_log, sb, {"user_message": user_message, "assistant_reply": assistant_reply},
+                             extra)
+        except Exception:
+            _log_slots.release()
+            raise
     except Exception:
         pass  # Don't block response on Supabase errors
 
 
+def _write_chat_log(sb, row: dict, extra: dict = None) -> None:
+    try:
+        if extra:
+            try:
+                _insert_chat_log(sb, {**row, **extra})
+                return
+            except Exception as e:
+                print("[Domu AI] Chat log insert with extra columns failed, saving without them:", repr(e))
+        _insert_chat_log(sb, row)
+    except Exception:
+        pass
+    finally:
+        _log_slots.release()
+
+
+def _remember_turn(message: str, reply: str) -> None:
+    """Append an answered turn to this request's server-side conversation (if it has one)."""
+    conversation_id = g.get("conversation_id")
+    if conversation_id and _session_store is not None:
+        _session_store.append(
+            conversation_id, [{"role": "user", "text": message}, {"role": "assistant", "text": reply}]
+        )
+
+
 # --- System prompt (SECURITY_PROTOCOL + PLATFORM_MANUAL + learned behavior) ---
 
 
-def get_combined_context() -> str:
+def _knowledge_source_key() -> str:
+    """Identifies the inputs of the compiled prompts: knowledge/data.py and tenant overlays on disk + learned instructions."""
+    st = os.stat(knowledge_data.__file__)
+    learned = os.getenv("DOMU_LEARNED_INSTRUCTIONS", "").strip()
+    inputs = f"{knowledge_tenants.source_key()}|{learned}"
+    return f"{st.st_mtime_ns}:{st.st_size}:{hashlib.sha256(inputs.encode('utf-8')).hexdigest()[:12]}"
+
+
+_local_prompts = (None, None)  # (knowledge source key, {variant: compiled prompt})
+_knowledge_key = None  # Source key that the loaded knowledge.data module was last (re)loaded for
+
+
+def _refresh_knowledge() -> str:
+    """
+    Reload knowledge.data when its sources changed since it was last loaded, and return the current
+    source key. The FAQ fast path and degraded answers read the module directly, so a worker that
+    takes its prompts from the shared cache still reloads it when it adopts a newer version.
+    """
+    global _knowledge_key
+    key = _knowledge_source_key()
+    if _knowledge_key != key:
+        importlib.reload(knowledge_data)
+        _knowledge_key = key
+    return key
+
+
+def get_combined_context(tenant: str = None) -> str:
     """
-    Build system prompt from PLATFORM_MANUAL and learned instructions.
-    Reloads knowledge.data on each call so edits to data.py are picked up immediately.
+    System prompt for this request: the variant compiled for `tenant` (knowledge/tenants), else the
+    default. With a shared cache, workers read the prompts published there; while the shared copy
+    is stale, a worker uses its own build for the current sources (built once per version) and
+    publishes it, so whichever worker notices a change first refreshes the cache for the others.
     """
-    importlib.reload(knowledge_data)
+    global _local_prompts
+    key = _refresh_knowledge()
+    name = tenant or "default"
+    shared = _get_shared_cache()
+    if shared is not None:
+        prompt = shared.get_prompt(key, name)
+        trace = request_trace.current()
+        if trace is not None:
+            trace.flag("prompt_shared", prompt is not None)
+        if prompt is not None:
+            return prompt
+
+    # Rebuild only when the knowledge sources or learned instructions changed.
+    cached_key, prompts = _local_prompts
+    if cached_key != key:
+        prompts = _build_prompts()
+        _local_prompts = (key, prompts)
+        if shared is not None:
+            shared.put_prompts(key, prompts)  # Skipped if another worker published this version meanwhile
+    return prompts.get(name) or prompts["default"]
+
+
+def _build_prompts() -> dict:
+    """
+    Compile the default prompt and one variant per tenant overlay: {"default": ..., tenant id: ...}.
+    Reloads knowledge.data first if data.py changed, so edits are picked up immediately.
+    """
+    _refresh_knowledge()
+    prompts = {"default": _build_combined_context()}
+    for tenant_id, tenant in knowledge_tenants.get_tenants().items():
+        prompts[tenant_id] = _build_combined_context(knowledge_tenants.overlay_section(tenant))
+    return prompts
+
+
+def _build_combined_context(overlay: str = "") -> str:
+    """Build one system prompt from the loaded knowledge.data, an optional tenant overlay and learned instructions."""
     security_protocol = getattr(knowledge_data, "SECURITY_PROTOCOL", "")
     platform_manual = knowledge_data.PLATFORM_MANUAL
 
@@ -108,7 +446,10 @@ def get_combined_context() -> str:
     learned_instructions = os.getenv("DOMU_LEARNED_INSTRUCTIONS", "").strip()
     persona = getattr(knowledge_data, "PERSONA_GUIDELINES", "")
     response_ux = getattr(knowledge_data, "RESPONSE_AND_UX_GUIDELINES", "")
+    overlay_block = f"{overlay}\n\n" if overlay else ""
 
+    # Layout: the static sections first, then what varies (tenant overlay, learned instructions), so
+    # every variant shares the longest possible prefix for provider-side prompt caching.
     return f"""You are Domu Match AI.
 
 SECURITY PROTOCOL (MANDATORY – NEVER BREAK):
@@ -123,11 +464,11 @@ VOICE & PERSONA:
 ANSWER DEPTH, STRUCTURE & SOURCES (MANDATORY):
 {response_ux}
 
-HERE ARE THE DYNAMIC INSTRUCTIONS (LEARNED BEHAVIOR):
-{learned_instructions or "(None yet - use the Manual for how-to questions.)"}
-
 Use the SECURITY PROTOCOL and the Manual to answer questions safely.
-Use the Search Tool only for external info (weather, events, local listings)."""
+Use the Search Tool only for external info (weather, events, local listings).
+
+{overlay_block}HERE ARE THE DYNAMIC INSTRUCTIONS (LEARNED BEHAVIOR):
+{learned_instructions or "(None yet - use the Manual for how-to questions.)"}"""
 
 
 def is_malicious(user_message: str) -> bool:
@@ -171,11 +512,15 @@ def is_malicious(user_message: str) -> bool:
 
 
 def _parse_history(raw_history) -> list:
-    """Normalize client history to [{'role': 'user'|'assistant', 'text': str}, ...]."""
+    """Normalize client history to [{'role': 'user'|'assistant', 'text': str}, ...].
+
+    Only the last MAX_HISTORY_MESSAGES usable entries are kept, so the walk starts at the
+    end and stops once it has them; older entries are never looked at.
+    """
     if not isinstance(raw_history, list):
         return []
     out = []
-    for m in raw_history:
+    for m in reversed(raw_history):
         if not m or not isinstance(m, dict):
             continue
         role = m.get("role")
@@ -186,11 +531,124 @@ def _parse_history(raw_history) -> list:
             out.append({"role": "assistant", "text": text})
         else:
             out.append({"role": "user", "text": text})
+        if len(out) == MAX_HISTORY_MESSAGES:
+            break
+    out.reverse()
     return out
 
 
-def _build_gemini_contents(history: list, current_message: str) -> list:
-    """Build multi-turn contents for Gemini (matches app/api/domu/chat/route.ts)."""
+def _cached_prompt_fields(system_prompt: str):
+    """build() for the context cache: what a cached prefix holds (system prompt + tool declarations)."""
+
+    def build() -> dict:
+        return {
+            "system_instruction": types.Content(parts=[types.Part(text=system_prompt)]),
+            "tools": [SEARCH_TOOL],
+        }
+
+    return build
+
+
+def _call_tool(call, deadline: float) -> dict:
+    """Run one function call; it gets whatever is left of the round's budget when it starts."""
+    remaining_s = deadline - time.monotonic()
+    if remaining_s <= 0:
+        return {"error": "Tool timed out", "results": []}
+    if call.name == "search_internet":
+        args = call.args or {}
+        return search_internet(query=str(args.get("query") or ""), timeout_s=remaining_s)
+    return {"error": f"Unknown tool {call.name}"}
+
+
+def _run_tool_calls(calls, budget_s: float) -> list:
+    """
+    Run one model turn's function calls concurrently; calls still running after budget_s report a timeout.
+    Each call is bounded by the same deadline, so a pool thread is never held much past the budget, and
+    calls still queued when it passes are cancelled instead of starting late.
+    """
+    deadline = time.monotonic() + max(0.0, budget_s)
+    futures = [_tool_pool.submit(contextvars.copy_context().run, _call_tool, call, deadline) for call in calls]
+    done, _ = futures_wait(futures, timeout=max(0.0, budget_s))
+    results = []
+    for future in futures:
+        if future not in done:
+            future.cancel()
+            results.append({"error": "Tool timed out", "results": []})
+            continue
+        try:
+            results.append(future.result())
+        except Exception as e:
+            results.append({"error": str(e), "results": []})
+    return results
+
+
+def _generate_with_tools(client, model: str, contents: list, config):
+    """
+    generate_content with an explicit function-calling loop (the SDK's automatic function calling is off).
+    Every call of a model turn runs concurrently on the shared tool pool. After MAX_TOOL_ROUNDS rounds or
+    MAX_TOOL_TIME_S of tool time, further calls are answered with an error and the model is told to finish.
+    Returns (final response, the function call/response turns added to `contents`, token usage summed over
+    every generate_content call of the loop).
+    """
+    trace = request_trace.current()
+    turn = list(contents)
+    rounds, tool_s = 0, 0.0
+    usage = dict.fromkeys(USAGE_FIELDS, 0)
+    while True:
+        response = client.models.generate_content(model=model, contents=turn, config=config)
+        usage = add_usage(usage, usage_from_response(response))
+        calls = response.function_calls
+        if not calls:
+            break
+        turn.append(response.candidates[0].content)
+        cap = "rounds" if rounds >= MAX_TOOL_ROUNDS else "time" if tool_s >= MAX_TOOL_TIME_S else None
+        if cap is not None:
+            if trace is not None:
+                trace.flag("tool_cap", cap)
+            parts = [types.Part.from_function_response(name=c.name, response={"error": "Tool limit reached"})
+                     for c in calls]
+            turn.append(types.Content(role="user", parts=[*parts, types.Part(text=FINISH_INSTRUCTION)]))
+            if not config.cached_content:  # A cached request can't carry tool_config; the instruction has to do
+                config = config.model_copy(update={"tool_config": types.ToolConfig(
+                    function_calling_config=types.FunctionCallingConfig(mode="NONE"))})
+            response = client.models.generate_content(model=model, contents=turn, config=config)
+            usage = add_usage(usage, usage_from_response(response))
+            break
+        rounds += 1
+        if trace is not None:
+            trace.tool_round()
+        t0 = time.monotonic()
+        results = _run_tool_calls(calls, MAX_TOOL_TIME_S - tool_s)
+        tool_s += time.monotonic() - t0
+        turn.append(types.Content(role="user", parts=[
+            types.Part.from_function_response(name=c.name, response=r) for c, r in zip(calls, results)
+        ]))
+    return response, turn[len(contents):], usage
+
+
+def _local_digest(message: str):
+    """Precomputed city digest (domu_ai/digest.py) for a local question, or None."""
+    if _digest_store is None:
+        return None
+    found = match_digest(message)
+    if found is None:
+        return None
+    city_id, topics = found
+    try:
+        entry = _digest_store.get(city_id)
+    except Exception as e:
+        print("[Domu AI] Digest unavailable:", repr(e))
+        return None
+    if entry is None or not any(entry["sections"].get(topic) for topic in topics):
+        return None
+    trace = request_trace.current()
+    if trace is not None:
+        trace.flag("digest", city_id)
+    return render_digest(city_id, entry, topics)
+
+
+def _build_gemini_contents(history: list, current_message: str, context: str = None) -> list:
+    """Build multi-turn contents for Gemini (matches app/api/domu/chat/route.ts); `context` precedes the message."""
     trimmed = history[-MAX_HISTORY_MESSAGES:]
     contents = []
     for entry in trimmed:
@@ -198,10 +656,134 @@ def _build_gemini_contents(history: list, current_message: str) -> list:
         contents.append(
             types.Content(role=gemini_role, parts=[types.Part(text=entry["text"])])
         )
-    contents.append(types.Content(role="user", parts=[types.Part(text=current_message)]))
+    parts = [types.Part(text=context)] if context else []
+    contents.append(types.Content(role="user", parts=[*parts, types.Part(text=current_message)]))
     return contents
 
 
+def _is_upstream_unavailable(raw: str) -> bool:
+    """Timeouts, quota and 5xx errors: the model is saturated or down (as opposed to a bad request)."""
+    lowered = raw.lower()
+    return any(s in lowered for s in ("deadline", "timeout", "timed out", "quota", "overloaded")) or any(
+        s in raw for s in ("429", "500", "502", "503", "504", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "INTERNAL")
+    )
+
+
+def _degraded_response(message: str, reason: str, request_class: str = "degraded"):
+    """Answer from the best-matching manual section, or None if the manual has nothing relevant."""
+    _refresh_knowledge()
+    hit = best_section(message, knowledge_data.PLATFORM_MANUAL)
+    if hit is None:
+        return None
+    title, body, score = hit
+    reply = f"{DEGRADED_NOTICE}\n\n### {title.title()}\n{body}"
+    _class_stats.record("degraded", 0.0)
+    print(f"[Domu AI] Degraded answer ({reason}): section '{title}' (score {score})")
+    _save_to_supabase(user_message=message, assistant_reply=reply, extra=_perf_fields("degraded", request_class))
+    _remember_turn(message, reply)
+    return jsonify({"reply": reply, "degraded": True}), 200
+
+
+def _perf_fields(status: str, request_class: str, **fields) -> dict:
+    """Performance columns for the chat log row (stage latencies, cache flags, ...) of this request."""
+    trace = request_trace.current()
+    row = trace.as_row() if trace is not None else {}
+    return {**row, "status": status, "request_class": request_class, **fields}
+
+
+# --- Process lifecycle (used by the self-hosted server, see gunicorn.conf.py) ---
+
+
+def build_prompt_artifact() -> str:
+    """
+    Compile the system prompts (default + per tenant) once, keep them in this process and publish them
+    to the shared cache (if configured). Called in the master before fork, so every worker starts with
+    the compiled prompts even without a shared cache.
+    """
+    global _local_prompts
+    key = _refresh_knowledge()
+    prompts = _build_prompts()
+    _local_prompts = (key, prompts)
+    shared = _get_shared_cache()
+    if shared is not None:
+        shared.put_prompts(key, prompts)
+    return prompts["default"]
+
+
+def init_worker() -> None:
+    """
+    Reset per-process clients after fork and warm them before the first request.
+    HTTP clients, SQLite connections and flock-based roles must not be shared with the parent.
+    """
+    global _supabase_client, _key_pool, _search_store, _search_store_failed, _shared_cache, _shared_cache_failed
+    global _context_cache, _tool_pool, _log_pool, _log_slots
+    _supabase_client = None
+    _key_pool = KeyPool.from_env()
+    _context_cache = ContextCacheManager.from_env(lambda key: _key_pool.client(key))
+    _tool_pool = ThreadPoolExecutor(max_workers=TOOL_POOL_WORKERS, thread_name_prefix="domu-tool")
+    _log_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="domu-log")
+    _log_slots = threading.BoundedSemaphore(CHAT_LOG_QUEUE_MAX)
+    _search_store, _search_store_failed = None, False
+    _shared_cache, _shared_cache_failed = None, False
+    warm_dependencies()
+
+
+# --- Warm-up / readiness ---
+
+# Dependencies without which /chat cannot answer normally; the rest are optional accelerators.
+_CRITICAL_DEPENDENCIES = ("knowledge", "model_clients")
+_first_init_ms = {}
+
+
+def _warm_model_clients(deep: bool) -> dict:
+    if not len(_key_pool):
+        raise RuntimeError("no GEMINI_API_KEYS / GEMINI_API_KEY / GOOGLE_API_KEY configured")
+    _key_pool.warm()
+    if deep:
+        # Opens the HTTP/TLS connection of every client with a free metadata call.
+        for key in _key_pool.keys():
+            _key_pool.client(key).models.get(model=_app_gemini_model())
+    return {"keys": len(_key_pool)}
+
+
+def warm_dependencies(deep: bool = False) -> dict:
+    """
+    Initialize every lazily created component and report per-dependency readiness.
+    Safe to call repeatedly: already initialized components return almost immediately.
+    """
+    steps = {
+        "knowledge": lambda: {
+            "prompt_chars": len(get_combined_context()),
+            "tenants": len(knowledge_tenants.get_tenants()),
+            "max_tenant_prompt_chars": max(
+                (len(get_combined_context(t)) for t in knowledge_tenants.get_tenants()), default=None
+            ),
+        },
+        "faq": lambda: {"entries": len(get_faq_table(knowledge_data.PLATFORM_MANUAL))},
+        "manual_index": lambda: {"sections": len(get_index(knowledge_data.PLATFORM_MANUAL)["sections"])},
+        "model_clients": lambda: _warm_model_clients(deep),
+        "supabase": lambda: {"configured": _get_supabase() is not None},
+        "search_store": lambda: {"configured": _get_search_store() is not None},
+        "shared_cache": lambda: {"configured": _get_shared_cache() is not None},
+    }
+    report = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            entry = {"ready": True, **step()}
+        except Exception as e:
+            entry = {"ready": False, "error": repr(e)}
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        if entry.get("configured") is False:
+            entry["ready"] = False
+        if entry["ready"]:
+            _first_init_ms.setdefault(name, elapsed_ms)
+        entry["init_ms"] = _first_init_ms.get(name)
+        entry["this_call_ms"] = elapsed_ms
+        report[name] = entry
+    return report
+
+
 # --- Routes ---
 
 
@@ -215,30 +797,159 @@ def index():
     return "Domu AI is alive on Vercel!"
 
 
+@app.route("/healthz")
+@app.route("/api/domu/healthz")
+def healthz():
+    """Liveness: the process is up and serving. Touches no dependencies."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+@app.route("/api/domu/readyz")
+def readyz():
+    """Readiness: warms every lazy component and reports per-dependency status and init times."""
+    report = warm_dependencies()
+    ready = all(report[name]["ready"] for name in _CRITICAL_DEPENDENCIES)
+    return jsonify({"status": "ready" if ready else "not_ready", "dependencies": report}), 200 if ready else 503
+
+
+@app.route("/warmup", methods=["GET", "POST"])
+@app.route("/api/domu/warmup", methods=["GET", "POST"])
+def warmup():
+    """
+    Warm-up hook for schedulers / deploy pipelines (call after a scale-up or deploy).
+    If DOMU_WARMUP_TOKEN is set, it must be sent as X-Warmup-Token. ?deep=1 also opens the
+    model clients' connections with a free metadata call.
+    """
+    token = os.getenv("DOMU_WARMUP_TOKEN", "")
+    if token and request.headers.get("X-Warmup-Token", "") != token:
+        return jsonify({"error": "forbidden"}), 403
+    started = time.perf_counter()
+    report = warm_dependencies(deep=request.args.get("deep") == "1")
+    return jsonify({"warmed_in_ms": round((time.perf_counter() - started) * 1000, 2), "dependencies": report})
+
+
+@app.route("/stats")
+@app.route("/api/domu/stats")
+def stats():
+    """In-process counters for this instance (coalescing, per-class latency/tokens, overload state)."""
+    return jsonify(
+        {
+            "singleflight": {"search": _search_flight.stats(), "generate": _generate_flight.stats()},
+            "classes": _class_stats.snapshot(),
+            "breaker": _breaker.stats(),
+            "model_calls": _model_limiter.stats(),
+            "api_keys": _key_pool.stats(),
+            "retries": _retry_budget.stats(),
+            "usage": _usage_totals.snapshot(),
+            "context_cache": _context_cache.stats() if _context_cache is not None else None,
+            "digest": _digest_store.stats() if _digest_store is not None else None,
+            "corpus": _corpus.stats() if _corpus is not None else None,
+            "sessions": _session_store.stats() if _session_store is not None else None,
+            "search_store": _search_store.stats() if _search_store is not None else None,
+            "shared_cache": _shared_cache.stats() if _shared_cache is not None else None,
+        }
+    )
+
+
+@app.after_request
+def _attach_conversation_id(response):
+    """Session mode: every /chat response tells the client which conversation_id to send next."""
+    conversation_id = g.get("conversation_id")
+    if conversation_id and response.is_json:
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body["conversation_id"] = conversation_id
+            response.set_data(app.json.dumps(body))
+    return response
+
+
+@app.route("/debug/memory")
+@app.route("/api/domu/debug/memory")
+def debug_memory():
+    """Traced memory, per-stage allocations and top allocation sites (only with DOMU_TRACEMALLOC=1)."""
+    if not tracemalloc.is_tracing():
+        return jsonify({"error": "not found"}), 404
+    token = os.getenv("DOMU_DEBUG_TOKEN", "")
+    if token and request.headers.get("X-Debug-Token", "") != token:
+        return jsonify({"error": "forbidden"}), 403
+    current, peak = tracemalloc.get_traced_memory()
+    return jsonify(
+        {
+            "traced_kb": round(current / 1024, 1),
+            "traced_peak_kb": round(peak / 1024, 1),
+            "stages": request_trace.allocations.snapshot(),
+            "top_sites": top_sites(tracemalloc.take_snapshot()),
+        }
+    )
+
+
 @app.route("/chat", methods=["POST"])
 @app.route("/api/domu/chat", methods=["POST"])  # For Vercel rewrite
+@profiled(_profile_hook)
 def chat():
+    trace = request_trace.start()
+
     # Parse request
     try:
-        data = request.get_json() or {}
-        message = (data.get("message") or "").strip()
-        history = _parse_history(data.get("history"))
+        with trace.stage("parse"):
+            data = read_json_body(request)
+            check_limits(data)
+            message = (data.get("message") or "").strip()
+            history = _parse_history(data.get("history"))
+            tenant = knowledge_tenants.resolve(data.get("institution"))  # None -> default prompt
+            # Session mode (opt-in): no "history" in the payload, and a conversation_id or "session": true.
+            # Earlier turns come from the store; plain {"message"} requests never touch it.
+            conversation_id = None
+            wants_session = "conversation_id" in data or data.get("session") is True
+            if "history" not in data and wants_session and _session_store is not None:
+                conversation_id = data.get("conversation_id") or new_conversation_id()
+                if not valid_conversation_id(conversation_id):
+                    raise ValueError("invalid conversation_id")
+                g.conversation_id = conversation_id
+    except PayloadTooLarge as e:
+        print("[Domu AI] Request over intake limit:", e)
+        replies = {
+            "message": "That message is too long. Please shorten it and try again.",
+            "history": "This conversation is too long to continue. Please start a new chat.",
+        }
+        reply = replies.get(e.limit, "That request is too large. Please send a shorter message.")
+        return jsonify({"reply": reply}), 413
     except Exception as e:
         # Log technical details, but show a simple message to users
         print("[Domu AI] Invalid JSON payload:", e)
         return jsonify({"reply": "Sorry, I couldn't understand that request. Please send a simple text message."}), 400
 
+    if conversation_id and "conversation_id" in data:
+        with trace.stage("session"):
+            history = _session_store.get(conversation_id)
+
     if not message.strip():
         return jsonify({"reply": "Please send a non-empty message so I know how to help."}), 400
 
     # Basic prompt-injection / jailbreak filter (defense in depth)
-    if is_malicious(message):
+    with trace.stage("guard"):
+        blocked = is_malicious(message)
+    if blocked:
         return jsonify({"reply": "I cannot fulfill that request."}), 200
 
-    # Initialize Gemini (fast model, automatic tool calling)
-    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("[Domu AI] Missing GEMINI_API_KEY / GOOGLE_API_KEY.")
+    # Deterministic FAQ fast path (knowledge/faq.py): fixed facts from the manual, no Gemini call
+    if FAQ_FAST_PATH_ENABLED:
+        started = time.perf_counter()
+        with trace.stage("faq"):
+            _refresh_knowledge()
+            faq_hit = match_faq(message, knowledge_data.PLATFORM_MANUAL)
+        if faq_hit and faq_hit[2] >= FAQ_CONFIDENCE_THRESHOLD:
+            faq_id, reply, confidence = faq_hit
+            _class_stats.record("faq_local", (time.perf_counter() - started) * 1000)
+            print(f"[Domu AI] FAQ fast path: {faq_id} (confidence {confidence})")
+            _save_to_supabase(user_message=message, assistant_reply=reply, extra=_perf_fields("faq", "faq_local"))
+            _remember_turn(message, reply)
+            return jsonify({"reply": reply})
+
+    # Initialize Gemini (fast model, explicit tool loop)
+    if not len(_key_pool):
+        print("[Domu AI] Missing GEMINI_API_KEYS / GEMINI_API_KEY / GOOGLE_API_KEY.")
         return jsonify(
             {
                 "reply": "I’m temporarily unavailable due to a configuration issue. Please try again later or contact support if this keeps happening."
@@ -246,46 +957,180 @@ def chat():
             503,
         )
 
+    # Output budget, thinking budget and model depend on the request class (domu_ai/policy.py)
+    policy = select_policy(message, len(history))
+    model = policy["model"] or _app_gemini_model()
+
+    # Overload protection: don't queue more work on a saturated or failing upstream.
+    if not _key_pool.available():
+        degraded = _degraded_response(message, "all API keys cooling down")
+        if degraded is not None:
+            return degraded
+        return jsonify({"reply": "I’m getting a lot of requests right now and need a short break. Please try again in a minute."}), 503
+    if not _model_limiter.try_acquire():
+        degraded = _degraded_response(message, "overload")
+        if degraded is not None:
+            return degraded
+        return jsonify({"reply": "I’m getting a lot of requests right now and need a short break. Please try again in a minute."}), 503
+    if not _breaker.allow():
+        _model_limiter.release()
+        degraded = _degraded_response(message, "breaker open")
+        if degraded is not None:
+            return degraded
+        return jsonify({"reply": "I’m getting a lot of requests right now and need a short break. Please try again in a minute."}), 503
+    # Admitted: only now take a key, so shed and degraded requests don't count as key uses.
+    api_key = _key_pool.acquire()
+    if api_key is None:  # Every key started cooling down since the check above
+        _model_limiter.release()
+        _breaker.cancel()
+        degraded = _degraded_response(message, "all API keys cooling down")
+        if degraded is not None:
+            return degraded
+        return jsonify({"reply": "I’m getting a lot of requests right now and need a short break. Please try again in a minute."}), 503
+
+    prompt_version = None
+    started = time.perf_counter()
+    submitted = False
+
     try:
-        client = genai.Client(api_key=api_key)
-        system_prompt = get_combined_context()
+        client = _key_pool.client(api_key)
+        with trace.stage("prompt"):
+            system_prompt = get_combined_context(tenant)
+        prompt_version = _prompt_version(system_prompt)
+        if _context_cache is not None:
+            _context_cache.sync(_knowledge_source_key())
         config = types.GenerateContentConfig(
             system_instruction=types.Content(
                 parts=[types.Part(text=system_prompt)]
             ),
-            tools=[search_internet],
-            max_output_tokens=3072,
-            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            tools=[SEARCH_TOOL],
+            # The tool loop is driven by _generate_with_tools(), not by the SDK.
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(disable=True),
+            max_output_tokens=policy["max_output_tokens"],
+            thinking_config=types.ThinkingConfig(thinking_budget=policy["thinking_budget"]),
         )
 
-        contents = _build_gemini_contents(history, message)
+        with trace.stage("digest"):
+            local_context = _local_digest(message)
+        contents = _build_gemini_contents(history, message, local_context)
+
+        key_state = {"key": api_key, "client": client}
+
+        def _attempt(attempt):
+            key = key_state["key"]
+            key_state["billed"] = True  # This request made the upstream call (not a single-flight follower)
+            try:
+                if _context_cache is not None:
+                    cache_name = _context_cache.lookup(key, model, prompt_version, _cached_prompt_fields(system_prompt))
+                    trace.flag("context_cache", bool(cache_name))
+                    if cache_name:
+                        cached_config = config.model_copy(
+                            update={"cached_content": cache_name, "system_instruction": None, "tools": None}
+                        )
+                        try:
+                            return _generate_with_tools(key_state["client"], model, contents, cached_config)
+                        except Exception as e:
+                            if not is_cache_error(str(e)):
+                                raise
+                            _context_cache.invalidate(key, model, prompt_version)  # Expired upstream: send uncached
+                return _generate_with_tools(key_state["client"], model, contents, config)
+            except Exception as e:
+                if is_quota_error(str(e)):
+                    _key_pool.mark_throttled(key)
+                else:
+                    _key_pool.mark_error(key)
+                raise
+
+        def _before_retry(error, attempt):
+            # A throttled key stays cooling: retry on another one, or stop if every key is cooling.
+            if is_quota_error(str(error)):
+                next_key = _key_pool.acquire()
+                if next_key is None:
+                    raise error
+                key_state["key"], key_state["client"] = next_key, _key_pool.client(next_key)
+
+        # Leave room in the wall-time cap for one more full attempt (model + a search tool call).
+        retry_deadline = time.monotonic() + GEMINI_WALL_TIMEOUT_S - SEARCH_TOOL_TIMEOUT_S
 
         def _do_generate():
-            return client.models.generate_content(
-                model=_app_gemini_model(),
-                contents=contents,
-                config=config,
+            return call_with_retry(
+                _attempt, _retry_budget, retry_deadline, max_attempts=RETRY_MAX_ATTEMPTS, on_retry=_before_retry
             )
 
-        # Wall time cap: must be > search tool timeout + model generation (see module constants).
-        with ThreadPoolExecutor(max_workers=1) as ex:
-            future = ex.submit(_do_generate)
+        # Without history the answer depends only on (prompt, model, message): share identical in-flight calls.
+        flight_key = (prompt_version, model, policy["class"], re.sub(r"\s+", " ", message))
+
+        def generate():
             try:
-                response = future.result(timeout=GEMINI_WALL_TIMEOUT_S)
-            except FuturesTimeoutError:
-                return jsonify(
-                    {
-                        "reply": "That took too long—looking up live events can be slow. Please try again in a moment."
-                    }
-                ), 200
+                if history:
+                    return _do_generate()
+                return _generate_flight.do(flight_key, _do_generate)
+            finally:
+                _model_limiter.release()  # Only once the upstream call has really finished
 
+        # Wall time cap: must be > search tool timeout + model generation (see module constants).
+        # No `with` block: leaving it would wait for the hung call and defeat the timeout.
+        # copy_context: the search tool records into this request's trace from the executor thread.
+        ex = ThreadPoolExecutor(max_workers=1)
+        try:
+            with trace.stage("model"):  # Includes tool calls
+                future = ex.submit(contextvars.copy_context().run, generate)
+                submitted = True
+                response, tool_turns, usage = future.result(timeout=GEMINI_WALL_TIMEOUT_S)
+        except FuturesTimeoutError:
+            _class_stats.record(policy["class"], (time.perf_counter() - started) * 1000, error=True)
+            _breaker.record_failure()
+            degraded = _degraded_response(message, "timeout", policy["class"])
+            if degraded is not None:
+                return degraded
+            reply = "That took too long—looking up live events can be slow. Please try again in a moment."
+            _save_to_supabase(
+                user_message=message,
+                assistant_reply=reply,
+                extra=_perf_fields("timeout", policy["class"], model=model, prompt_version=prompt_version),
+            )
+            return jsonify({"reply": reply}), 200
+        finally:
+            ex.shutdown(wait=False)
+
+        _breaker.record_success()
         reply = response.text or "I couldn't generate a response."
+        _class_stats.record(
+            policy["class"],
+            (time.perf_counter() - started) * 1000,
+            prompt_tokens=usage["prompt_tokens"],
+            output_tokens=usage["output_tokens"],
+        )
+        split = prompt_split(
+            len(system_prompt),
+            sum(len(entry["text"]) for entry in history[-MAX_HISTORY_MESSAGES:]),
+            len(message),
+            tool_output_chars(tool_turns) + len(local_context or ""),  # The digest is precomputed search output
+            usage_from_response(response)["prompt_tokens"],  # The final round's prompt holds every part once
+        )
+        if not key_state.get("billed"):
+            usage = dict.fromkeys(usage, 0)  # Shared another request's call: no tokens spent here
+            trace.flag("coalesced")
+        cost_usd = estimate_cost_usd(model, usage)
+        _usage_totals.record(model, usage, cost_usd, split)
+        log_extra = {**usage, "cost_usd": cost_usd, "token_split": split}
     except Exception as e:
         # Log full error server-side, but keep the user message friendly and non-technical
         print("[Domu AI] Chat error:", repr(e))
+        if not submitted:
+            _model_limiter.release()
+        _class_stats.record(policy["class"], (time.perf_counter() - started) * 1000, error=True)
         raw = str(e)
         reply = "Sorry, something went wrong on my side. Please try again in a moment."
 
+        if raw and _is_upstream_unavailable(raw):
+            _breaker.record_failure()
+            degraded = _degraded_response(message, "upstream error", policy["class"])
+            if degraded is not None:
+                return degraded
+        else:
+            _breaker.record_success()  # Upstream answered (e.g. a 4xx); it is not the model being down
+
         if raw and (
             "deadline" in raw.lower()
             or "timeout" in raw.lower()
@@ -298,9 +1143,19 @@ def chat():
         if raw and ("quota" in raw or "429" in raw or "RESOURCE_EXHAUSTED" in raw):
             reply = "I’m getting a lot of requests right now and need a short break. Please try again in a minute."
 
+        _save_to_supabase(
+            user_message=message,
+            assistant_reply=reply,
+            extra=_perf_fields("error", policy["class"], model=model, prompt_version=prompt_version),
+        )
         return jsonify({"reply": reply}), 500
 
     # Save to Supabase (sequentially, non-blocking for user)
-    _save_to_supabase(user_message=message, assistant_reply=reply)
+    _save_to_supabase(
+        user_message=message,
+        assistant_reply=reply,
+        extra={**_perf_fields("ok", policy["class"], model=model, prompt_version=prompt_version), **log_extra},
+    )
+    _remember_turn(message, reply)
 
     return jsonify({"reply": reply})
@@ -0,0 +1 @@
+# Runtime helpers for the Domu AI chat service (api/index.py)
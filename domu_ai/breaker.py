@@ -0,0 +1,89 @@
+"""
+Overload protection for upstream model calls.
+
+CircuitBreaker opens after consecutive upstream failures (timeouts, quota, 5xx) and
+lets a single probe through after a cool-down. InflightLimiter caps how many model
+calls one instance runs at once. While either refuses, chat() serves degraded answers
+from the local manual index instead of queueing more work on a saturated upstream.
+"""
+
+import threading
+import time
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_after_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._times_opened = 0
+
+    def allow(self) -> bool:
+        """True if a call may go upstream (closed, or the half-open probe slot is free)."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after_s or self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def cancel(self) -> None:
+        """Give back an allow() that ended up making no upstream call (frees the probe slot)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    self._times_opened += 1
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_after_s:
+                return "open"
+            return "half_open"
+
+    def stats(self) -> dict:
+        state = self.state()
+        with self._lock:
+            return {"state": state, "consecutive_failures": self._failures, "times_opened": self._times_opened}
+
+
+class InflightLimiter:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._rejected = 0
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._inflight >= self.limit:
+                self._rejected += 1
+                return False
+            self._inflight += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._inflight = max(0, self._inflight - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"inflight": self._inflight, "limit": self.limit, "rejected": self._rejected}
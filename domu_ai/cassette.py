@@ -0,0 +1,261 @@
+"""
+Record/replay "cassettes" of model and search calls, including their timing.
+
+A cassette is a JSONL file with one recorded call per line:
+    {"kind": "model"|"search", "key": ..., "elapsed_ms": ..., ...response...}
+
+- Model calls: run a proxy in front of the Gemini REST API and point the app at it with
+  GEMINI_BASE_URL. In record mode it forwards to the real API and appends every exchange;
+  in replay mode it answers from the cassette without network or quota.
+- Search calls: set DOMU_SEARCH_CASSETTE=<path> and DOMU_CASSETTE_MODE=record|replay; the
+  search tool then records or replays the raw DuckDuckGo results. The curated corpus, shared
+  cache and SQLite search store are bypassed meanwhile, so a replay never depends on them.
+
+Replays sleep for the recorded elapsed time multiplied by the time scale (1 = real timing,
+0.1 = ten times faster, 0 = no delay; DOMU_CASSETTE_TIME_SCALE / --time-scale). Identical
+requests recorded several times are replayed in order, round-robin.
+
+    python -m domu_ai.cassette record --out model.jsonl --port 8090
+    python -m domu_ai.cassette serve --cassette model.jsonl --port 8090 --time-scale 0.5
+    python -m domu_ai.cassette stats model.jsonl
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/"
+_FORWARDED_HEADERS = ("Content-Type", "x-goog-api-key", "x-goog-api-client", "User-Agent")
+
+
+def request_key(*parts) -> str:
+    """Stable key for a call: hash of its canonical JSON (API keys are never part of it)."""
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str = "replay", time_scale: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.time_scale = time_scale
+        self._lock = threading.Lock()
+        self._entries = {}  # (kind, key) -> [entries]
+        self._cursor = {}
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == "replay" or os.path.exists(path):
+            self._load()
+
+    @classmethod
+    def from_env(cls):
+        """Search cassette from DOMU_SEARCH_CASSETTE (unset = off)."""
+        path = os.getenv("DOMU_SEARCH_CASSETTE", "").strip()
+        if not path:
+            return None
+        return cls(path, os.getenv("DOMU_CASSETTE_MODE", "replay"),
+                   float(os.getenv("DOMU_CASSETTE_TIME_SCALE", "1")))
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry)
+
+    def lookup(self, kind: str, key: str):
+        """Next recorded entry for (kind, key), or None."""
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                self._stats["misses"] += 1
+                return None
+            i = self._cursor.get((kind, key), 0)
+            self._cursor[(kind, key)] = i + 1
+            self._stats["replayed"] += 1
+            return entries[i % len(entries)]
+
+    def record(self, kind: str, key: str, elapsed_ms: float, **fields) -> None:
+        entry = {"kind": kind, "key": key, "elapsed_ms": round(elapsed_ms, 2), **fields}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._entries.setdefault((kind, key), []).append(entry)
+            self._stats["recorded"] += 1
+
+    def wait(self, entry: dict) -> None:
+        """Sleep for the entry's recorded duration, scaled."""
+        if self.time_scale > 0:
+            time.sleep(entry.get("elapsed_ms", 0) * self.time_scale / 1000.0)
+
+    def call(self, kind: str, key: str, fn):
+        """Record fn()'s result (must be JSON-serializable) or replay it, with timing."""
+        if self.mode == "replay":
+            entry = self.lookup(kind, key)
+            if entry is None:
+                raise LookupError(f"No {kind} recording for key {key} in {self.path}")
+            self.wait(entry)
+            return entry["result"]
+        started = time.perf_counter()
+        result = fn()
+        self.record(kind, key, (time.perf_counter() - started) * 1000, result=result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "mode": self.mode, "entries": sum(len(v) for v in self._entries.values())}
+
+
+# --- Model proxy (record) / server (replay) ---
+
+
+def _model_key(method: str, path: str, body: bytes) -> str:
+    path = path.split("?")[0]  # Query strings may carry an API key
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = body.decode("utf-8", "replace")
+    return request_key(method, path, payload)
+
+
+class CassetteServer:
+    """HTTP server speaking the Gemini REST API from (or through to) a cassette."""
+
+    def __init__(self, cassette: Cassette, port: int = 0, upstream: str = GEMINI_API_URL):
+        self.cassette = cassette
+        self.upstream = upstream.rstrip("/") + "/"
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def start(self) -> "CassetteServer":
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _forward(self, method: str, path: str, headers, body: bytes):
+        req = urllib.request.Request(self.upstream + path.lstrip("/"), data=body or None, method=method)
+        for name in _FORWARDED_HEADERS:
+            if headers.get(name):
+                req.add_header(name, headers[name])
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                return resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, data: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _handle(self, method: str):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.startswith("/_stats"):
+                    return self._send(200, json.dumps(server.cassette.stats()).encode("utf-8"))
+                key = _model_key(method, self.path, body)
+                cassette = server.cassette
+                if cassette.mode == "replay":
+                    entry = cassette.lookup("model", key)
+                    if entry is None:
+                        error = {"error": {"code": 501, "message": f"No recording for this request ({key})",
+                                           "status": "UNIMPLEMENTED"}}
+                        return self._send(501, json.dumps(error).encode("utf-8"))
+                    cassette.wait(entry)
+                    return self._send(entry["status"], json.dumps(entry["response"]).encode("utf-8"))
+
+                started = time.perf_counter()
+                status, data = server._forward(method, self.path, self.headers, body)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                try:
+                    response = json.loads(data)
+                except ValueError:
+                    response = {"raw": data.decode("utf-8", "replace")}
+                cassette.record("model", key, elapsed_ms, path=self.path.split("?")[0], status=status,
+                                response=response)
+                return self._send(status, data)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        return Handler
+
+
+def _stats(path: str) -> dict:
+    per_kind = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            kind = per_kind.setdefault(entry["kind"], {"calls": 0, "unique": set(), "elapsed_ms": 0.0})
+            kind["calls"] += 1
+            kind["unique"].add(entry["key"])
+            kind["elapsed_ms"] += entry.get("elapsed_ms", 0)
+    return {
+        name: {"calls": k["calls"], "unique": len(k["unique"]),
+               "avg_elapsed_ms": round(k["elapsed_ms"] / k["calls"], 2)}
+        for name, k in per_kind.items()
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("record", help="Proxy to the real Gemini API and record every call")
+    p.add_argument("--out", required=True)
+    p.add_argument("--port", type=int, default=8090)
+    p.add_argument("--upstream", default=GEMINI_API_URL)
+    p = sub.add_parser("serve", help="Answer model calls from a cassette")
+    p.add_argument("--cassette", required=True)
+    p.add_argument("--port", type=int, default=8090)
+    p.add_argument("--time-scale", type=float, default=1.0)
+    p = sub.add_parser("stats", help="Calls, unique requests and average recorded latency per kind")
+    p.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print(json.dumps(_stats(args.path), indent=2))
+        return 0
+
+    if args.command == "record":
+        server = CassetteServer(Cassette(args.out, "record"), args.port, args.upstream)
+    else:
+        server = CassetteServer(Cassette(args.cassette, "replay", args.time_scale), args.port)
+    print(f"[Domu AI] Cassette {args.command} on {server.base_url} (set GEMINI_BASE_URL to it)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
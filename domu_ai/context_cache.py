@@ -0,0 +1,184 @@
+"""
+Provider-side context caching of the static system prompt (Gemini cached contents).
+
+Every request of a prompt variant sends the same system prompt and tool declarations. With
+caching they are uploaded once as a cached content object, and requests refer to it by
+name. The provider then processes and bills those tokens as cached input.
+
+There is one cache per (API key, model, prompt hash). Caches belong to the key's project
+and to one model, and the hash changes whenever the prompt does.
+  create      the first request for a (key, model, prompt) schedules creation in the
+              background and is sent uncached. Later requests use the cache once it exists.
+              An unexpired cache with the same display name (from another worker or an
+              earlier process) is adopted instead of creating a duplicate.
+  refresh     a cache that is still in use is extended when less than the refresh margin
+              of its TTL is left. Unused caches simply expire.
+  invalidate  when the knowledge source key changes (data.py, tenant overlays, learned
+              instructions), every cache is deleted. A cache the provider no longer knows
+              is dropped, and that request is sent without it.
+A failed creation (e.g. a prompt below the model's minimum cacheable size) is not retried
+for retry_after_s.
+
+Env: DOMU_CONTEXT_CACHE=1 turns it on. DOMU_CONTEXT_CACHE_TTL_S (default 3600) and
+DOMU_CONTEXT_CACHE_REFRESH_S (refresh margin, default 600) tune it.
+"""
+
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.genai import types
+
+DISPLAY_PREFIX = "domu-ai:"
+
+
+def is_cache_error(raw: str) -> bool:
+    """True for errors about an unknown, expired or inaccessible cached content."""
+    lowered = (raw or "").lower()
+    return ("cachedcontent" in lowered or "cached content" in lowered) and any(
+        marker in raw for marker in ("404", "403", "NOT_FOUND", "PERMISSION_DENIED")
+    )
+
+
+class ContextCacheManager:
+    def __init__(self, client_for, ttl_s: float = 3600.0, refresh_margin_s: float = 600.0,
+                 retry_after_s: float = 300.0):
+        self.client_for = client_for  # api key -> genai.Client
+        self.ttl_s = ttl_s
+        self.refresh_margin_s = refresh_margin_s
+        self.retry_after_s = retry_after_s
+        self._lock = threading.Lock()
+        self._entries = {}  # (api key, model, prompt hash) -> {"name", "expires_at", "busy"}
+        self._failed = {}  # (api key, model, prompt hash) -> monotonic time before which we don't retry
+        self._source_key = None
+        self._generation = 0
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="domu-context-cache")
+        self._stats = {"hits": 0, "misses": 0, "creates": 0, "adopted": 0, "refreshes": 0, "deletes": 0,
+                       "invalidations": 0, "failures": 0}
+
+    @classmethod
+    def from_env(cls, client_for):
+        if os.getenv("DOMU_CONTEXT_CACHE", "0") != "1":
+            return None
+        return cls(
+            client_for,
+            ttl_s=float(os.getenv("DOMU_CONTEXT_CACHE_TTL_S", "3600")),
+            refresh_margin_s=float(os.getenv("DOMU_CONTEXT_CACHE_REFRESH_S", "600")),
+        )
+
+    def lookup(self, api_key: str, model: str, prompt_hash: str, build) -> str:
+        """
+        Name of the cache to use for this request, or None to send the prompt uncached.
+        `build()` returns the cached fields (system_instruction, tools); it is only called on creation.
+        """
+        entry_key = (api_key, model, prompt_hash)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry["name"] and entry["expires_at"] > now:
+                self._stats["hits"] += 1
+                if entry["expires_at"] - now < self.refresh_margin_s and not entry["busy"]:
+                    entry["busy"] = True
+                    self._executor.submit(self._refresh, entry_key, entry)
+                return entry["name"]
+            self._stats["misses"] += 1
+            if (entry is not None and entry["busy"]) or self._failed.get(entry_key, 0) > now:
+                return None
+            self._entries[entry_key] = {"name": None, "expires_at": 0.0, "busy": True}
+            generation = self._generation
+        self._executor.submit(self._create, entry_key, build, generation)
+        return None
+
+    def invalidate(self, api_key: str, model: str, prompt_hash: str) -> None:
+        """Forget a cache the provider rejected (expired or deleted elsewhere)."""
+        with self._lock:
+            if self._entries.pop((api_key, model, prompt_hash), None) is not None:
+                self._stats["invalidations"] += 1
+
+    def sync(self, source_key: str) -> None:
+        """Delete every cache when the knowledge behind the prompts changed."""
+        with self._lock:
+            if source_key == self._source_key:
+                return
+            first = self._source_key is None
+            self._source_key = source_key
+            if first:
+                return
+            stale = [(k[0], e["name"]) for k, e in self._entries.items() if e["name"]]
+            self._entries.clear()
+            self._failed.clear()
+            self._generation += 1
+            self._stats["invalidations"] += len(stale)
+        for api_key, name in stale:
+            self._executor.submit(self._delete, api_key, name)
+
+    def _adopt(self, client, model: str, display_name: str):
+        """An existing cache for this prompt with enough TTL left: (name, remaining seconds) or None."""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for cached in client.caches.list():
+            if cached.display_name != display_name or not (cached.model or "").endswith(model):
+                continue
+            remaining = (cached.expire_time - now).total_seconds() if cached.expire_time else 0
+            if remaining > self.refresh_margin_s:
+                return cached.name, remaining
+        return None
+
+    def _create(self, entry_key: tuple, build, generation: int) -> None:
+        api_key, model, prompt_hash = entry_key
+        display_name = f"{DISPLAY_PREFIX}{prompt_hash}"
+        try:
+            client = self.client_for(api_key)
+            found = self._adopt(client, model, display_name)
+            if found is not None:
+                name, remaining = found
+                stat = "adopted"
+            else:
+                config = types.CreateCachedContentConfig(
+                    display_name=display_name, ttl=f"{int(self.ttl_s)}s", **build()
+                )
+                name, remaining = client.caches.create(model=model, config=config).name, self.ttl_s
+                stat = "creates"
+        except Exception as e:
+            print("[Domu AI] Context cache create failed:", repr(e))
+            with self._lock:
+                self._entries.pop(entry_key, None)
+                self._failed[entry_key] = time.monotonic() + self.retry_after_s
+                self._stats["failures"] += 1
+            return
+        with self._lock:
+            stale = generation != self._generation  # Knowledge changed while we were creating
+            if not stale:
+                self._entries[entry_key] = {"name": name, "expires_at": time.monotonic() + remaining, "busy": False}
+            self._stats[stat] += 1
+        if stale and stat == "creates":
+            self._delete(api_key, name)
+
+    def _refresh(self, entry_key: tuple, entry: dict) -> None:
+        try:
+            self.client_for(entry_key[0]).caches.update(
+                name=entry["name"], config=types.UpdateCachedContentConfig(ttl=f"{int(self.ttl_s)}s")
+            )
+        except Exception as e:
+            print("[Domu AI] Context cache refresh failed:", repr(e))
+            with self._lock:
+                if self._entries.get(entry_key) is entry:
+                    del self._entries[entry_key]
+            return
+        with self._lock:
+            entry["expires_at"] = time.monotonic() + self.ttl_s
+            entry["busy"] = False
+            self._stats["refreshes"] += 1
+
+    def _delete(self, api_key: str, name: str) -> None:
+        try:
+            self.client_for(api_key).caches.delete(name=name)
+            with self._lock:
+                self._stats["deletes"] += 1
+        except Exception as e:
+            print("[Domu AI] Context cache delete failed:", repr(e))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": sum(1 for e in self._entries.values() if e["name"])}
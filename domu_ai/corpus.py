@@ -0,0 +1,424 @@
+"""
+Curated local corpus of trusted pages, searched before the internet.
+
+Housing-law and registration questions (WWS points, huurtoeslag, BSN registration,
+Huurcommissie procedures) make search_internet go to DuckDuckGo again and again for a
+small, stable set of official pages. Those pages are instead fetched offline, split into
+passages, and written with a precomputed inverted index (term -> [(passage, term count)])
+to DOMU_CORPUS_PATH (default: <tmp>/domu_corpus.json; "0" disables it). search_internet
+scores a query against that index with BM25 first. The lookup takes well under a
+millisecond and needs no network.
+
+A query is answered locally only when recall is strong. The best passage has to contain
+at least DOMU_CORPUS_MIN_COVERAGE (default 0.7) of the query's idf-weighted terms. Terms
+that do not occur in the corpus count with the highest idf. "huurtoeslag income limit"
+is answered locally, while "cheap gyms breda" still goes to DuckDuckGo. A corpus older
+than DOMU_CORPUS_MAX_AGE_S (default 30 days) is not used, because amounts and limits
+change every year.
+
+    python -m domu_ai.corpus ingest                         # SOURCES below (monthly cron)
+    python -m domu_ai.corpus ingest --sources urls.txt      # one URL per line, "# topic" comments
+    python -m domu_ai.corpus query "huurtoeslag income limit"
+    python -m domu_ai.corpus bench --search-db /var/lib/domu/domu_search.sqlite3
+    python -m domu_ai.corpus bench --queries logged_queries.txt
+
+`bench` replays logged search queries against the corpus and reports how many of them
+would have been answered without a network search, plus the lookup latency. Its input
+is either the search store (every stored query was one DuckDuckGo call) or a file of
+queries.
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from html.parser import HTMLParser
+
+from domu_ai.search_rank import compact_results
+
+DEFAULT_MIN_COVERAGE = 0.7
+DEFAULT_MAX_AGE_S = 30 * 24 * 3600
+PASSAGE_WORDS = 120
+PASSAGE_STRIDE = 100
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+FETCH_TIMEOUT_S = 20
+
+# Topic -> trusted pages. Extend with --sources rather than ingesting arbitrary sites.
+SOURCES = {
+    "wws": (
+        "https://www.huurcommissie.nl/huurcommissie-helpt/huurprijscheck-en-puntentelling",
+        "https://www.government.nl/topics/housing/rented-housing",
+    ),
+    "huurtoeslag": (
+        "https://www.rijksoverheid.nl/onderwerpen/huurtoeslag",
+        "https://www.belastingdienst.nl/wps/wcm/connect/nl/huurtoeslag/huurtoeslag",
+    ),
+    "bsn": (
+        "https://www.government.nl/topics/personal-data/citizen-service-number-bsn",
+    ),
+    "huurcommissie": (
+        "https://www.huurcommissie.nl/",
+        "https://www.juridischloket.nl/wonen-en-huren/",
+    ),
+}
+
+# BM25 parameters (as in knowledge/manual_index.py)
+_K1 = 1.2
+_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are at be best can do does find for from good has have how i in is it me my near of on or the "
+    "to what when where which who why with you your this that there will would should could "
+    "de het een en van op te voor met dat die niet zijn aan er om ook als bij naar je u uw wat wie hoe waar "
+    "wanneer kan ik mijn".split()
+)
+# Passages inside these elements are navigation or page furniture, not content.
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "nav", "header", "footer", "form", "aside", "button"}
+_BLOCK_TAGS = {"p", "li", "td", "th", "dd", "dt", "div", "section", "article", "br", "tr", "table", "ul", "ol"}
+_HEADING_TAGS = {"h1", "h2", "h3", "h4"}
+
+
+def _tokens(text: str) -> list:
+    """Content words, with the same naive plural strip as the search store ("limits" -> "limit")."""
+    out = []
+    for word in _WORD.findall((text or "").lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        out.append(word)
+    return out
+
+
+def default_path() -> str:
+    return os.getenv("DOMU_CORPUS_PATH") or os.path.join(tempfile.gettempdir(), "domu_corpus.json")
+
+
+# --- Ingest (offline) ---
+
+
+class _PageParser(HTMLParser):
+    """Page title plus (heading, text) sections, without scripts and page furniture."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.sections = [["", []]]
+        self._skip = 0
+        self._in_title = False
+        self._heading = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in _HEADING_TAGS and not self._skip:
+            self._heading = []
+        elif tag in _BLOCK_TAGS:
+            self.sections[-1][1].append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in _HEADING_TAGS and self._heading is not None:
+            self.sections.append([" ".join("".join(self._heading).split()), []])
+            self._heading = None
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._skip:
+            return
+        elif self._heading is not None:
+            self._heading.append(data)
+        else:
+            self.sections[-1][1].append(data)
+
+
+def passages_from_html(html: str) -> tuple:
+    """(page title, [(passage title, body), ...]); long sections are split into overlapping windows."""
+    parser = _PageParser()
+    parser.feed(html)
+    page_title = " ".join(parser.title.split())
+    passages = []
+    for heading, chunks in parser.sections:
+        words = "".join(chunks).split()
+        if len(words) < 12:
+            continue  # Link lists, cookie notices, empty sections
+        title = f"{page_title} - {heading}" if heading and heading != page_title else page_title or heading
+        for start in range(0, max(1, len(words) - PASSAGE_WORDS + PASSAGE_STRIDE), PASSAGE_STRIDE):
+            passages.append((title, " ".join(words[start:start + PASSAGE_WORDS])))
+    return page_title, passages
+
+
+def fetch(url: str) -> str:
+    request = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0 (compatible; DomuAI-corpus/1.0)"})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT_S) as response:
+        raw = response.read(MAX_PAGE_BYTES)
+        charset = response.headers.get_content_charset() or "utf-8"
+    return raw.decode(charset, errors="replace")
+
+
+def build_index(sources: dict) -> dict:
+    """Inverted index over every passage of every source ({url: {"passages": [[title, body]]}})."""
+    docs, lengths = [], []
+    postings = defaultdict(list)
+    for url, source in sorted(sources.items()):
+        for title, body in source["passages"]:
+            doc_id = len(docs)
+            counts = defaultdict(int)
+            terms = _tokens(title) * 2 + _tokens(body)  # Title words count double, like the manual index
+            for term in terms:
+                counts[term] += 1
+            for term, tf in counts.items():
+                postings[term].append([doc_id, tf])
+            docs.append({"title": title, "body": body, "href": url})
+            lengths.append(len(terms))
+    return {"docs": docs, "lengths": lengths, "postings": postings}
+
+
+def ingest(path: str, urls: dict, fetch_page=fetch) -> dict:
+    """Fetch every URL, rebuild the index and rewrite the corpus file; returns passages per URL."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            previous = json.load(f).get("sources", {})
+    except (OSError, ValueError):
+        previous = {}
+    sources, report = {}, {}
+    for url, topic in urls.items():
+        try:
+            page_title, passages = passages_from_html(fetch_page(url))
+            if not passages:
+                raise ValueError("no text passages")
+            sources[url] = {"topic": topic, "title": page_title, "fetched_at": time.time(), "passages": passages}
+        except Exception as e:
+            print(f"[Domu AI] Corpus fetch failed ({url}):", repr(e))
+            if url not in previous:
+                report[url] = 0
+                continue
+            sources[url] = previous[url]  # Keep the last good copy
+        report[url] = len(sources[url]["passages"])
+
+    # Age of the corpus = age of its oldest page, so kept copies don't look freshly fetched
+    fetched_at = min((source["fetched_at"] for source in sources.values()), default=time.time())
+    data = {"fetched_at": fetched_at, "sources": sources, "index": build_index(sources)}
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)  # Readers see the old or the new file, never a partial one
+    return report
+
+
+# --- Lookup (per request) ---
+
+
+class Corpus:
+    """Reads the corpus file (re-parsed only when it changes) and answers queries from it."""
+
+    def __init__(self, path: str, min_coverage: float = DEFAULT_MIN_COVERAGE, max_age_s: float = DEFAULT_MAX_AGE_S):
+        self.path = path
+        self.min_coverage = min_coverage
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._loaded = (None, None)  # (mtime_ns, index)
+        self._stats = {"hits": 0, "weak": 0, "stale": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Corpus from env, or None when disabled (DOMU_CORPUS_PATH=0)."""
+        if os.getenv("DOMU_CORPUS_PATH", "").strip() == "0":
+            return None
+        return cls(
+            default_path(),
+            min_coverage=float(os.getenv("DOMU_CORPUS_MIN_COVERAGE", str(DEFAULT_MIN_COVERAGE))),
+            max_age_s=float(os.getenv("DOMU_CORPUS_MAX_AGE_S", str(DEFAULT_MAX_AGE_S))),
+        )
+
+    def load(self):
+        """The index with idf precomputed, or None when there is no corpus file."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            if self._loaded[0] != mtime:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                index = data["index"]
+                count = len(index["docs"]) or 1
+                index["idf"] = {t: math.log(1 + (count - len(p) + 0.5) / (len(p) + 0.5))
+                                for t, p in index["postings"].items()}
+                index["unknown_idf"] = math.log(1 + (count + 0.5) / 0.5)
+                index["avg_length"] = (sum(index["lengths"]) / count) or 1.0
+                index["fetched_at"] = data["fetched_at"]
+                index["sources"] = len(data["sources"])
+                self._loaded = (mtime, index)
+            return self._loaded[1]
+
+    def rank(self, query: str, index: dict) -> tuple:
+        """(coverage of the best passage, passages scoring at least half of the best, best first)."""
+        terms = set(_tokens(query))
+        scores, matched = defaultdict(float), defaultdict(float)
+        for term in terms:
+            idf = index["idf"].get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in index["postings"][term]:
+                norm = _K1 * (1 - _B + _B * index["lengths"][doc_id] / index["avg_length"])
+                scores[doc_id] += idf * tf * (_K1 + 1) / (tf + norm)
+                matched[doc_id] += idf
+        if not scores:
+            return 0.0, []
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = ranked[0]
+        total = sum(index["idf"].get(t, index["unknown_idf"]) for t in terms)
+        return matched[best] / total, [index["docs"][d] for d in ranked[:10] if scores[d] >= scores[best] / 2]
+
+    def search(self, query: str, limit: int = 3, body_tokens: int = 100):
+        """Compact results from the corpus when its recall for the query is strong, else None."""
+        index = self.load()
+        if index is None:
+            return None
+        if time.time() - index["fetched_at"] > self.max_age_s:
+            self._count("stale")
+            return None
+        coverage, candidates = self.rank(query, index)
+        if coverage < self.min_coverage:
+            self._count("weak")
+            return None
+        self._count("hits")
+        return compact_results(query, candidates, limit=limit, body_tokens=body_tokens)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        index = self.load()
+        with self._lock:
+            return {
+                **self._stats,
+                "passages": len(index["docs"]) if index else 0,
+                "sources": index["sources"] if index else 0,
+                "age_s": round(time.time() - index["fetched_at"]) if index else None,
+            }
+
+
+# --- CLI ---
+
+
+def _read_sources(path: str) -> dict:
+    """url -> topic from a file with one URL per line; "# topic" lines set the topic of the URLs below."""
+    urls, topic = {}, "custom"
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("#"):
+                topic = line.lstrip("#").strip() or topic
+            elif line:
+                urls[line] = topic
+    return urls
+
+
+def _logged_queries(args) -> list:
+    if args.search_db:
+        conn = sqlite3.connect(f"file:{args.search_db}?mode=ro", uri=True)
+        try:
+            return [row[0] for row in conn.execute("SELECT query FROM searches ORDER BY id")]
+        finally:
+            conn.close()
+    queries = []
+    with open(args.queries, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("{"):
+                line = json.loads(line).get("query") or ""
+            if line:
+                queries.append(line)
+    return queries
+
+
+def _bench(corpus: Corpus, queries: list, examples: int) -> dict:
+    index = corpus.load()
+    if index is None:
+        raise SystemExit(f"No corpus at {corpus.path}; run `python -m domu_ai.corpus ingest` first")
+    samples, local, remote = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        results = corpus.search(query)
+        samples.append((time.perf_counter() - started) * 1000)
+        (local if results else remote).append(query)
+    samples.sort()
+    return {
+        "logged_searches": len(queries),
+        "avoided": len(local),
+        "avoided_rate": round(len(local) / len(queries), 3) if queries else None,
+        "lookup_p50_ms": round(samples[len(samples) // 2], 3) if samples else None,
+        "lookup_p99_ms": round(samples[int(len(samples) * 0.99)], 3) if samples else None,
+        "lookup_max_ms": round(samples[-1], 3) if samples else None,
+        "passages": len(index["docs"]),
+        "examples_local": local[:examples],
+        "examples_network": remote[:examples],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="Corpus file (default: DOMU_CORPUS_PATH or <tmp>/domu_corpus.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("ingest")
+    p.add_argument("--sources", default=None, help="File with one URL per line (default: SOURCES)")
+    p = sub.add_parser("query")
+    p.add_argument("query")
+    p = sub.add_parser("bench")
+    group = p.add_mutually_exclusive_group(required=True)
+    group.add_argument("--search-db", help="Search store whose queries to replay (domu_ai/search_store.py)")
+    group.add_argument("--queries", help="File with one query per line, or JSONL with a \"query\" field")
+    p.add_argument("--examples", type=int, default=5)
+    sub.add_parser("stats")
+    args = parser.parse_args(argv)
+    path = args.path or default_path()
+
+    if args.command == "ingest":
+        urls = _read_sources(args.sources) if args.sources else {u: t for t, us in SOURCES.items() for u in us}
+        started = time.monotonic()
+        report = ingest(path, urls)
+        print(json.dumps({"path": path, "elapsed_s": round(time.monotonic() - started, 1), "passages": report}, indent=2))
+        return 0 if any(report.values()) else 1
+
+    corpus = Corpus(path, min_coverage=float(os.getenv("DOMU_CORPUS_MIN_COVERAGE", str(DEFAULT_MIN_COVERAGE))))
+    if args.command == "query":
+        index = corpus.load()
+        if index is None:
+            print(f"No corpus at {path}", file=sys.stderr)
+            return 1
+        started = time.perf_counter()
+        coverage, candidates = corpus.rank(args.query, index)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(json.dumps({
+            "coverage": round(coverage, 3),
+            "local": coverage >= corpus.min_coverage,
+            "lookup_ms": round(elapsed_ms, 3),
+            "results": compact_results(args.query, candidates),
+        }, indent=2, ensure_ascii=False))
+    elif args.command == "bench":
+        print(json.dumps(_bench(corpus, _logged_queries(args), args.examples), indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(corpus.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Per-city local digests: events, transport notices and housing alerts, precomputed on a schedule.
+
+"What's on this weekend in <city>" questions are the most expensive requests: each one
+runs live web searches inside the request. A scheduled job runs those searches once per
+city instead and stores the compact results locally, at DOMU_DIGEST_PATH (default:
+<tmp>/domu_digest.json, written atomically). chat() adds the matching city's digest to
+the user turn when a message names a city and asks about one of the topics. The model
+then only searches for what the digest does not cover.
+
+The digest goes into the user turn, not the system prompt, so the system prompt stays
+identical across requests (prompt caching, see domu_ai/context_cache.py). Digests older
+than DOMU_DIGEST_MAX_AGE_S (default 36 h) are not used. If a topic's search fails, that
+city keeps its previous results for the topic.
+
+    python -m domu_ai.digest refresh                   # all cities (run from cron)
+    python -m domu_ai.digest refresh --cities breda delft
+    python -m domu_ai.digest refresh --every 21600     # or keep running, every 6 h
+    python -m domu_ai.digest show rotterdam
+
+Cron, every 6 hours:
+    0 */6 * * * cd /srv/domu && python -m domu_ai.digest refresh >> /var/log/domu_digest.log 2>&1
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+from domu_ai.search_rank import compact_results
+
+DEFAULT_MAX_AGE_S = 36 * 3600
+SEARCH_CANDIDATES = 8
+
+# City id -> (display name, aliases as written in messages)
+CITIES = {
+    "amsterdam": ("Amsterdam", ("amsterdam", "amstelveen", "diemen")),
+    "rotterdam": ("Rotterdam", ("rotterdam",)),
+    "utrecht": ("Utrecht", ("utrecht",)),
+    "den-haag": ("Den Haag", ("den haag", "the hague", "hague", "'s-gravenhage")),
+    "leiden": ("Leiden", ("leiden",)),
+    "delft": ("Delft", ("delft",)),
+    "groningen": ("Groningen", ("groningen",)),
+    "eindhoven": ("Eindhoven", ("eindhoven",)),
+    "nijmegen": ("Nijmegen", ("nijmegen",)),
+    "tilburg": ("Tilburg", ("tilburg",)),
+    "breda": ("Breda", ("breda",)),
+    "den-bosch": ("'s-Hertogenbosch", ("den bosch", "'s-hertogenbosch", "s-hertogenbosch", "hertogenbosch")),
+    "maastricht": ("Maastricht", ("maastricht",)),
+    "enschede": ("Enschede", ("enschede",)),
+    "arnhem": ("Arnhem", ("arnhem",)),
+    "wageningen": ("Wageningen", ("wageningen",)),
+}
+
+# Topic -> (search query template, result count, words that make a message ask about the topic)
+TOPICS = {
+    "events": (
+        "{city} events this week students {month}",
+        4,
+        ("weekend", "tonight", "event", "festival", "concert", "things to do", "what's on", "whats on",
+         "going on", "party", "parties", "agenda", "exhibition", "nightlife", "uitgaan"),
+    ),
+    "transport": (
+        "{city} NS train disruptions engineering works this week",
+        3,
+        ("train", "ns", "bus", "tram", "metro", "strike", "disruption", "storing", "travel", "traveling",
+         "travelling", "transport"),
+    ),
+    "housing": (
+        "{city} student housing news {year}",
+        3,
+        ("housing", "room", "kamer", "rent", "renting", "rental", "landlord", "apartment", "studio",
+         "accommodation"),
+    ),
+}
+
+_CITY_RE = re.compile(
+    r"(?<![a-z])(" + "|".join(sorted((re.escape(a) for _, aliases in CITIES.values() for a in aliases),
+                                     key=len, reverse=True)) + r")(?![a-z])"
+)
+_ALIAS_TO_CITY = {alias: city_id for city_id, (_, aliases) in CITIES.items() for alias in aliases}
+
+
+def _topic_re(words) -> re.Pattern:
+    """Whole words or phrases, with an optional plural ("event" matches "events", not "prevent")."""
+    alternatives = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(r"\b(?:" + alternatives + r")(?:s|es)?\b")
+
+
+_TOPIC_PATTERNS = {topic: _topic_re(words) for topic, (_, _, words) in TOPICS.items()}
+
+
+def default_path() -> str:
+    return os.getenv("DOMU_DIGEST_PATH") or os.path.join(tempfile.gettempdir(), "domu_digest.json")
+
+
+def match(message: str):
+    """(city id, [topics]) when the message names a city and asks about a digest topic (whole words), else None."""
+    lowered = (message or "").lower().replace("\u2019", "'")
+    found = _CITY_RE.search(lowered)
+    if found is None:
+        return None
+    topics = [topic for topic, pattern in _TOPIC_PATTERNS.items() if pattern.search(lowered)]
+    if not topics:
+        return None
+    return _ALIAS_TO_CITY[found.group(1)], topics
+
+
+def render(city_id: str, entry: dict, topics=None) -> str:
+    """Context block for the model: the city's digest sections (all, or only `topics`)."""
+    refreshed = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(entry["refreshed_at"]))
+    lines = [
+        f"LOCAL DIGEST FOR {entry['name'].upper()} (collected {refreshed} from web searches):",
+        "Use it for questions it covers and cite its links. Only call search_internet for details it does not cover.",
+    ]
+    for topic in topics or TOPICS:
+        results = entry["sections"].get(topic) or []
+        if not results:
+            continue
+        lines.append(f"{topic.capitalize()}:")
+        for r in results:
+            lines.append(f"- {r.get('title', '')}: {r.get('body', '')} ({r.get('href', '')})")
+    return "\n".join(lines)
+
+
+class DigestStore:
+    """Reads the digest file; re-parsed only when the file changes."""
+
+    def __init__(self, path: str, max_age_s: float = DEFAULT_MAX_AGE_S):
+        self.path = path
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._loaded = (None, {})  # (mtime_ns, cities)
+        self._stats = {"hits": 0, "stale": 0, "missing": 0}
+
+    @classmethod
+    def from_env(cls):
+        """Store from env, or None when disabled (DOMU_DIGEST_PATH=0)."""
+        if os.getenv("DOMU_DIGEST_PATH", "").strip() == "0":
+            return None
+        return cls(default_path(), float(os.getenv("DOMU_DIGEST_MAX_AGE_S", str(DEFAULT_MAX_AGE_S))))
+
+    def load(self) -> dict:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return {}
+        with self._lock:
+            if self._loaded[0] != mtime:
+                with open(self.path, encoding="utf-8") as f:
+                    self._loaded = (mtime, json.load(f).get("cities", {}))
+            return self._loaded[1]
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, city_id: str):
+        """The city's digest entry if it is fresh enough, else None."""
+        entry = self.load().get(city_id)
+        if entry is None:
+            self._count("missing")
+            return None
+        if time.time() - entry["refreshed_at"] > self.max_age_s:
+            self._count("stale")
+            return None
+        self._count("hits")
+        return entry
+
+    def stats(self) -> dict:
+        cities = self.load()
+        now = time.time()
+        with self._lock:
+            return {
+                **self._stats,
+                "cities": len(cities),
+                "oldest_age_s": round(max((now - c["refreshed_at"] for c in cities.values()), default=0)),
+            }
+
+
+def ddg_search(query: str) -> list:
+    from duckduckgo_search import DDGS
+
+    return list(DDGS().text(query, max_results=SEARCH_CANDIDATES))
+
+
+def refresh(path: str, cities=None, search=ddg_search, pause_s: float = 1.0) -> dict:
+    """Search every topic for each city and rewrite the digest file; returns per-city result counts."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {"cities": {}}
+    now = time.time()
+    fill = {"month": time.strftime("%B %Y", time.gmtime(now)), "year": time.strftime("%Y", time.gmtime(now))}
+    report = {}
+    for city_id in cities or CITIES:
+        name = CITIES[city_id][0]
+        previous = data["cities"].get(city_id, {}).get("sections", {})
+        sections = {}
+        for topic, (template, limit, _) in TOPICS.items():
+            query = template.format(city=name, **fill)
+            try:
+                sections[topic] = compact_results(query, search(query), limit=limit, body_tokens=60)
+            except Exception as e:
+                print(f"[Domu AI] Digest search failed ({city_id}/{topic}):", repr(e))
+                sections[topic] = previous.get(topic, [])
+            if pause_s:
+                time.sleep(pause_s)  # Be gentle with the search provider
+        data["cities"][city_id] = {"name": name, "refreshed_at": time.time(), "sections": sections}
+        report[city_id] = {topic: len(results) for topic, results in sections.items()}
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)  # Readers see the old or the new file, never a partial one
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="Digest file (default: DOMU_DIGEST_PATH or <tmp>/domu_digest.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("refresh")
+    p.add_argument("--cities", nargs="*", choices=sorted(CITIES), help="Cities to refresh (default: all)")
+    p.add_argument("--every", type=float, default=0, help="Keep running and refresh every N seconds")
+    p.add_argument("--pause-s", type=float, default=1.0, help="Pause between searches")
+    p = sub.add_parser("show")
+    p.add_argument("city", choices=sorted(CITIES))
+    args = parser.parse_args(argv)
+    path = args.path or default_path()
+
+    if args.command == "show":
+        entry = DigestStore(path).load().get(args.city)
+        if entry is None:
+            print(f"No digest for {args.city} in {path}", file=sys.stderr)
+            return 1
+        print(render(args.city, entry))
+        return 0
+
+    while True:
+        started = time.monotonic()
+        report = refresh(path, args.cities, pause_s=args.pause_s)
+        print(json.dumps({"path": path, "elapsed_s": round(time.monotonic() - started, 1), "cities": report}))
+        if not args.every:
+            return 0
+        time.sleep(max(0.0, args.every - (time.monotonic() - started)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
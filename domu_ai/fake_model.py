@@ -0,0 +1,354 @@
+"""
+Local fake Gemini server for load and failure testing (no network, no real quota).
+
+It implements just enough of the Generative Language REST API for google-genai's
+generate_content: POST /v1beta/models/<model>:generateContent. Replies echo the last
+user message, report token usage, and can simulate latency, per-key quotas (429
+RESOURCE_EXHAUSTED) and random 503s. GET /_stats returns request counts per API key.
+
+Context caching is supported too: create/get/list/update/delete on /v1beta/cachedContents,
+and generateContent with "cachedContent" (rejected with 404 for unknown or expired caches,
+and with 400 when systemInstruction or tools are also sent, as the real API does).
+--prefill-ms-per-1k adds latency per 1000 uncached prompt tokens, so a cached prefix
+answers faster, as it does upstream.
+
+Function calling: when the request declares tools (directly or in its cache), a user
+message starting with "search: a | b" triggers one turn with a parallel search_internet
+call per query. "search-loop: a" asks for another search every turn, to exercise round
+caps. A turn that carries function responses plus a text part (the "finish" instruction),
+or a request with function calling mode NONE, always gets a text reply.
+
+Point the app at it with GEMINI_BASE_URL=http://127.0.0.1:<port>/.
+
+Usage:
+    python -m domu_ai.fake_model serve --port 8089 --latency-ms 300 --quota-per-key 10
+    python -m domu_ai.fake_model spread --keys 4 --requests 200 --concurrency 16
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeModelServer:
+    def __init__(self, port: int = 0, latency_ms: float = 0.0, quota_per_key: int = 0, window_s: float = 60.0,
+                 error_rate: float = 0.0, prefill_ms_per_1k: float = 0.0):
+        self.latency_ms = latency_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.quota_per_key = quota_per_key
+        self.window_s = window_s
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {"ok": 0, "throttled": 0, "errors": 0})
+        self._windows = defaultdict(deque)
+        self._forced_429 = defaultdict(int)  # key -> requests left that get a 429 regardless of quota
+        self._caches = {}  # "cachedContents/<id>" -> resource (+ "_tokens", "_expires" wall time)
+        self.cache_counts = {"created": 0, "updated": 0, "deleted": 0, "cached_requests": 0}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def start(self) -> "FakeModelServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {key: dict(c) for key, c in self._counts.items()}
+
+    def throttle(self, key: str, requests: int = 1) -> None:
+        """Answer the next `requests` calls made with `key` with 429, whatever the quota."""
+        with self._lock:
+            self._forced_429[key] += requests
+
+    def _admit(self, key: str) -> str:
+        """Return 'ok', 'throttled' or 'error' for one request on this key."""
+        now = time.monotonic()
+        with self._lock:
+            if self._forced_429[key] > 0:
+                self._forced_429[key] -= 1
+                self._counts[key]["throttled"] += 1
+                return "throttled"
+            if self.quota_per_key:
+                window = self._windows[key]
+                while window and now - window[0] > self.window_s:
+                    window.popleft()
+                if len(window) >= self.quota_per_key:
+                    self._counts[key]["throttled"] += 1
+                    return "throttled"
+                window.append(now)
+            if self.error_rate and random.random() < self.error_rate:
+                self._counts[key]["errors"] += 1
+                return "error"
+            self._counts[key]["ok"] += 1
+            return "ok"
+
+    # --- cached contents ---
+
+    def _cache_view(self, cache: dict) -> dict:
+        expires = datetime.datetime.fromtimestamp(cache["_expires"], datetime.timezone.utc)
+        view = {k: v for k, v in cache.items() if not k.startswith("_") and k not in ("systemInstruction", "tools")}
+        return {**view, "expireTime": expires.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "usageMetadata": {"totalTokenCount": cache["_tokens"]}}
+
+    def create_cache(self, body: dict) -> dict:
+        ttl_s = float(str(body.get("ttl") or "3600s").rstrip("s"))
+        cache = {
+            "name": f"cachedContents/{uuid.uuid4().hex[:12]}",
+            "model": body.get("model", ""),
+            "displayName": body.get("displayName", ""),
+            "systemInstruction": body.get("systemInstruction"),
+            "tools": body.get("tools"),
+            "_tokens": max(1, len(json.dumps(body)) // 4),
+            "_expires": time.time() + ttl_s,
+        }
+        with self._lock:
+            self._caches[cache["name"]] = cache
+            self.cache_counts["created"] += 1
+        return self._cache_view(cache)
+
+    def get_cache(self, name: str):
+        with self._lock:
+            cache = self._caches.get(name)
+            if cache is not None and cache["_expires"] <= time.time():
+                del self._caches[name]
+                cache = None
+        return cache
+
+    def update_cache(self, name: str, body: dict):
+        cache = self.get_cache(name)
+        if cache is None:
+            return None
+        with self._lock:
+            cache["_expires"] = time.time() + float(str(body.get("ttl") or "3600s").rstrip("s"))
+            self.cache_counts["updated"] += 1
+        return self._cache_view(cache)
+
+    def delete_cache(self, name: str) -> bool:
+        with self._lock:
+            self.cache_counts["deleted"] += 1
+            return self._caches.pop(name, None) is not None
+
+    def list_caches(self) -> dict:
+        with self._lock:
+            names = list(self._caches)
+        return {"cachedContents": [self._cache_view(c) for c in map(self.get_cache, names) if c is not None]}
+
+    @staticmethod
+    def _function_calls(contents: list, tools_declared: bool, mode: str) -> list:
+        """search_internet calls to answer with for this turn, or [] for a text reply."""
+        parts_of = [c.get("parts") or [] for c in contents]
+        rounds = sum(any("functionResponse" in p for p in parts) for parts in parts_of)
+        latest = parts_of[-1] if parts_of else []
+        finishing = any("functionResponse" in p for p in latest) and any(p.get("text") for p in latest)
+        if not tools_declared or mode == "NONE" or finishing:
+            return []
+        question = next((p["text"] for parts in reversed(parts_of) for p in parts
+                         if p.get("text") and not any("functionResponse" in q for q in parts)), "")
+        prefix, _, queries = question.partition(":")
+        if prefix.strip() == "search-loop" or (prefix.strip() == "search" and rounds == 0):
+            return [{"functionCall": {"name": "search_internet", "args": {"query": q.strip()}}}
+                    for q in queries.split("|") if q.strip()]
+        return []
+
+    def generate(self, model: str, body: dict, cached_tokens: int = 0, cached_tools: bool = False) -> dict:
+        """Build a generateContent response for a parsed request body."""
+        contents = body.get("contents") or []
+        last_text = ""
+        for content in reversed(contents):
+            texts = [p.get("text") for p in content.get("parts") or [] if p.get("text")]
+            if content.get("role", "user") == "user" and texts:
+                last_text = texts[-1]
+                break
+        mode = ((body.get("toolConfig") or {}).get("functionCallingConfig") or {}).get("mode", "")
+        calls = self._function_calls(contents, bool(body.get("tools")) or cached_tools, mode)
+        if calls:
+            parts = calls
+        else:
+            rounds = sum(any("functionResponse" in p for p in c.get("parts") or []) for c in contents)
+            suffix = f" (after {rounds} tool rounds)" if rounds else ""
+            parts = [{"text": f"[fake {model}] {last_text[:200]}{suffix}"}]
+        reply = json.dumps(parts)
+        prompt_tokens = max(1, len(json.dumps(body)) // 4) + cached_tokens
+        output_tokens = max(1, len(reply) // 4)
+        return {
+            "candidates": [
+                {"content": {"role": "model", "parts": parts}, "finishReason": "STOP", "index": 0}
+            ],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": output_tokens,
+                "totalTokenCount": prompt_tokens + output_tokens,
+                **({"cachedContentTokenCount": cached_tokens} if cached_tokens else {}),
+            },
+            "modelVersion": model,
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _not_found(self, message: str = "not found"):
+                return self._send(404, {"error": {"code": 404, "message": message, "status": "NOT_FOUND"}})
+
+            def _body(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _cache_name(self):
+                path = self.path.split("?")[0]
+                _, _, rest = path.partition("/cachedContents/")
+                return f"cachedContents/{rest}" if rest else None
+
+            def do_GET(self):
+                if self.path.startswith("/_stats"):
+                    return self._send(200, server.stats())
+                if "/cachedContents" in self.path:
+                    name = self._cache_name()
+                    if name is None:
+                        return self._send(200, server.list_caches())
+                    cache = server.get_cache(name)
+                    return self._send(200, server._cache_view(cache)) if cache else self._not_found()
+                if "/models/" in self.path:  # models.get (used by /warmup?deep=1)
+                    name = self.path.split("?")[0].rsplit("/", 1)[-1]
+                    return self._send(200, {"name": f"models/{name}", "displayName": f"Fake {name}"})
+                return self._send(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+
+            def do_PATCH(self):
+                view = server.update_cache(self._cache_name() or "", self._body())
+                return self._send(200, view) if view else self._not_found()
+
+            def do_DELETE(self):
+                return self._send(200, {}) if server.delete_cache(self._cache_name() or "") else self._not_found()
+
+            def do_POST(self):
+                body = self._body()
+                key = self.headers.get("x-goog-api-key", "")
+                path = self.path.split("?")[0]
+                if path.endswith("/cachedContents"):
+                    return self._send(200, server.create_cache(body))
+                if ":generateContent" not in path:
+                    return self._not_found()
+                model = path.rsplit("/", 1)[-1].split(":")[0]
+
+                cached_tokens, cached_tools = 0, False
+                if body.get("cachedContent"):
+                    if body.get("systemInstruction") or body.get("tools"):
+                        return self._send(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message": (
+                            "CachedContent can not be used with GenerateContent request setting "
+                            "system_instruction, tools or tool_config.")}})
+                    cache = server.get_cache(body["cachedContent"])
+                    if cache is None:
+                        return self._send(404, {"error": {"code": 404, "status": "NOT_FOUND", "message": (
+                            "CachedContent not found (or permission denied)")}})
+                    cached_tokens, cached_tools = cache["_tokens"], bool(cache.get("tools"))
+                    with server._lock:
+                        server.cache_counts["cached_requests"] += 1
+
+                uncached_tokens = len(json.dumps(body)) // 4
+                delay_ms = server.latency_ms + uncached_tokens / 1000.0 * server.prefill_ms_per_1k
+                if delay_ms:
+                    time.sleep(delay_ms / 1000.0)
+                verdict = server._admit(key)
+                if verdict == "throttled":
+                    return self._send(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED"}})
+                if verdict == "error":
+                    return self._send(503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+                return self._send(200, server.generate(model, body, cached_tokens, cached_tools))
+
+        return Handler
+
+
+def _spread(args) -> int:
+    """Drive the Flask app against the fake server with several keys and report how load spread."""
+    server = FakeModelServer(latency_ms=args.latency_ms, quota_per_key=args.quota_per_key,
+                             window_s=args.window_s).start()
+    os.environ["GEMINI_API_KEYS"] = ",".join(f"fake-key-{i:04d}" for i in range(args.keys))
+    os.environ["GEMINI_BASE_URL"] = server.base_url
+    os.environ["DOMU_FAQ_FAST_PATH"] = "0"
+
+    from api.index import app, _key_pool  # Imported after env so the pool picks up the fake keys
+
+    def one(i):
+        with app.test_client() as client:
+            return client.post("/chat", json={"message": f"spread test message {i}"}).status_code
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+        statuses = list(ex.map(one, range(args.requests)))
+    server.stop()
+
+    per_key = server.stats()
+    print(json.dumps({"server": per_key, "pool": _key_pool.stats(), "status_codes": {
+        str(code): statuses.count(code) for code in sorted(set(statuses))}}, indent=2))
+
+    served = [c["ok"] for c in per_key.values()]
+    if len(served) < args.keys or (not args.quota_per_key and max(served) > 1.5 * max(1, min(served))):
+        print("Load did not spread evenly across keys.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "spread"):
+        p = sub.add_parser(name)
+        p.add_argument("--latency-ms", type=float, default=50.0)
+        p.add_argument("--quota-per-key", type=int, default=0, help="Requests per key per window before 429 (0 = unlimited)")
+        p.add_argument("--window-s", type=float, default=60.0)
+        if name == "serve":
+            p.add_argument("--port", type=int, default=8089)
+            p.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+            p.add_argument("--prefill-ms-per-1k", type=float, default=0.0,
+                           help="Extra latency per 1000 uncached prompt tokens")
+        else:
+            p.add_argument("--keys", type=int, default=4)
+            p.add_argument("--requests", type=int, default=200)
+            p.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args(argv)
+
+    if args.command == "spread":
+        return _spread(args)
+
+    server = FakeModelServer(port=args.port, latency_ms=args.latency_ms, quota_per_key=args.quota_per_key,
+                             window_s=args.window_s, error_rate=args.error_rate,
+                             prefill_ms_per_1k=args.prefill_ms_per_1k)
+    print(f"[Domu AI] Fake model server on {server.base_url} (GET /_stats for per-key counts)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
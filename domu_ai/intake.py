@@ -0,0 +1,126 @@
+"""
+Bounded request intake for /chat: size caps, optional gzip bodies, optional orjson.
+
+read_json_body() reads at most max_body_bytes of the raw body. A declared
+Content-Length over the cap is rejected before anything is read. A chunked body is cut
+off at cap + 1 bytes. A body sent with "Content-Encoding: gzip" is inflated incrementally
+and also capped, so a small compressed body cannot inflate into a large one. Any cap
+overrun raises PayloadTooLarge (the route answers 413). Malformed bodies raise ValueError.
+
+check_limits() then rejects messages over max_message_chars and histories with more than
+max_history_entries entries, before any history entry is looked at.
+
+orjson is used for request decoding and Flask JSON responses when it is installed
+(DOMU_FAST_JSON=0 turns it off); otherwise the stdlib json module is used.
+
+Limits (env):
+  DOMU_MAX_BODY_BYTES        default 262144 (256 KB), for both raw and decompressed bodies
+  DOMU_MAX_MESSAGE_CHARS     default 4000
+  DOMU_MAX_HISTORY_ENTRIES   default 200 (only the last MAX_HISTORY_MESSAGES are used)
+"""
+
+import json
+import os
+import zlib
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FAST_JSON = orjson is not None and os.getenv("DOMU_FAST_JSON", "1") != "0"
+MAX_BODY_BYTES = int(os.getenv("DOMU_MAX_BODY_BYTES", str(256 * 1024)))
+MAX_MESSAGE_CHARS = int(os.getenv("DOMU_MAX_MESSAGE_CHARS", "4000"))
+MAX_HISTORY_ENTRIES = int(os.getenv("DOMU_MAX_HISTORY_ENTRIES", "200"))
+
+
+class PayloadTooLarge(Exception):
+    """Request exceeds an intake limit; `limit` names which one."""
+
+    def __init__(self, limit: str, detail: str):
+        super().__init__(f"{limit}: {detail}")
+        self.limit = limit
+
+
+def loads(raw):
+    """Decode JSON from bytes or str with orjson when enabled, else the stdlib."""
+    if FAST_JSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _gunzip(raw: bytes, max_bytes: int) -> bytes:
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        out = inflater.decompress(raw, max_bytes + 1)
+    except zlib.error as e:
+        raise ValueError(f"invalid gzip body: {e}")
+    if len(out) > max_bytes or inflater.unconsumed_tail:
+        raise PayloadTooLarge("body", f"decompressed body exceeds {max_bytes} bytes")
+    if not inflater.eof:
+        raise ValueError("truncated gzip body")
+    return out
+
+
+def decode_body(raw: bytes, content_encoding: str = "", max_bytes: int = MAX_BODY_BYTES) -> dict:
+    """Raw (possibly gzip-compressed) body bytes -> JSON object."""
+    encoding = (content_encoding or "").strip().lower()
+    if encoding == "gzip":
+        raw = _gunzip(raw, max_bytes)
+    elif encoding not in ("", "identity"):
+        raise ValueError(f"unsupported Content-Encoding {encoding!r}")
+    if not raw:
+        return {}
+    data = loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("JSON body must be an object")
+    return data
+
+
+def read_json_body(req, max_bytes: int = MAX_BODY_BYTES) -> dict:
+    """Read and decode a Flask request's JSON body without reading past max_bytes."""
+    if req.content_length is not None and req.content_length > max_bytes:
+        raise PayloadTooLarge("body", f"Content-Length {req.content_length} exceeds {max_bytes} bytes")
+    if req.mimetype != "application/json":
+        raise ValueError(f"expected application/json, got {req.mimetype or 'no content type'!r}")
+    raw = req.stream.read(max_bytes + 1)
+    if len(raw) > max_bytes:
+        raise PayloadTooLarge("body", f"body exceeds {max_bytes} bytes")
+    return decode_body(raw, req.headers.get("Content-Encoding", ""), max_bytes)
+
+
+def check_limits(data: dict, max_message_chars: int = MAX_MESSAGE_CHARS,
+                 max_history_entries: int = MAX_HISTORY_ENTRIES) -> None:
+    message = data.get("message")
+    if isinstance(message, str) and len(message) > max_message_chars:
+        raise PayloadTooLarge("message", f"{len(message)} characters (max {max_message_chars})")
+    history = data.get("history")
+    if isinstance(history, list) and len(history) > max_history_entries:
+        raise PayloadTooLarge("history", f"{len(history)} entries (max {max_history_entries})")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson; falls back to the stdlib for what orjson rejects."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def install_json_provider(app) -> None:
+    """Use orjson for the app's JSON responses (jsonify) when enabled."""
+    if FAST_JSON:
+        app.json_provider_class = FastJSONProvider
+        app.json = FastJSONProvider(app)
@@ -0,0 +1,132 @@
+"""
+Pool of Gemini API keys with quota-aware selection.
+
+Keys come from GEMINI_API_KEYS (comma- or newline-separated), plus GEMINI_API_KEY /
+GOOGLE_API_KEY for backwards compatibility. Requests take the keys in turn (round-robin),
+skipping keys that are cooling down: a key that returned 429 / RESOURCE_EXHAUSTED sits
+out for a cool-down period and then rejoins the rotation as an equal. If every key is
+cooling down, acquire() returns None and the caller treats it as overload.
+
+GEMINI_BASE_URL points the clients at another endpoint (e.g. the local fake model
+server in domu_ai/fake_model.py).
+"""
+
+import os
+import re
+import threading
+import time
+
+from google import genai
+from google.genai import types
+
+DEFAULT_COOLDOWN_S = 60.0
+
+
+def keys_from_env() -> list:
+    raw = [k.strip() for k in re.split(r"[,\n]", os.getenv("GEMINI_API_KEYS", ""))]
+    raw += [os.getenv("GEMINI_API_KEY", "").strip(), os.getenv("GOOGLE_API_KEY", "").strip()]
+    keys = []
+    for key in raw:
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def key_label(key: str) -> str:
+    """Non-secret identifier for logs and stats."""
+    return f"…{key[-4:]}" if len(key) > 8 else "…"
+
+
+def is_quota_error(raw: str) -> bool:
+    return "429" in raw or "RESOURCE_EXHAUSTED" in raw or "quota" in raw.lower()
+
+
+class KeyPool:
+    def __init__(self, keys: list, cooldown_s: float = DEFAULT_COOLDOWN_S, base_url: str = None):
+        self.cooldown_s = cooldown_s
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._keys = {
+            key: {"uses": 0, "throttled": 0, "errors": 0, "last_throttled": None, "cooldown_until": 0.0}
+            for key in keys
+        }
+        self._clients = {}
+        self._next = 0  # Round-robin position
+
+    @classmethod
+    def from_env(cls) -> "KeyPool":
+        return cls(
+            keys_from_env(),
+            cooldown_s=float(os.getenv("DOMU_KEY_COOLDOWN_S", str(DEFAULT_COOLDOWN_S))),
+            base_url=os.getenv("GEMINI_BASE_URL") or None,
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def available(self) -> bool:
+        """True if some key is not cooling down. Counts nothing; use acquire() for the call itself."""
+        now = time.monotonic()
+        with self._lock:
+            return any(s["cooldown_until"] <= now for s in self._keys.values())
+
+    def acquire(self):
+        """Pick a key for one request (None if the pool is empty or every key is cooling down)."""
+        now = time.monotonic()
+        with self._lock:
+            keys = list(self._keys)
+            for i in range(len(keys)):
+                key = keys[(self._next + i) % len(keys)]
+                state = self._keys[key]
+                if state["cooldown_until"] <= now:
+                    self._next = (self._next + i + 1) % len(keys)
+                    state["uses"] += 1
+                    return key
+            return None
+
+    def mark_throttled(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            state = self._keys.get(key)
+            if state is not None:
+                state["throttled"] += 1
+                state["last_throttled"] = now
+                state["cooldown_until"] = now + self.cooldown_s
+        print(f"[Domu AI] API key {key_label(key)} throttled; cooling down for {self.cooldown_s:.0f}s")
+
+    def mark_error(self, key: str) -> None:
+        with self._lock:
+            state = self._keys.get(key)
+            if state is not None:
+                state["errors"] += 1
+
+    def client(self, key: str):
+        """One genai.Client per key, reused across requests."""
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+                client = genai.Client(api_key=key, http_options=http_options)
+                self._clients[key] = client
+            return client
+
+    def keys(self) -> list:
+        return list(self._keys)
+
+    def warm(self) -> None:
+        """Construct every client up front (e.g. right after a worker starts)."""
+        for key in self.keys():
+            self.client(key)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                f"{i}:{key_label(k)}": {
+                    "uses": s["uses"],
+                    "throttled": s["throttled"],
+                    "errors": s["errors"],
+                    "cooling_down_s": round(max(0.0, s["cooldown_until"] - now), 1),
+                }
+                for i, (k, s) in enumerate(self._keys.items())
+            }
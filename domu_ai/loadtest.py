@@ -0,0 +1,72 @@
+"""
+Small HTTP load generator for the /chat endpoint (stdlib only).
+
+Sends --requests POSTs with --concurrency parallel clients and prints throughput and
+latency percentiles as JSON. Messages are unique per request unless --repeat is given,
+so request coalescing and caches don't flatter the numbers.
+
+    python -m domu_ai.loadtest --url http://127.0.0.1:8000/chat --requests 500 --concurrency 32
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from domu_ai.metrics import percentile
+
+
+def _post(url: str, message: str, timeout: float):
+    body = json.dumps({"message": message}).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except Exception:
+        status = 0
+    return status, (time.perf_counter() - started) * 1000
+
+
+def run(url: str, requests: int, concurrency: int, repeat: bool = False, timeout: float = 70.0) -> dict:
+    messages = ["What is there to do for students this weekend?" if repeat else f"load test question {i}"
+                for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(lambda m: _post(url, m, timeout), messages))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for _, ms in results]
+    statuses = [s for s, _ in results]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "first_ms": round(latencies[0], 1) if latencies else None,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "status_codes": {str(c): statuses.count(c) for c in sorted(set(statuses))},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--repeat", action="store_true", help="Send the same message every time")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.url, args.requests, args.concurrency, args.repeat), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
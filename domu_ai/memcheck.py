@@ -0,0 +1,162 @@
+"""
+Allocation check for the chat service: per-stage allocations and memory growth over many requests.
+
+Runs thousands of /chat requests in process (one at a time, against the local fake model
+server in a child process, Supabase disabled) under tracemalloc and reports:
+  - per-stage allocations (parse, guard, faq, prompt, model, search): average net change
+    and average/max peak above the stage's start (domu_ai/trace.py)
+  - traced-memory growth after warm-up, as a least-squares slope in KB per 1000 requests
+  - the allocation sites that grew the most between the end of warm-up and the end of the run
+
+Warm-up requests run untraced; tracing starts when they are done. By default the warm-up is
+long enough to fill every bounded per-class latency buffer (LATENCY_SAMPLES per request
+class, domu_ai/metrics.py). A buffer that is still filling would otherwise show up as
+growth. Request logging goes to /dev/null while the run is going, so captured stdout does
+not count as growth either.
+
+Exits 1 when growth exceeds --budget-kb-per-1k or a stage's max peak exceeds
+--stage-peak-budget-kb, so it can gate CI (tests/python/test_memcheck.py runs it).
+
+    python -m domu_ai.memcheck --requests 4000                # warm-up: 2500 requests
+
+The same per-stage numbers are available from a running instance started with
+DOMU_TRACEMALLOC=1 at GET /debug/memory (X-Debug-Token if DOMU_DEBUG_TOKEN is set).
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tracemalloc
+
+from domu_ai.metrics import LATENCY_SAMPLES
+
+MESSAGES = (
+    "how do I reset my password?",
+    "what are fun things to do in rotterdam as a student",
+    "can you explain how the compatibility score works",
+    "how long does the questionnaire take?",
+    "I'm moving to groningen in september, any tips for finding a room?",
+)
+# Every message is its own request class at worst, so this fills all latency buffers.
+DEFAULT_WARMUP = LATENCY_SAMPLES * len(MESSAGES)
+
+
+def top_sites(snapshot, limit: int = 15, base=None) -> list:
+    """Largest allocation sites (or largest growth versus `base`), excluding tracemalloc itself."""
+    snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+    if base is not None:
+        base = base.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        stats = [s for s in snapshot.compare_to(base, "lineno") if s.size_diff > 0][:limit]
+        return [{"site": str(s.traceback[0]), "growth_kb": round(s.size_diff / 1024, 1), "count_diff": s.count_diff}
+                for s in stats]
+    return [{"site": str(s.traceback[0]), "size_kb": round(s.size / 1024, 1), "count": s.count}
+            for s in snapshot.statistics("lineno")[:limit]]
+
+
+def _slope(points) -> float:
+    """Least-squares slope of (x, y) points."""
+    n = len(points)
+    if n < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var = sum((x - mean_x) ** 2 for x, _ in points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var if var else 0.0
+
+
+def _serve_fake_model(conn) -> None:
+    """Child process: run the fake model server and report its URL (its memory is not the app's)."""
+    from domu_ai.fake_model import FakeModelServer
+
+    server = FakeModelServer(latency_ms=0)
+    conn.send(server.base_url)
+    server._httpd.serve_forever()
+
+
+def run(requests: int, warmup: int = DEFAULT_WARMUP, checkpoints: int = 20, frames: int = 10) -> dict:
+    for name in ("NEXT_PUBLIC_SUPABASE_URL", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY"):
+        os.environ.pop(name, None)
+    ctx = multiprocessing.get_context("spawn")
+    parent, child = ctx.Pipe()
+    server = ctx.Process(target=_serve_fake_model, args=(child,), daemon=True)
+    server.start()
+    os.environ["GEMINI_BASE_URL"] = parent.recv()
+    os.environ["GEMINI_API_KEYS"] = "memcheck-key-0001"
+    os.environ.pop("GEMINI_API_KEY", None)
+    os.environ.pop("GOOGLE_API_KEY", None)
+
+    import api.index as service
+    from domu_ai.trace import allocations
+
+    service.init_worker()  # Clients for the fake model, even if api.index was imported earlier
+
+    client = service.app.test_client()
+    every = max(1, (requests - warmup) // checkpoints)
+    points, baseline = [], None
+    devnull = open(os.devnull, "w")
+    try:
+        for i in range(requests):
+            if i == warmup:
+                gc.collect()
+                tracemalloc.start(frames)
+                allocations.reset()
+                baseline = tracemalloc.take_snapshot()
+            history = [{"role": "user", "text": MESSAGES[(i + 1) % len(MESSAGES)]},
+                       {"role": "assistant", "text": "Sure, here is what I know."}] if i % 3 == 0 else []
+            with contextlib.redirect_stdout(devnull):
+                client.post("/chat", json={"message": f"{MESSAGES[i % len(MESSAGES)]} ({i % 50})", "history": history})
+            if i + 1 > warmup and (i + 1 - warmup) % every == 0:
+                gc.collect()
+                points.append((i + 1, tracemalloc.get_traced_memory()[0]))
+        gc.collect()
+        final = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        server.terminate()
+        devnull.close()
+
+    return {
+        "requests": requests,
+        "warmup": warmup,
+        "traced_kb": round(current / 1024, 1),
+        "traced_peak_kb": round(peak / 1024, 1),
+        "growth_kb_per_1k_requests": round(_slope(points) * 1000 / 1024, 2),
+        "checkpoints_kb": [round(y / 1024, 1) for _, y in points],
+        "stages": allocations.snapshot(),
+        "top_growth": top_sites(final, 10, base=baseline) if baseline is not None else [],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP,
+                        help="Untraced requests before measuring growth (default fills every latency buffer)")
+    parser.add_argument("--budget-kb-per-1k", type=float, default=64.0,
+                        help="Max traced-memory growth per 1000 requests after warm-up")
+    parser.add_argument("--stage-peak-budget-kb", type=float, default=4096.0,
+                        help="Max allocation peak of any single stage")
+    args = parser.parse_args(argv)
+    if args.warmup >= args.requests:
+        parser.error("--warmup must be smaller than --requests")
+
+    report = run(args.requests, args.warmup)
+    violations = []
+    if report["growth_kb_per_1k_requests"] > args.budget_kb_per_1k:
+        violations.append(f"memory grows {report['growth_kb_per_1k_requests']} KB per 1000 requests "
+                          f"(budget {args.budget_kb_per_1k})")
+    for name, stage in report["stages"].items():
+        if stage["max_peak_kb"] > args.stage_peak_budget_kb:
+            violations.append(f"stage {name} peaked at {stage['max_peak_kb']} KB (budget {args.stage_peak_budget_kb})")
+    report["violations"] = violations
+    print(json.dumps(report, indent=2))
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
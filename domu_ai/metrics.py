@@ -0,0 +1,64 @@
+"""
+In-process counters for the chat service, exposed on /stats.
+
+Everything here is per instance and resets on cold start; it is meant for tuning
+(e.g. the generation policy table), not as a durable record.
+"""
+
+import math
+import threading
+from collections import deque
+
+LATENCY_SAMPLES = 500
+
+
+def percentile(values, pct: float):
+    """Nearest-rank percentile of a sequence of numbers (None when empty)."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ClassStats:
+    """Per request-class latency and token counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classes = {}
+
+    def record(self, request_class: str, latency_ms: float, prompt_tokens=None, output_tokens=None, error=False):
+        with self._lock:
+            entry = self._classes.get(request_class)
+            if entry is None:
+                entry = {
+                    "count": 0,
+                    "errors": 0,
+                    "prompt_tokens": 0,
+                    "output_tokens": 0,
+                    "latencies": deque(maxlen=LATENCY_SAMPLES),
+                }
+                self._classes[request_class] = entry
+            entry["count"] += 1
+            if error:
+                entry["errors"] += 1
+            entry["prompt_tokens"] += prompt_tokens or 0
+            entry["output_tokens"] += output_tokens or 0
+            entry["latencies"].append(latency_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            out = {}
+            for name, entry in self._classes.items():
+                latencies = list(entry["latencies"])
+                count = entry["count"]
+                out[name] = {
+                    "count": count,
+                    "errors": entry["errors"],
+                    "avg_prompt_tokens": round(entry["prompt_tokens"] / count, 1) if count else 0,
+                    "avg_output_tokens": round(entry["output_tokens"] / count, 1) if count else 0,
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                }
+            return out
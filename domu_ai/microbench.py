@@ -0,0 +1,178 @@
+"""
+Microbenchmarks for the chat service's per-request hot paths (no network).
+
+Benchmarks:
+  get_combined_context   system prompt lookup (the compiled prompt, as served per request)
+  is_malicious           prompt-injection phrase filter on a typical message
+  parse_history          _parse_history on a 20-message client history
+  build_contents         _build_gemini_contents for that history + a new message
+  build_response         Flask JSON response for a typical ~1.5 KB reply
+  intake_1kb/100kb/1mb   request intake (domu_ai/intake.py decode + limits + _parse_history) of a
+                         /chat body of that size, 40 history entries; intake_1mb_gzip is gzip-encoded
+
+Each benchmark is auto-calibrated (timeit autorange), repeated, and reported as
+min/median ns per call. Results can be saved as a JSON baseline and compared later;
+compare exits 1 when any benchmark regresses by more than --threshold. It compares the
+minimum by default, which is the least sensitive to other load on the machine, relative to
+a fixed pure-Python reference workload timed in the same run, which cancels out overall
+host speed drift (CPU frequency, noisy neighbours). Pass --absolute to skip that
+normalization. Baselines still depend on the machine type. To measure the stdlib JSON codec
+instead of orjson, run with DOMU_FAST_JSON=0.
+
+    python -m domu_ai.microbench run --save /tmp/before.json
+    python -m domu_ai.microbench compare /tmp/before.json --threshold 0.15
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+
+HISTORY = [
+    {"role": "user" if i % 2 == 0 else "assistant",
+     "text": ("How does matching work for students in Utrecht? " if i % 2 == 0 else
+              "Matching compares your questionnaire answers with other students' answers. ") * 3}
+    for i in range(20)
+]
+MESSAGE = "Can you explain how the compatibility score is calculated and what I can do to improve my matches?"
+REPLY = ("**How your compatibility score works**\n\n"
+         + "The score combines lifestyle, study habits and personality answers from the questionnaire. " * 16)
+
+
+def _intake_body(size: int) -> bytes:
+    """A /chat JSON body of about `size` bytes: a message plus 40 history entries."""
+    chunk = max(8, size // 40 - 40)
+    history = [{"role": "user" if i % 2 == 0 else "assistant", "text": ("x" * 9 + " ") * (chunk // 10)}
+               for i in range(40)]
+    return json.dumps({"message": MESSAGE, "history": history}).encode("utf-8")
+
+
+def _benchmarks() -> dict:
+    """name -> zero-argument callable, built against the real app module."""
+    os.environ.setdefault("DOMU_SEARCH_DB", "0")
+    import api.index as service
+    from domu_ai.intake import check_limits, decode_body
+    from flask import jsonify
+
+    def build_response():
+        with service.app.app_context():
+            return jsonify({"reply": REPLY})
+
+    def intake(raw: bytes, encoding: str = ""):
+        def run_intake():
+            data = decode_body(raw, encoding, max_bytes=4 * 1024 * 1024)
+            check_limits(data)
+            return service._parse_history(data.get("history"))
+        return run_intake
+
+    body_1mb = _intake_body(1024 * 1024)
+    service.get_combined_context()  # Build once: the benchmark measures the per-request path
+    return {
+        "get_combined_context": service.get_combined_context,
+        "is_malicious": lambda: service.is_malicious(MESSAGE),
+        "parse_history": lambda: service._parse_history(HISTORY),
+        "build_contents": lambda: service._build_gemini_contents(HISTORY, MESSAGE),
+        "build_response": build_response,
+        "intake_1kb": intake(_intake_body(1024)),
+        "intake_100kb": intake(_intake_body(100 * 1024)),
+        "intake_1mb": intake(body_1mb),
+        "intake_1mb_gzip": intake(gzip.compress(body_1mb), "gzip"),
+    }
+
+
+def _reference():
+    """Fixed interpreter-bound workload used to normalize for host speed."""
+    total = 0
+    for i in range(2000):
+        total += i * i
+    return "".join(str(total)[:8]).lower()
+
+
+def _measure(fn, repeat: int) -> dict:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call_ns = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "median_ns": round(statistics.median(per_call_ns), 1),
+        "min_ns": round(min(per_call_ns), 1),
+        "loops": number,
+        "repeat": repeat,
+    }
+
+
+def run(names=None, repeat: int = 10) -> dict:
+    results = {}
+    for name, fn in _benchmarks().items():
+        if names and name not in names:
+            continue
+        results[name] = _measure(fn, repeat)
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "reference": _measure(_reference, repeat),
+        "benchmarks": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, stat: str = "min_ns", normalize: bool = True) -> dict:
+    """Relative change per benchmark; with normalize, timings are divided by the run's reference."""
+    host_drift = current["reference"][stat] / baseline["reference"][stat]
+    scale = host_drift if normalize else 1.0
+    rows, regressions = {}, []
+    for name, now in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            rows[name] = {"current_ns": now[stat], "baseline_ns": None, "change": None}
+            continue
+        change = now[stat] / scale / before[stat] - 1
+        rows[name] = {"baseline_ns": before[stat], "current_ns": now[stat], "change": round(change, 3)}
+        if change > threshold:
+            regressions.append(name)
+    return {"threshold": threshold, "stat": stat, "host_drift": round(host_drift, 3), "normalized": normalize,
+            "benchmarks": rows, "regressions": regressions}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("run")
+    p.add_argument("--only", nargs="*", help="Benchmark names to run (default: all)")
+    p.add_argument("--repeat", type=int, default=10)
+    p.add_argument("--save", help="Write results as a JSON baseline")
+    p = sub.add_parser("compare")
+    p.add_argument("baseline", help="Baseline JSON from `run --save`")
+    p.add_argument("--current", help="Compare this saved result instead of running now")
+    p.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown (0.15 = 15%%)")
+    p.add_argument("--stat", choices=("min_ns", "median_ns"), default="min_ns")
+    p.add_argument("--absolute", action="store_true", help="Don't normalize by the reference workload")
+    p.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        result = run(args.only, args.repeat)
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(result, f, indent=2)
+        print(json.dumps(result, indent=2))
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(list(baseline["benchmarks"]), args.repeat)
+    report = compare(baseline, current, args.threshold, args.stat, normalize=not args.absolute)
+    print(json.dumps(report, indent=2))
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Latency and cache-effectiveness queries over domu_ai_chat_log performance fields.
+
+Per day and request class: p50/p95 total latency, stage medians (model, search), failure
+rate (timeout/error/degraded), and cache effectiveness (shared prompt hits, coalesced model
+calls, search hit rate including curated-corpus answers), and tool-loop use (average calls
+and rounds, share of requests stopped by a tool cap). `slowest` ranks the classes with the
+worst p95 per day.
+
+Rows come from Supabase (the domu_ai_perf_daily() SQL function, service role) or from an
+exported JSONL/CSV file, which is aggregated locally with the same definitions:
+
+    python -m domu_ai.perf_report daily --days 7
+    python -m domu_ai.perf_report slowest --from-file chat_log.jsonl --top 3
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from domu_ai.metrics import percentile
+from domu_ai.usage import read_rows
+
+FAILURE_STATUSES = ("timeout", "error", "degraded")
+
+
+def _as_dict(value) -> dict:
+    if isinstance(value, str):
+        return json.loads(value) if value.strip() else {}
+    return value or {}
+
+
+def _rate(numerator: float, denominator: float):
+    return round(numerator / denominator, 3) if denominator else None
+
+
+def daily(rows) -> list:
+    """Per (day, request_class) aggregates; same columns as domu_ai_perf_daily()."""
+    groups = defaultdict(list)
+    for row in rows:
+        if row.get("total_ms") in (None, ""):
+            continue  # Logged without performance fields
+        day = str(row.get("created_at") or "")[:10]
+        groups[(day, row.get("request_class") or "unknown")].append(row)
+
+    out = []
+    for (day, request_class), members in groups.items():
+        totals = [float(r["total_ms"]) for r in members]
+        stages = [_as_dict(r.get("stage_ms")) for r in members]
+        flags = [_as_dict(r.get("cache_flags")) for r in members]
+        prompt_flags = [f["prompt_shared"] for f in flags if "prompt_shared" in f]
+        search_hits = sum(f.get("search_corpus_hits", 0) + f.get("search_shared_hits", 0) + f.get("search_store_hits", 0)
+                          for f in flags)
+        search_lookups = search_hits + sum(f.get("search_misses", 0) for f in flags)
+        model_ms = [s["model"] for s in stages if "model" in s]
+        search_ms = [s["search"] for s in stages if "search" in s]
+        looped = [r for r in members if r.get("tool_rounds") not in (None, "")]  # Rows from the explicit tool loop
+        out.append({
+            "day": day,
+            "request_class": request_class,
+            "requests": len(members),
+            "p50_ms": percentile(totals, 50),
+            "p95_ms": percentile(totals, 95),
+            "model_p50_ms": percentile(model_ms, 50) if model_ms else None,
+            "search_p50_ms": percentile(search_ms, 50) if search_ms else None,
+            "failure_rate": _rate(sum(r.get("status") in FAILURE_STATUSES for r in members), len(members)),
+            "prompt_shared_rate": _rate(sum(bool(f) for f in prompt_flags), len(prompt_flags)),
+            "coalesced_rate": _rate(sum(bool(f.get("coalesced")) for f in flags), len(flags)),
+            "search_hit_rate": _rate(search_hits, search_lookups),
+            "avg_tool_calls": _rate(sum(int(r.get("tool_calls") or 0) for r in members), len(members)),
+            "avg_tool_rounds": _rate(sum(int(r["tool_rounds"]) for r in looped), len(looped)),
+            "tool_cap_rate": _rate(sum("tool_cap" in _as_dict(r.get("cache_flags")) for r in looped), len(looped)),
+        })
+    out.sort(key=lambda r: (r["day"], r["p95_ms"] or 0), reverse=True)  # Newest day, slowest class first
+    return out
+
+
+def slowest(daily_rows: list, top: int = 3) -> dict:
+    """The `top` request classes with the highest p95 for each day."""
+    by_day = defaultdict(list)
+    for row in daily_rows:
+        by_day[row["day"]].append(row)
+    return {
+        day: [
+            {"request_class": r["request_class"], "p95_ms": r["p95_ms"], "requests": r["requests"]}
+            for r in sorted(rows, key=lambda r: r["p95_ms"] or 0, reverse=True)[:top]
+        ]
+        for day, rows in sorted(by_day.items(), reverse=True)
+    }
+
+
+def fetch_daily(days: int) -> list:
+    """Run domu_ai_perf_daily() in Supabase (needs SUPABASE_URL + SUPABASE_SERVICE_ROLE_KEY)."""
+    from api.index import _get_supabase
+
+    sb = _get_supabase()
+    if sb is None:
+        raise RuntimeError("Supabase is not configured (NEXT_PUBLIC_SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY)")
+    since = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+    return sb.rpc("domu_ai_perf_daily", {"p_since": since}).execute().data or []
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("daily", "slowest"):
+        p = sub.add_parser(name)
+        p.add_argument("--days", type=int, default=7, help="Look-back window when querying Supabase")
+        p.add_argument("--from-file", help="Aggregate a domu_ai_chat_log export (.jsonl/.csv) instead")
+        if name == "slowest":
+            p.add_argument("--top", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rows = daily(read_rows(args.from_file)) if args.from_file else fetch_daily(args.days)
+    print(json.dumps(rows if args.command == "daily" else slowest(rows, args.top), indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Generation policy: pick max_output_tokens, thinking budget and model per request class.
+
+A request is classified from its message length, history depth and a cheap keyword-based
+intent guess (whole words, so "tax" does not fire on "syntax"). The first rule in the policy table whose conditions all match wins, so order
+matters and the last rule should be a catch-all.
+
+The table can be replaced without code edits via DOMU_GENERATION_POLICY, which is either a
+JSON array of rules or a path to a JSON file containing one (re-read when the file changes).
+Every rule is validated when the table is loaded. api/index.py loads it strictly at import,
+so a bad override stops the service from starting. A file edited into an invalid state
+later is logged, and the last valid table stays in use.
+
+Rule fields (all optional except "class"):
+  class              name used in stats and logs
+  intents            list of intents, at least one must be detected
+  max_message_chars  / min_message_chars
+  max_history        / min_history
+  max_output_tokens  (default 3072)
+  thinking_budget    (default 0)
+  model              model id; null/absent means the app default (_app_gemini_model)
+"""
+
+import json
+import os
+import re
+import threading
+
+DEFAULT_MAX_OUTPUT_TOKENS = 3072
+DEFAULT_THINKING_BUDGET = 0
+
+DEFAULT_POLICY = [
+    {"class": "greeting", "intents": ["greeting"], "max_message_chars": 60, "max_output_tokens": 256},
+    {"class": "platform_faq", "intents": ["platform"], "max_message_chars": 300, "max_history": 6, "max_output_tokens": 1024},
+    {"class": "legal_money", "intents": ["legal_money"], "max_output_tokens": 3072},
+    {"class": "local_search", "intents": ["local"], "max_output_tokens": 3072},
+    {"class": "long_input", "min_message_chars": 1500, "max_output_tokens": 3072, "thinking_budget": 1024},
+    {"class": "default", "max_output_tokens": 3072},
+]
+
+_GREETING_RE = re.compile(
+    r"^\s*(hi|hey|hello|hallo|hoi|yo|good (morning|afternoon|evening)|thanks|thank you|thx|bedankt|dank je)\b",
+    re.IGNORECASE,
+)
+
+_INTENT_KEYWORDS = {
+    "platform": (
+        "account", "password", "questionnaire", "match", "profile", "delete", "verify", "verification",
+        "settings", "onboarding", "domu", "support", "sign up", "signup", "log in", "login", "notification",
+    ),
+    "legal_money": (
+        "huurtoeslag", "wws", "huurcommissie", "rent check", "deposit", "contract", "bsn", "tax",
+        "zorgtoeslag", "insurance", "duo", "landlord", "scam",
+    ),
+    "local": (
+        "weekend", "tonight", "event", "festival", "concert", "weather", "things to do", "near me",
+        "restaurant", "bar", "club", "gym", "cafe", "coffee", "museum", "open now", "train", "ns",
+    ),
+}
+
+
+def _keyword_re(words) -> re.Pattern:
+    """Whole words or phrases, with an optional plural ("event" matches "events", not "prevent")."""
+    alternatives = "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+    return re.compile(r"\b(?:" + alternatives + r")(?:s|es)?\b")
+
+
+_INTENT_PATTERNS = {name: _keyword_re(words) for name, words in _INTENT_KEYWORDS.items()}
+
+_cache_lock = threading.Lock()
+_cache = {"source": None, "mtime": None, "table": DEFAULT_POLICY}
+
+
+def detect_intents(message: str) -> set:
+    """Cheap keyword intent guess (whole words only); a message can have several intents."""
+    lowered = (message or "").lower()
+    intents = {name for name, pattern in _INTENT_PATTERNS.items() if pattern.search(lowered)}
+    if _GREETING_RE.match(lowered):
+        intents.add("greeting")
+    return intents
+
+
+_INT_FIELDS = ("max_message_chars", "min_message_chars", "max_history", "min_history", "thinking_budget")
+
+
+def validate_policy(table) -> list:
+    """Return `table` if every rule is well-formed; raise ValueError naming the first bad field otherwise."""
+    if not isinstance(table, list) or not table:
+        raise ValueError("policy must be a non-empty list of rules")
+    for i, rule in enumerate(table):
+        if not isinstance(rule, dict) or not isinstance(rule.get("class"), str) or not rule["class"]:
+            raise ValueError(f"rule {i}: needs a non-empty string 'class'")
+        for field in _INT_FIELDS:
+            value = rule.get(field)
+            if field in rule and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+                raise ValueError(f"rule {i} ({rule['class']}): {field} must be a non-negative integer, got {value!r}")
+        value = rule.get("max_output_tokens")
+        if "max_output_tokens" in rule and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+            raise ValueError(f"rule {i} ({rule['class']}): max_output_tokens must be a positive integer, got {value!r}")
+        intents = rule.get("intents")
+        if "intents" in rule and (not isinstance(intents, list) or not all(isinstance(x, str) for x in intents)):
+            raise ValueError(f"rule {i} ({rule['class']}): intents must be a list of strings")
+        if rule.get("model") is not None and not isinstance(rule["model"], str):
+            raise ValueError(f"rule {i} ({rule['class']}): model must be a string or null")
+    return table
+
+
+def load_policy(strict: bool = False) -> list:
+    """
+    Return the active policy table (env override, else DEFAULT_POLICY).
+    An invalid override raises ValueError when `strict`; otherwise it is logged and the
+    last valid table (initially DEFAULT_POLICY) is kept.
+    """
+    raw = os.getenv("DOMU_GENERATION_POLICY", "").strip()
+    if not raw:
+        return DEFAULT_POLICY
+
+    mtime = None
+    if not raw.startswith("["):
+        try:
+            mtime = os.path.getmtime(raw)
+        except OSError:
+            if strict:
+                raise ValueError(f"DOMU_GENERATION_POLICY file not found: {raw}")
+            print("[Domu AI] DOMU_GENERATION_POLICY file not found:", raw)
+            return _cache["table"]
+
+    with _cache_lock:
+        if _cache["source"] == raw and _cache["mtime"] == mtime:
+            return _cache["table"]
+        try:
+            if mtime is None:
+                table = json.loads(raw)
+            else:
+                with open(raw, encoding="utf-8") as f:
+                    table = json.load(f)
+            validate_policy(table)
+        except Exception as e:
+            if strict:
+                raise ValueError(f"Invalid DOMU_GENERATION_POLICY: {e}") from e
+            print("[Domu AI] Invalid DOMU_GENERATION_POLICY, keeping the previous table:", e)
+            table = _cache["table"]
+        _cache.update(source=raw, mtime=mtime, table=table)
+        return table
+
+
+def _rule_matches(rule: dict, message_chars: int, history_len: int, intents: set) -> bool:
+    if "intents" in rule and not intents.intersection(rule["intents"]):
+        return False
+    if "max_message_chars" in rule and message_chars > rule["max_message_chars"]:
+        return False
+    if "min_message_chars" in rule and message_chars < rule["min_message_chars"]:
+        return False
+    if "max_history" in rule and history_len > rule["max_history"]:
+        return False
+    if "min_history" in rule and history_len < rule["min_history"]:
+        return False
+    return True
+
+
+def select_policy(message: str, history_len: int) -> dict:
+    """Classify a request and return its resolved generation settings."""
+    intents = detect_intents(message)
+    message_chars = len(message or "")
+    rule = next(
+        (r for r in load_policy() if _rule_matches(r, message_chars, history_len, intents)),
+        {"class": "default"},
+    )
+    return {
+        "class": rule["class"],
+        "max_output_tokens": int(rule.get("max_output_tokens", DEFAULT_MAX_OUTPUT_TOKENS)),
+        "thinking_budget": int(rule.get("thinking_budget", DEFAULT_THINKING_BUDGET)),
+        "model": rule.get("model") or None,
+        "intents": sorted(intents),
+    }
@@ -0,0 +1,201 @@
+"""
+Opt-in request profiling: sampled stacks in collapsed ("folded") format for flame graphs.
+
+Off unless DOMU_PROFILE=1. When off, profiled() returns the view unchanged, so there is
+no per-request cost at all. When on, a request is profiled if:
+  - it carries a valid X-Domu-Profile header: "<unix time>:<hex HMAC-SHA256(DOMU_PROFILE_SECRET, time)>",
+    at most 5 minutes old (generate one with `python -m domu_ai.profiling sign`), or
+  - it is picked by DOMU_PROFILE_SAMPLE_RATE (0..1, default 0).
+
+A profiled request is sampled every DOMU_PROFILE_INTERVAL_MS (default 5) from a
+background thread. All threads are sampled (the model call and search tool run on executor
+threads), so concurrent requests can show up too. Each stack is rooted at its thread name.
+Output goes to DOMU_PROFILE_DIR (default /tmp/domu_ai_profiles). Only the newest
+DOMU_PROFILE_KEEP files (default 50) are kept.
+
+Render with flamegraph.pl (`flamegraph.pl file.folded > out.svg`) or drop the file on
+https://www.speedscope.app.
+"""
+
+import argparse
+import functools
+import hashlib
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_HEADER = "X-Domu-Profile"
+SIGNATURE_MAX_AGE_S = 300
+
+
+def sign(secret: str, now: float = None) -> str:
+    """Header value that authorizes profiling one request for the next few minutes."""
+    stamp = str(int(now if now is not None else time.time()))
+    digest = hmac.new(secret.encode("utf-8"), stamp.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{stamp}:{digest}"
+
+
+def verify(value: str, secret: str, max_age_s: float = SIGNATURE_MAX_AGE_S) -> bool:
+    stamp, _, digest = (value or "").partition(":")
+    if not secret or not stamp.isdigit() or abs(time.time() - int(stamp)) > max_age_s:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), stamp.encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack at a fixed interval into collapsed-stack counts."""
+
+    def __init__(self, interval_s: float = 0.005):
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._run, name="domu-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class ProfileHook:
+    def __init__(self, directory: str, sample_rate: float = 0.0, secret: str = "", keep: int = 50,
+                 interval_s: float = 0.005):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.secret = secret
+        self.keep = keep
+        self.interval_s = interval_s
+        self._lock = threading.Lock()  # One profile at a time: samples are process-wide anyway
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        if os.getenv("DOMU_PROFILE", "0") != "1":
+            return None
+        return cls(
+            os.getenv("DOMU_PROFILE_DIR", "/tmp/domu_ai_profiles"),
+            sample_rate=float(os.getenv("DOMU_PROFILE_SAMPLE_RATE", "0")),
+            secret=os.getenv("DOMU_PROFILE_SECRET", ""),
+            keep=int(os.getenv("DOMU_PROFILE_KEEP", "50")),
+            interval_s=float(os.getenv("DOMU_PROFILE_INTERVAL_MS", "5")) / 1000.0,
+        )
+
+    def wanted(self, header_value: str) -> bool:
+        if header_value and verify(header_value, self.secret):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def run(self, name: str, fn):
+        """Call fn() under the sampler and write its collapsed stacks; returns (result, path)."""
+        if not self._lock.acquire(blocking=False):
+            return fn(), None  # Another request is being profiled
+        try:
+            profiler = SamplingProfiler(self.interval_s).start()
+            started = time.perf_counter()
+            try:
+                result = fn()
+            finally:
+                stacks = profiler.stop()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            path = self._write(name, elapsed_ms, stacks)
+            return result, path
+        finally:
+            self._lock.release()
+
+    def _write(self, name: str, elapsed_ms: float, stacks: Counter) -> str:
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}.{int(now * 1000) % 1000:03d}"
+        path = os.path.join(self.directory, f"{stamp}_{os.getpid()}_{name}_{elapsed_ms:.0f}ms.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self._enforce_retention()
+        return path
+
+    def _enforce_retention(self) -> None:
+        files = sorted(
+            (os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".folded")),
+            key=os.path.getmtime,
+        )
+        for old in files[:-max(1, self.keep)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def profiled(hook):
+    """Decorator for a Flask view: profile selected requests. Identity when hook is None."""
+
+    def decorate(view):
+        if hook is None:
+            return view
+        from flask import request
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not hook.wanted(request.headers.get(PROFILE_HEADER, "")):
+                return view(*args, **kwargs)
+            result, path = hook.run(view.__name__, lambda: view(*args, **kwargs))
+            if path:
+                print(f"[Domu AI] Profile written: {path}")
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("sign", help=f"Print an {PROFILE_HEADER} header value (uses DOMU_PROFILE_SECRET)")
+    p = sub.add_parser("list", help="List profiles, newest first")
+    p.add_argument("--dir", default=os.getenv("DOMU_PROFILE_DIR", "/tmp/domu_ai_profiles"))
+    args = parser.parse_args(argv)
+
+    if args.command == "sign":
+        secret = os.getenv("DOMU_PROFILE_SECRET", "")
+        if not secret:
+            print("DOMU_PROFILE_SECRET is not set", file=sys.stderr)
+            return 1
+        print(sign(secret))
+        return 0
+
+    if not os.path.isdir(args.dir):
+        return 0
+    for name in sorted(os.listdir(args.dir), reverse=True):
+        if name.endswith(".folded"):
+            print(os.path.join(args.dir, name))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
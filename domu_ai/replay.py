@@ -0,0 +1,247 @@
+"""
+Replay recorded chat traffic against the app and compare two configurations.
+
+Input is a domu_ai_chat_log export (.jsonl or .csv; uses user_message) or a JSONL file of
+{"message": ..., "history": [...]} requests. It is streamed: at most `concurrency`
+requests are in flight, and percentiles come from a fixed-size reservoir sample, so
+memory stays flat however long the file is.
+
+Each configuration runs in its own interpreter (the app reads its env at import), in
+process via Flask's test client, against a model backend:
+  --backend fake           start a local fake model server (domu_ai/fake_model.py)
+  --backend-url URL        an already running fake or recording server (GEMINI_BASE_URL)
+  --cassette PATH          answer model calls from a recorded cassette (domu_ai/cassette.py),
+                           sleeping the recorded time x --time-scale
+Supabase is disabled during replay so replayed traffic never lands in the chat log.
+
+    python -m domu_ai.replay run chat_log.jsonl --rate 20 --concurrency 16
+    python -m domu_ai.replay compare chat_log.jsonl --a DOMU_FAQ_FAST_PATH=1 --b DOMU_FAQ_FAST_PATH=0
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from domu_ai.metrics import percentile
+from domu_ai.usage import read_rows
+
+DEFAULT_SAMPLE_SIZE = 10_000
+
+
+def iter_requests(path: str, limit: int = 0):
+    """Yield {"message", "history"} dicts from a chat log export or request JSONL, lazily."""
+    rows = read_rows(path)
+    if limit:
+        rows = itertools.islice(rows, limit)
+    for row in rows:
+        message = (row.get("message") or row.get("user_message") or "").strip()
+        if message:
+            history = row.get("history") or []
+            if isinstance(history, str):
+                history = json.loads(history) if history.strip() else []
+            yield {"message": message, "history": history}
+
+
+class _Reservoir:
+    """Uniform fixed-size sample of a stream (Algorithm R) plus exact count/sum."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = []
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < self.size:
+                self.values[slot] = value
+
+
+def replay(requests, rate: float = 0.0, concurrency: int = 16, sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+    """Send requests to the in-process app, paced at `rate` req/s (0 = as fast as possible)."""
+    import api.index as service  # Imported here: the caller sets up the env first
+
+    latencies = _Reservoir(sample_size)
+    statuses = {}
+    degraded = 0
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def one(payload):
+        try:
+            with service.app.test_client() as client:
+                t0 = time.perf_counter()
+                resp = client.post("/chat", json=payload)
+                elapsed_ms = (time.perf_counter() - t0) * 1000
+            nonlocal degraded
+            with lock:
+                latencies.add(elapsed_ms)
+                statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+                degraded += bool((resp.get_json(silent=True) or {}).get("degraded"))
+        finally:
+            slots.release()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        for i, payload in enumerate(requests):
+            slots.acquire()  # Backpressure: never more than `concurrency` requests read ahead
+            if rate:
+                delay = started + i / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            ex.submit(one, payload)
+    wall_s = time.perf_counter() - started
+
+    usage = service._usage_totals.snapshot()["models"]
+    n = latencies.count
+    tokens = {
+        name: sum(m[name] for m in usage.values())
+        for name in ("prompt_tokens", "cached_tokens", "output_tokens", "thinking_tokens")
+    }
+    return {
+        "requests": n,
+        "wall_s": round(wall_s, 2),
+        "throughput_rps": round(n / wall_s, 2) if wall_s else None,
+        "latency_ms": {
+            "mean": round(latencies.total / n, 2) if n else None,
+            "p50": round(percentile(latencies.values, 50), 2) if n else None,
+            "p95": round(percentile(latencies.values, 95), 2) if n else None,
+            "p99": round(percentile(latencies.values, 99), 2) if n else None,
+        },
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+        "degraded": degraded,
+        "tokens": tokens,
+        "tokens_per_request": {name: round(v / n, 1) if n else None for name, v in tokens.items()},
+        "cost_usd": round(sum(m["cost_usd"] for m in usage.values()), 6),
+        "model_calls": sum(m["requests"] for m in usage.values()),
+    }
+
+
+def _run(args) -> int:
+    # Never write replayed traffic to the production chat log.
+    for name in ("NEXT_PUBLIC_SUPABASE_URL", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY"):
+        os.environ.pop(name, None)
+
+    server = None
+    if args.cassette:
+        from domu_ai.cassette import Cassette, CassetteServer
+
+        server = CassetteServer(Cassette(args.cassette, "replay", args.time_scale)).start()
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+    elif args.backend_url:
+        os.environ["GEMINI_BASE_URL"] = args.backend_url
+    elif args.backend == "fake":
+        from domu_ai.fake_model import FakeModelServer
+
+        server = FakeModelServer(latency_ms=args.latency_ms).start()
+        os.environ["GEMINI_BASE_URL"] = server.base_url
+    if os.getenv("GEMINI_BASE_URL"):
+        # Local backend: don't send real keys to it.
+        os.environ["GEMINI_API_KEYS"] = os.getenv("DOMU_REPLAY_KEYS", "replay-key-0001")
+        os.environ.pop("GEMINI_API_KEY", None)
+        os.environ.pop("GOOGLE_API_KEY", None)
+
+    try:
+        summary = replay(iter_requests(args.path, args.limit), args.rate, args.concurrency, args.sample_size)
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps(summary, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+def _parse_env(pairs) -> dict:
+    env = {}
+    for pair in pairs or []:
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"Expected KEY=VALUE, got {pair!r}")
+        env[name.strip()] = value
+    return env
+
+
+def _delta(a, b):
+    if isinstance(a, dict):
+        return {k: _delta(a.get(k), b.get(k)) for k in a if isinstance(a.get(k), (int, float, dict))}
+    if a is None or b is None:
+        return None
+    return {"a": a, "b": b, "delta": round(b - a, 3), "pct": round((b - a) / a * 100, 1) if a else None}
+
+
+def _compare(args) -> int:
+    results = {}
+    for label, pairs in (("a", args.a), ("b", args.b)):
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            out = tmp.name
+        cmd = [sys.executable, "-m", "domu_ai.replay", "run", args.path, "--out", out,
+               "--rate", str(args.rate), "--concurrency", str(args.concurrency),
+               "--limit", str(args.limit), "--sample-size", str(args.sample_size)]
+        if args.cassette:
+            cmd += ["--cassette", args.cassette, "--time-scale", str(args.time_scale)]
+        elif args.backend_url:
+            cmd += ["--backend-url", args.backend_url]
+        else:
+            cmd += ["--backend", args.backend, "--latency-ms", str(args.latency_ms)]
+        print(f"[Domu AI] Replaying config {label}: {pairs or '(current env)'}", file=sys.stderr)
+        subprocess.run(cmd, env={**os.environ, **_parse_env(pairs)}, check=True,
+                       stdout=subprocess.DEVNULL if not args.verbose else None)
+        with open(out) as f:
+            results[label] = json.load(f)
+        os.remove(out)
+
+    keys = ("throughput_rps", "latency_ms", "tokens_per_request", "cost_usd", "model_calls", "degraded")
+    print(json.dumps({
+        "a": {"env": _parse_env(args.a), **results["a"]},
+        "b": {"env": _parse_env(args.b), **results["b"]},
+        "delta_b_minus_a": {k: _delta(results["a"][k], results["b"][k]) for k in keys},
+    }, indent=2))
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "compare"):
+        p = sub.add_parser(name)
+        p.add_argument("path", help="Chat log export (.jsonl/.csv) or request JSONL")
+        p.add_argument("--rate", type=float, default=0.0, help="Requests per second (0 = unpaced)")
+        p.add_argument("--concurrency", type=int, default=16)
+        p.add_argument("--limit", type=int, default=0, help="Replay only the first N requests")
+        p.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE, help="Latency reservoir size")
+        p.add_argument("--backend", choices=("fake", "env"), default="fake",
+                       help="fake: start a local fake model server; env: use GEMINI_BASE_URL / real keys as set")
+        p.add_argument("--backend-url", help="Running fake/recording model server (overrides --backend)")
+        p.add_argument("--latency-ms", type=float, default=300.0, help="Fake backend latency")
+        p.add_argument("--cassette", help="Replay model calls from this cassette (overrides --backend)")
+        p.add_argument("--time-scale", type=float, default=1.0, help="Cassette timing multiplier (0 = no delay)")
+        if name == "run":
+            p.add_argument("--out", help="Write the JSON summary here instead of stdout")
+        else:
+            p.add_argument("--a", action="append", metavar="KEY=VALUE", help="Env override for config A (repeatable)")
+            p.add_argument("--b", action="append", metavar="KEY=VALUE", help="Env override for config B (repeatable)")
+            p.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args(argv)
+    return _run(args) if args.command == "run" else _compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
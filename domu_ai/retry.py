@@ -0,0 +1,123 @@
+"""
+Retries for transient upstream errors (Gemini, Supabase) with jittered backoff.
+
+- Only retryable errors are retried: timeouts, connection resets, 408/429/5xx and their
+  gRPC-style statuses. Bad requests, auth errors and the like fail immediately.
+- Backoff is "full jitter" (random between 0 and base * 2^attempt, capped) and never
+  sleeps past the caller's deadline.
+- A process-wide RetryBudget caps retries to a fraction of traffic (default 10%, plus a
+  small burst allowance), so retries cannot multiply load during an overload.
+"""
+
+import random
+import threading
+import time
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+_RETRYABLE_MARKERS = (
+    "DEADLINE_EXCEEDED",
+    "UNAVAILABLE",
+    "RESOURCE_EXHAUSTED",
+    "INTERNAL",
+    "deadline",
+    "timed out",
+    "timeout",
+    "temporarily unavailable",
+    "connection reset",
+    "connection aborted",
+    "connection refused",
+    "server disconnected",
+)
+# Exception class names from httpx / requests / stdlib that indicate a transient network failure.
+_RETRYABLE_TYPES = {
+    "TimeoutError",
+    "ConnectionError",
+    "ConnectionResetError",
+    "ConnectError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "ReadError",
+    "WriteTimeout",
+    "PoolTimeout",
+    "RemoteProtocolError",
+}
+
+
+def is_retryable(exc: BaseException) -> bool:
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_CODES
+    if type(exc).__name__ in _RETRYABLE_TYPES:
+        return True
+    raw = str(exc)
+    return any(marker in raw for marker in _RETRYABLE_MARKERS)
+
+
+class RetryBudget:
+    """Token bucket: every call deposits `ratio` tokens, every retry spends one."""
+
+    def __init__(self, ratio: float = 0.1, burst: float = 10.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "retries": 0, "budget_exhausted": 0, "deadline_exceeded": 0, "not_retryable": 0}
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._stats["calls"] += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1.0:
+                self._stats["budget_exhausted"] += 1
+                return False
+            self._tokens -= 1.0
+            self._stats["retries"] += 1
+            return True
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "tokens": round(self._tokens, 2)}
+
+
+def backoff_delay(attempt: int, base_s: float = 0.25, cap_s: float = 4.0) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (1-based)."""
+    return random.uniform(0, min(cap_s, base_s * (2 ** (attempt - 1))))
+
+
+def call_with_retry(fn, budget: RetryBudget, deadline: float, max_attempts: int = 3, base_s: float = 0.25,
+                    cap_s: float = 4.0, on_retry=None):
+    """
+    Call fn(attempt) (attempt starts at 1) until it succeeds, the error is not retryable,
+    attempts run out, the retry budget is empty, or the backoff would cross `deadline`
+    (a time.monotonic() value). The last error is re-raised.
+    on_retry(exc, attempt) runs before each retry (e.g. to switch API keys); it may re-raise
+    exc to stop retrying.
+    """
+    budget.record_call()
+    attempt = 1
+    while True:
+        try:
+            return fn(attempt)
+        except Exception as e:
+            if not is_retryable(e):
+                budget.count("not_retryable")
+                raise
+            if attempt >= max_attempts:
+                raise
+            delay = backoff_delay(attempt, base_s, cap_s)
+            if time.monotonic() + delay >= deadline:
+                budget.count("deadline_exceeded")
+                raise
+            if not budget.try_spend():
+                raise
+            if on_retry is not None:
+                on_retry(e, attempt)
+            time.sleep(delay)
+            attempt += 1
@@ -0,0 +1,178 @@
+"""
+Post-processing for search_internet results before they go back to Gemini.
+
+DuckDuckGo is asked for a few more candidates than we return. Candidates are then
+deduplicated (same URL or near-identical snippet), reranked locally, and cut down to
+a token budget, so the next model turn gets fewer, denser tokens.
+
+Ranking follows SEARCH_STRATEGY in knowledge/data.py: official sources (police,
+government, municipalities, universities, DUO/Huurcommissie, ...) are preferred over
+generic aggregators and social media.
+"""
+
+import re
+from urllib.parse import urlparse
+
+# Rough chars-per-token ratio for budgeting (English/Dutch prose).
+CHARS_PER_TOKEN = 4
+
+# Domain suffix -> trust bonus. Matched against the host and its parent domains.
+TRUSTED_DOMAINS = {
+    # Police / national government / agencies
+    "politie.nl": 3.0,
+    "government.nl": 3.0,
+    "rijksoverheid.nl": 3.0,
+    "overheid.nl": 2.5,
+    "belastingdienst.nl": 2.5,
+    "toeslagen.nl": 2.5,
+    "huurcommissie.nl": 2.5,
+    "duo.nl": 2.5,
+    "ind.nl": 2.5,
+    "juridischloket.nl": 2.0,
+    "ns.nl": 2.0,
+    "9292.nl": 1.5,
+    "nuffic.nl": 2.0,
+    "studyinnl.org": 2.0,
+    # Municipalities of major student cities
+    "amsterdam.nl": 2.0,
+    "rotterdam.nl": 2.0,
+    "utrecht.nl": 2.0,
+    "denhaag.nl": 2.0,
+    "leiden.nl": 2.0,
+    "groningen.nl": 2.0,
+    "eindhoven.nl": 2.0,
+    "nijmegen.nl": 2.0,
+    "breda.nl": 2.0,
+    "tilburg.nl": 2.0,
+    "gemeentemaastricht.nl": 2.0,
+    "delft.nl": 2.0,
+    "enschede.nl": 2.0,
+    # Universities (housing pages live under these)
+    "uva.nl": 2.0,
+    "vu.nl": 2.0,
+    "hva.nl": 2.0,
+    "uu.nl": 2.0,
+    "hu.nl": 2.0,
+    "eur.nl": 2.0,
+    "leidenuniv.nl": 2.0,
+    "rug.nl": 2.0,
+    "hanze.nl": 2.0,
+    "tudelft.nl": 2.0,
+    "tue.nl": 2.0,
+    "fontys.nl": 2.0,
+    "ru.nl": 2.0,
+    "han.nl": 2.0,
+    "avans.nl": 2.0,
+    "buas.nl": 2.0,
+    "tilburguniversity.edu": 2.0,
+    "maastrichtuniversity.nl": 2.0,
+    "utwente.nl": 2.0,
+    "saxion.nl": 2.0,
+    "wur.nl": 2.0,
+    "inholland.nl": 2.0,
+    "hhs.nl": 2.0,
+}
+
+# Low-signal sources: social media, Q&A farms, pinboards.
+LOW_TRUST_DOMAINS = {
+    "pinterest.com": -2.0,
+    "quora.com": -1.5,
+    "facebook.com": -1.0,
+    "instagram.com": -1.0,
+    "tiktok.com": -1.5,
+    "x.com": -1.0,
+    "twitter.com": -1.0,
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _host(href: str) -> str:
+    try:
+        host = (urlparse(href).hostname or "").lower()
+    except ValueError:
+        return ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def domain_score(href: str) -> float:
+    """Trust bonus/penalty for a result URL (0.0 for unknown domains)."""
+    host = _host(href)
+    parts = host.split(".")
+    for i in range(len(parts) - 1):
+        suffix = ".".join(parts[i:])
+        if suffix in TRUSTED_DOMAINS:
+            return TRUSTED_DOMAINS[suffix]
+        if suffix in LOW_TRUST_DOMAINS:
+            return LOW_TRUST_DOMAINS[suffix]
+    return 0.0
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _canonical_url(href: str) -> str:
+    parsed = urlparse(href or "")
+    return f"{_host(href)}{parsed.path.rstrip('/')}"
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, preferring a sentence or word boundary."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit]
+    sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end >= limit // 2:
+        return cut[:sentence_end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+def compact_results(query: str, raw_results: list, limit: int = 3, body_tokens: int = 100,
+                    duplicate_threshold: float = 0.6) -> list:
+    """
+    Dedupe, rerank and trim raw DDGS results ({title, body, href}) for the model.
+    Returns at most `limit` results with bodies cut to about `body_tokens` tokens.
+    """
+    query_terms = set(_WORD.findall((query or "").lower()))
+    candidates = []
+    for position, r in enumerate(raw_results or []):
+        title = (r.get("title") or "").strip()
+        body = (r.get("body") or "").strip()
+        href = (r.get("href") or "").strip()
+        if not (title or body):
+            continue
+        words = set(_WORD.findall(f"{title} {body}".lower()))
+        relevance = len(query_terms & words) / len(query_terms) if query_terms else 0.0
+        score = 2.0 * relevance + domain_score(href) - 0.1 * position
+        candidates.append({"title": title, "body": body, "href": href, "score": score, "shingles": _shingles(body)})
+
+    candidates.sort(key=lambda c: c["score"], reverse=True)
+
+    kept = []
+    seen_urls = set()
+    for c in candidates:
+        url = _canonical_url(c["href"])
+        if url and url in seen_urls:
+            continue
+        duplicate = any(
+            c["shingles"] and k["shingles"]
+            and len(c["shingles"] & k["shingles"]) / len(c["shingles"] | k["shingles"]) >= duplicate_threshold
+            for k in kept
+        )
+        if duplicate:
+            continue
+        seen_urls.add(url)
+        kept.append(c)
+        if len(kept) >= limit:
+            break
+
+    return [
+        {"title": truncate_to_tokens(c["title"], 30), "body": truncate_to_tokens(c["body"], body_tokens), "href": c["href"]}
+        for c in kept
+    ]
@@ -0,0 +1,313 @@
+"""
+Durable SQLite store for search_internet results with near-duplicate lookup.
+
+Queries are normalized to a sorted set of content words ("cheap gyms breda" and
+"breda cheap gym" both become "breda cheap gym"), stored with a TTL, and indexed
+with FTS5. A lookup first tries the exact normalized key, then asks FTS5 for stored
+queries containing enough of the same words and accepts the closest one above a
+Jaccard similarity threshold. A near-duplicate may only add or drop words, never swap
+one: "vegan pizza amsterdam open late" is never answered with the results for
+"vegan pizza rotterdam open late" (one term set must contain the other).
+
+The file lives at DOMU_SEARCH_DB (default: <tmp>/domu_search.sqlite3; "0" disables
+it), so it survives across requests on a warm instance and across restarts on
+self-hosted deployments.
+
+Maintenance / benchmarks:
+    python -m domu_ai.search_store stats
+    python -m domu_ai.search_store compact [--vacuum]
+    python -m domu_ai.search_store evict --max-rows 200000
+    python -m domu_ai.search_store --db /tmp/bench.sqlite3 bench --rows 1000000
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_TTL_S = 6 * 3600
+DEFAULT_SIMILARITY = 0.75
+DEFAULT_MAX_ROWS = 200_000
+# How many FTS candidates to score, and how many term subsets to try, for a near-duplicate lookup.
+_FTS_CANDIDATES = 20
+_FTS_MAX_SUBSETS = 16
+
+_STOPWORDS = frozenset(
+    "a an and are at best can do does find for from good how i in is it me my near of on or the to what "
+    "when where which who with".split()
+)
+_WORD = re.compile(r"[a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    id INTEGER PRIMARY KEY,
+    norm_query TEXT NOT NULL UNIQUE,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_searches_expires_at ON searches (expires_at);
+CREATE INDEX IF NOT EXISTS idx_searches_last_used ON searches (COALESCE(last_hit_at, created_at));
+CREATE VIRTUAL TABLE IF NOT EXISTS searches_fts USING fts5(
+    norm_query, content='searches', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS searches_ai AFTER INSERT ON searches BEGIN
+    INSERT INTO searches_fts (rowid, norm_query) VALUES (new.id, new.norm_query);
+END;
+CREATE TRIGGER IF NOT EXISTS searches_ad AFTER DELETE ON searches BEGIN
+    INSERT INTO searches_fts (searches_fts, rowid, norm_query) VALUES ('delete', old.id, old.norm_query);
+END;
+CREATE TRIGGER IF NOT EXISTS searches_au AFTER UPDATE OF norm_query ON searches BEGIN
+    INSERT INTO searches_fts (searches_fts, rowid, norm_query) VALUES ('delete', old.id, old.norm_query);
+    INSERT INTO searches_fts (rowid, norm_query) VALUES (new.id, new.norm_query);
+END;
+"""
+
+
+def normalize_terms(query: str) -> list:
+    """Sorted unique content words, with a naive plural strip ("gyms" -> "gym")."""
+    terms = set()
+    for word in _WORD.findall((query or "").lower()):
+        if word in _STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return sorted(terms)
+
+
+def default_path() -> str:
+    return os.getenv("DOMU_SEARCH_DB") or os.path.join(tempfile.gettempdir(), "domu_search.sqlite3")
+
+
+class SearchStore:
+    def __init__(self, path: str, ttl_s: float = DEFAULT_TTL_S, similarity: float = DEFAULT_SIMILARITY):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "near_hits": 0, "misses": 0, "writes": 0}
+        self._conn().executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Store configured from env, or None when disabled (DOMU_SEARCH_DB=0)."""
+        if os.getenv("DOMU_SEARCH_DB", "").strip() == "0":
+            return None
+        return cls(
+            default_path(),
+            ttl_s=float(os.getenv("DOMU_SEARCH_TTL_S", str(DEFAULT_TTL_S))),
+            similarity=float(os.getenv("DOMU_SEARCH_SIMILARITY", str(DEFAULT_SIMILARITY))),
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections must not be shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _candidates(self, conn, terms: list, now: float) -> list:
+        """
+        Stored queries that could reach the similarity threshold. A match needs at least
+        ceil(similarity * len(terms)) of our terms, so FTS5 is asked for rows containing
+        every such subset (AND queries stay selective even when single words are common).
+        """
+        keep = max(1, math.ceil(self.similarity * len(terms)))
+        rows = {}
+        for subset in itertools.islice(itertools.combinations(terms, keep), _FTS_MAX_SUBSETS):
+            match = " AND ".join(f'"{t}"' for t in subset)
+            for row in conn.execute(
+                "SELECT s.id, s.norm_query, s.results FROM searches_fts "
+                "JOIN searches s ON s.id = searches_fts.rowid "
+                "WHERE searches_fts MATCH ? AND s.expires_at > ? LIMIT ?",
+                (match, now, _FTS_CANDIDATES),
+            ):
+                rows[row[0]] = row
+            if len(rows) >= _FTS_CANDIDATES:
+                break
+        return list(rows.values())
+
+    def get(self, query: str):
+        """Stored results for this query or a near-duplicate of it, or None."""
+        terms = normalize_terms(query)
+        if not terms:
+            return None
+        conn = self._conn()
+        now = time.time()
+        key = " ".join(terms)
+
+        row = conn.execute(
+            "SELECT id, results FROM searches WHERE norm_query = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is not None:
+            self._count("exact_hits")
+        else:
+            wanted = set(terms)
+            best = None
+            for row_id, norm_query, results in self._candidates(conn, terms, now):
+                stored = set(norm_query.split(" "))
+                if not (wanted <= stored or stored <= wanted):
+                    continue  # A swapped term (another city, another dish) is a different question
+                similarity = len(wanted & stored) / len(wanted | stored)
+                if similarity >= self.similarity and (best is None or similarity > best[0]):
+                    best = (similarity, row_id, results)
+            if best is None:
+                self._count("misses")
+                return None
+            row = best[1:]
+            self._count("near_hits")
+
+        conn.execute("UPDATE searches SET hits = hits + 1, last_hit_at = ? WHERE id = ?", (now, row[0]))
+        return json.loads(row[1])
+
+    def put(self, query: str, results: list) -> None:
+        terms = normalize_terms(query)
+        if not terms or not results:
+            return
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO searches (norm_query, query, results, created_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (norm_query) DO UPDATE SET query = excluded.query, results = excluded.results, "
+            "created_at = excluded.created_at, expires_at = excluded.expires_at",
+            (" ".join(terms), query, json.dumps(results, ensure_ascii=False), now, now + self.ttl_s),
+        )
+        self._count("writes")
+
+    def compact(self, vacuum: bool = False) -> int:
+        """Delete expired rows and merge FTS segments; returns the number of rows removed."""
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM searches WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.execute("INSERT INTO searches_fts (searches_fts) VALUES ('optimize')")
+        if vacuum:
+            conn.execute("VACUUM")
+        return removed
+
+    def evict(self, max_rows: int = DEFAULT_MAX_ROWS) -> int:
+        """Keep at most max_rows, dropping the least recently used first."""
+        conn = self._conn()
+        total = conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        excess = total - max_rows
+        if excess <= 0:
+            return 0
+        return conn.execute(
+            "DELETE FROM searches WHERE id IN ("
+            "SELECT id FROM searches ORDER BY COALESCE(last_hit_at, created_at) LIMIT ?)",
+            (excess,),
+        ).rowcount
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            out = dict(self._stats)
+        out["rows"] = self._conn().execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return out
+
+
+# --- CLI ---
+
+_BENCH_WORDS = (
+    "cheap student gym breda amsterdam rotterdam utrecht leiden groningen eindhoven nijmegen tilburg delft "
+    "events weekend festival concert housing room rent huurtoeslag bsn registration bank insurance coffee "
+    "study spot library bike swapfiets train ns discount museum party club market vintage food vegan pizza "
+    "sushi late night open sunday laptop quiet wifi internship career fair sport football climbing"
+).split()
+
+
+def _bench(args) -> None:
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    store = SearchStore(args.db)
+    conn = store._conn()
+    rng = random.Random(42)
+    payload = json.dumps([{"title": "t", "body": "b" * 300, "href": "https://example.org"}] * 3)
+    now = time.time()
+
+    started = time.perf_counter()
+    stored = []
+    conn.execute("BEGIN")
+    for i in range(args.rows):
+        terms = normalize_terms(" ".join(rng.sample(_BENCH_WORDS, rng.randint(2, 5)) + [f"q{i}"]))
+        key = " ".join(terms)
+        conn.execute(
+            "INSERT OR IGNORE INTO searches (norm_query, query, results, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (key, key, payload, now, now + DEFAULT_TTL_S),
+        )
+        if i % max(1, args.rows // args.lookups) == 0:
+            stored.append(terms)
+    conn.execute("COMMIT")
+    conn.execute("INSERT INTO searches_fts (searches_fts) VALUES ('optimize')")
+    build_s = time.perf_counter() - started
+
+    def timed(queries):
+        samples = []
+        for q in queries:
+            t = time.perf_counter()
+            store.get(q)
+            samples.append((time.perf_counter() - t) * 1000)
+        samples.sort()
+        return {"p50_ms": round(samples[len(samples) // 2], 3), "p95_ms": round(samples[int(len(samples) * 0.95)], 3)}
+
+    exact = [" ".join(reversed(t)) for t in stored[: args.lookups]]
+    near = [" ".join(t + ["tonight"]) for t in stored[: args.lookups]]
+    misses = [f"zz{i} unknown query" for i in range(args.lookups)]
+    report = {
+        "rows": args.rows,
+        "build_s": round(build_s, 1),
+        "db_mb": round(os.path.getsize(args.db) / 1e6, 1),
+        "exact": timed(exact),
+        "near_duplicate": timed(near),
+        "miss": timed(misses),
+        "stats": store.stats(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=None, help="SQLite path (default: DOMU_SEARCH_DB or <tmp>/domu_search.sqlite3)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    p = sub.add_parser("compact")
+    p.add_argument("--vacuum", action="store_true")
+    p = sub.add_parser("evict")
+    p.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS)
+    p = sub.add_parser("bench")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        args.db = args.db or os.path.join(tempfile.gettempdir(), "domu_search_bench.sqlite3")
+        _bench(args)
+        return 0
+
+    store = SearchStore(args.db or default_path())
+    if args.command == "compact":
+        print(f"Removed {store.compact(vacuum=args.vacuum)} expired rows")
+    elif args.command == "evict":
+        print(f"Evicted {store.evict(args.max_rows)} rows")
+    print(json.dumps(store.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
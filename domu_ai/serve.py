@@ -0,0 +1,26 @@
+"""
+Self-hosted entry point: run api/index.py:app under gunicorn with gunicorn.conf.py.
+
+    pip install -r requirements-serve.txt
+    python -m domu_ai.serve [extra gunicorn args, e.g. --workers 4]
+
+See docs/DOMU_AI_SERVING.md for tuning and the benchmark against a plain WSGI setup.
+"""
+
+import os
+import sys
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main(argv=None) -> None:
+    args = list(sys.argv[1:] if argv is None else argv)
+    os.chdir(_PROJECT_ROOT)
+    os.execvp(
+        sys.executable,
+        [sys.executable, "-m", "gunicorn", "-c", os.path.join(_PROJECT_ROOT, "gunicorn.conf.py"), *args, "api.index:app"],
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Server-side conversation history, so clients can send only the new message.
+
+Sessions are opt-in. A client that sends {"message": ..., "conversation_id": ...} (and no
+"history") gets its earlier turns from the session store. Every answered turn is appended,
+and the response carries the conversation_id to use next time. To start a conversation
+the client sends "session": true; the server then mints a random UUID, which works like
+a bearer secret. Clients that send "history", or only a "message", keep the old
+full-history behavior, and the store is not touched.
+
+Stores (DOMU_SESSION_STORE):
+  memory   in-process LRU (DOMU_SESSION_MAX, default 5000 conversations), fine for one
+           process or local development
+  upstash  shared Upstash Redis over REST (UPSTASH_REDIS_REST_URL/TOKEN or the KV_REST_API_*
+           names, as in lib/upstash-env.ts); one Redis list per conversation, trimmed and
+           expired on every append
+  off      sessions disabled
+Default: upstash when its credentials are set, else memory. Conversations expire after
+DOMU_SESSION_TTL_S of inactivity (default 24 h).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+
+_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+KEY_PREFIX = "domu:conv:"
+
+
+def new_conversation_id() -> str:
+    return uuid.uuid4().hex
+
+
+def valid_conversation_id(value) -> bool:
+    return isinstance(value, str) and bool(_ID_RE.match(value))
+
+
+class MemorySessionStore:
+    """Thread-safe LRU of conversation histories with idle expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_messages: int, max_sessions: int = 5000, ttl_s: float = 86400.0):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # id -> (expires_at, [entries])
+        self._stats = {"hits": 0, "misses": 0, "appends": 0, "evictions": 0}
+
+    def get(self, conversation_id: str) -> list:
+        now = time.monotonic()
+        with self._lock:
+            item = self._sessions.get(conversation_id)
+            if item is None or item[0] < now:
+                self._sessions.pop(conversation_id, None)
+                self._stats["misses"] += 1
+                return []
+            self._sessions.move_to_end(conversation_id)
+            self._stats["hits"] += 1
+            return list(item[1])
+
+    def append(self, conversation_id: str, entries: list) -> None:
+        with self._lock:
+            item = self._sessions.pop(conversation_id, None)
+            history = (item[1] if item else []) + entries
+            self._sessions[conversation_id] = (time.monotonic() + self.ttl_s, history[-self.max_messages:])
+            self._stats["appends"] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"store": self.name, "sessions": len(self._sessions), **self._stats}
+
+
+class UpstashSessionStore:
+    """Conversation histories as Redis lists in Upstash, via its REST pipeline endpoint."""
+
+    name = "upstash"
+
+    def __init__(self, url: str, token: str, max_messages: int, ttl_s: float = 86400.0, timeout_s: float = 2.0):
+        self.url = url.rstrip("/")
+        self.token = token
+        self.max_messages = max_messages
+        self.ttl_s = int(ttl_s)
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "appends": 0, "errors": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _pipeline(self, commands: list) -> list:
+        req = urllib.request.Request(
+            self.url + "/pipeline",
+            data=json.dumps(commands).encode("utf-8"),
+            headers={"Authorization": f"Bearer {self.token}", "Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=self.timeout_s) as resp:
+            results = json.loads(resp.read())
+        errors = [r["error"] for r in results if r.get("error")]
+        if errors:
+            raise RuntimeError(f"Upstash error: {errors[0]}")
+        return [r.get("result") for r in results]
+
+    def get(self, conversation_id: str) -> list:
+        try:
+            raw = self._pipeline([["LRANGE", KEY_PREFIX + conversation_id, 0, -1]])[0] or []
+        except Exception as e:
+            self._count("errors")
+            print("[Domu AI] Session store read failed:", repr(e))
+            return []
+        self._count("hits" if raw else "misses")
+        return [json.loads(item) for item in raw]
+
+    def append(self, conversation_id: str, entries: list) -> None:
+        key = KEY_PREFIX + conversation_id
+        try:
+            self._pipeline([
+                ["RPUSH", key, *[json.dumps(e, ensure_ascii=False) for e in entries]],
+                ["LTRIM", key, -self.max_messages, -1],
+                ["EXPIRE", key, self.ttl_s],
+            ])
+            self._count("appends")
+        except Exception as e:
+            self._count("errors")
+            print("[Domu AI] Session store write failed:", repr(e))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"store": self.name, **self._stats}
+
+
+def _upstash_credentials():
+    """Same env names and placeholder filtering as lib/upstash-env.ts."""
+    url = (os.getenv("UPSTASH_REDIS_REST_URL") or os.getenv("KV_REST_API_URL") or "").strip()
+    token = (os.getenv("UPSTASH_REDIS_REST_TOKEN") or os.getenv("KV_REST_API_TOKEN") or "").strip()
+    if not url or not token:
+        return None
+    u, t = url.lower(), token.lower()
+    if "your-redis-instance" in u or ("upstash.io" in u and ("your_" in t or "your-" in t or "token_here" in t)):
+        return None
+    return url, token
+
+
+def session_store_from_env(max_messages: int):
+    kind = os.getenv("DOMU_SESSION_STORE", "").strip().lower()
+    ttl_s = float(os.getenv("DOMU_SESSION_TTL_S", "86400"))
+    if kind == "off":
+        return None
+    credentials = _upstash_credentials()
+    if kind == "upstash" or (not kind and credentials):
+        if credentials is None:
+            print("[Domu AI] DOMU_SESSION_STORE=upstash but Upstash credentials are missing; using memory")
+        else:
+            return UpstashSessionStore(*credentials, max_messages=max_messages, ttl_s=ttl_s)
+    return MemorySessionStore(max_messages, int(os.getenv("DOMU_SESSION_MAX", "5000")), ttl_s)
@@ -0,0 +1,252 @@
+"""
+Cross-worker shared cache for the compiled system prompt and hot search results.
+
+When the app runs under a multi-process server, every worker otherwise rebuilds the
+prompt (reloading knowledge.data) and keeps its own search cache. This module maps one
+file (ideally on tmpfs, e.g. /dev/shm/domu_ai.cache) into every worker:
+
+    header | prompt region | search slots
+
+- Prompt region: one JSON document {"key": <knowledge source key>, "prompts": {name: text}},
+  with a hash of the key in the region header. A worker that finds it stale builds the
+  prompts once locally and publishes them; the publish is skipped if another worker already
+  stored that key while it was building (checked under the file lock).
+- Search slots: a fixed-size, direct-mapped hash table keyed by the normalized query.
+  Any worker may write a slot (under an exclusive flock on the cache file).
+
+Every region/slot starts with a sequence number (seqlock): writers make it odd while
+writing and even when done, readers retry if it changed under them, so reads take no lock.
+
+Enabled by DOMU_SHARED_CACHE_PATH (unset = off, e.g. on Vercel).
+
+Measure per-worker memory and hit rates:
+    python -m domu_ai.shared_cache bench --workers 4 --requests 500
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+MAGIC = b"DOMUSHM2"
+_HEADER = struct.Struct("<8sIII")  # magic, prompt_region_size, slot_count, slot_size
+_HEADER_SIZE = 64
+_SEQ = struct.Struct("<Q")
+_PROMPT_META = struct.Struct("<Q8sI")  # seq, key hash, length
+_SLOT_META = struct.Struct("<Q8sdI")  # seq, key hash, expires_at (unix), length
+
+DEFAULT_PROMPT_REGION = 1 << 20  # 1 MiB
+DEFAULT_SLOT_COUNT = 1024
+DEFAULT_SLOT_SIZE = 8 << 10  # 8 KiB per search result set
+DEFAULT_SEARCH_TTL_S = 15 * 60
+_READ_RETRIES = 4
+
+
+def _key_hash(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+
+class SharedCache:
+    def __init__(self, path: str, prompt_region: int = DEFAULT_PROMPT_REGION, slot_count: int = DEFAULT_SLOT_COUNT,
+                 slot_size: int = DEFAULT_SLOT_SIZE, search_ttl_s: float = DEFAULT_SEARCH_TTL_S):
+        self.path = path
+        self.search_ttl_s = search_ttl_s
+        size = _HEADER_SIZE + prompt_region + slot_count * slot_size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._mm = mmap.mmap(self._fd, 0)
+            magic, region, count, slot = _HEADER.unpack_from(self._mm, 0)
+            if magic != MAGIC:
+                _HEADER.pack_into(self._mm, 0, MAGIC, prompt_region, slot_count, slot_size)
+                region, count, slot = prompt_region, slot_count, slot_size
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        # Layout always comes from the file, so workers agree even if their env differs.
+        self.prompt_region, self.slot_count, self.slot_size = region, count, slot
+        self._slots_offset = _HEADER_SIZE + region
+
+        self._local_lock = threading.Lock()
+        self._prompt_memo = (None, None)  # (seq, parsed document) to avoid re-decoding every request
+        self._stats = {"prompt_hits": 0, "prompt_misses": 0, "prompt_writes": 0, "prompt_write_skips": 0,
+                       "search_hits": 0, "search_misses": 0, "search_writes": 0}
+
+    @classmethod
+    def from_env(cls):
+        path = os.getenv("DOMU_SHARED_CACHE_PATH", "").strip()
+        return cls(path) if path else None
+
+    def _count(self, name: str) -> None:
+        with self._local_lock:
+            self._stats[name] += 1
+
+    # --- locking / seqlock helpers ---
+
+    def _write(self, offset: int, meta: struct.Struct, fields: tuple, data: bytes, skip_if=None) -> bool:
+        """Write one region/slot under the file lock; `skip_if(current meta fields)` can veto it."""
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if skip_if is not None and skip_if(meta.unpack_from(self._mm, offset)):
+                return False
+            seq = _SEQ.unpack_from(self._mm, offset)[0]
+            _SEQ.pack_into(self._mm, offset, seq + 1)  # odd: write in progress
+            meta.pack_into(self._mm, offset, seq + 1, *fields)
+            start = offset + meta.size
+            self._mm[start:start + len(data)] = data
+            _SEQ.pack_into(self._mm, offset, seq + 2)
+            return True
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self, offset: int, meta: struct.Struct):
+        """Consistent (meta fields, data bytes) snapshot, or None if a writer kept interfering."""
+        for _ in range(_READ_RETRIES):
+            fields = meta.unpack_from(self._mm, offset)
+            if fields[0] % 2:
+                continue
+            start = offset + meta.size
+            data = self._mm[start:start + fields[-1]]
+            if _SEQ.unpack_from(self._mm, offset)[0] == fields[0]:
+                return fields, data
+        return None
+
+    # --- compiled prompt ---
+
+    def get_prompt(self, key: str, name: str = "default"):
+        """Compiled prompt `name` if the shared copy was built from source `key`, else None."""
+        seq, hashed, _ = _PROMPT_META.unpack_from(self._mm, _HEADER_SIZE)
+        memo_seq, doc = self._prompt_memo
+        if hashed != _key_hash(key):
+            doc = None  # Stale (or empty): don't decode it
+        elif memo_seq != seq or seq % 2:
+            snapshot = self._read(_HEADER_SIZE, _PROMPT_META)
+            doc = None
+            if snapshot is not None and snapshot[0][2]:
+                doc = json.loads(snapshot[1])
+                self._prompt_memo = (snapshot[0][0], doc)
+        prompt = doc.get("prompts", {}).get(name) if doc and doc.get("key") == key else None
+        self._count("prompt_hits" if prompt is not None else "prompt_misses")
+        return prompt
+
+    def put_prompts(self, key: str, prompts: dict) -> bool:
+        """
+        Publish compiled prompts. Any worker may call this after building them; returns False if
+        another worker already published `key` (nothing is rewritten) or the prompts are too large.
+        """
+        hashed = _key_hash(key)
+        data = json.dumps({"key": key, "prompts": prompts}, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.prompt_region - _PROMPT_META.size:
+            print(f"[Domu AI] Compiled prompt ({len(data)} bytes) exceeds shared prompt region")
+            return False
+        written = self._write(_HEADER_SIZE, _PROMPT_META, (hashed, len(data)), data,
+                              skip_if=lambda fields: fields[1] == hashed and fields[2] > 0)
+        self._count("prompt_writes" if written else "prompt_write_skips")
+        return written
+
+    # --- hot search results ---
+
+    def _slot_offset(self, hashed: bytes) -> int:
+        return self._slots_offset + (int.from_bytes(hashed, "little") % self.slot_count) * self.slot_size
+
+    def get_search(self, key: str):
+        hashed = _key_hash(key)
+        snapshot = self._read(self._slot_offset(hashed), _SLOT_META)
+        if snapshot is None or snapshot[0][1] != hashed or snapshot[0][2] < time.time():
+            self._count("search_misses")
+            return None
+        self._count("search_hits")
+        return json.loads(snapshot[1])
+
+    def put_search(self, key: str, results) -> bool:
+        hashed = _key_hash(key)
+        data = json.dumps(results, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.slot_size - _SLOT_META.size:
+            return False
+        self._write(self._slot_offset(hashed), _SLOT_META, (hashed, time.time() + self.search_ttl_s, len(data)), data)
+        self._count("search_writes")
+        return True
+
+    def stats(self) -> dict:
+        with self._local_lock:
+            return dict(self._stats)
+
+
+# --- Benchmark: per-worker memory and hit rates ---
+
+
+def _memory_kb() -> dict:
+    """RSS and PSS (proportional set size: shared pages split between processes) in KiB."""
+    out = {}
+    for path, fields in (("/proc/self/status", ("VmRSS",)), ("/proc/self/smaps_rollup", ("Pss",))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name = line.split(":", 1)[0]
+                    if name in fields:
+                        out[name.lower()] = int(line.split()[1])
+        except OSError:
+            pass
+    return out
+
+
+def _bench_worker(args) -> dict:
+    requests, queries = args
+    import api.index as service  # Imported in the worker, after the env is set up
+
+    prompt_s = 0.0
+    for i in range(requests):
+        started = time.perf_counter()
+        service.get_combined_context()
+        prompt_s += time.perf_counter() - started
+        query = queries[i % len(queries)]
+        cache = service._get_shared_cache()
+        if cache is not None and cache.get_search(query) is None:
+            cache.put_search(query, [{"title": query, "body": "x" * 400, "href": "https://example.org"}])
+    cache = service._get_shared_cache()
+    return {"pid": os.getpid(), "prompt_ms_avg": round(prompt_s * 1000 / requests, 3), **_memory_kb(),
+            **(cache.stats() if cache else {})}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("bench")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--requests", type=int, default=500)
+    p.add_argument("--path", default="/dev/shm/domu_ai_bench.cache" if os.path.isdir("/dev/shm") else "/tmp/domu_ai_bench.cache")
+    args = parser.parse_args(argv)
+
+    import multiprocessing
+
+    queries = [f"student events city {i}" for i in range(50)]
+    results = {}
+    for mode in ("per_worker", "shared"):
+        if mode == "shared":
+            os.environ["DOMU_SHARED_CACHE_PATH"] = args.path
+            if os.path.exists(args.path):
+                os.remove(args.path)
+        else:
+            os.environ.pop("DOMU_SHARED_CACHE_PATH", None)
+        ctx = multiprocessing.get_context("spawn")  # fresh interpreters, like separate server workers
+        with ctx.Pool(args.workers) as pool:
+            workers = pool.map(_bench_worker, [(args.requests, queries)] * args.workers)
+        results[mode] = {
+            "workers": workers,
+            "total_rss_kb": sum(w.get("vmrss", 0) for w in workers),
+            "total_pss_kb": sum(w.get("pss", 0) for w in workers),
+        }
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
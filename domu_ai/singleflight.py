@@ -0,0 +1,66 @@
+"""
+Request coalescing ("single-flight") for identical in-flight work.
+
+When several requests ask for the same thing at the same time, only the first
+caller (the leader) runs the work; everyone else waits for the leader and gets
+the same result (or the same exception). Nothing is cached: once the leader
+finishes, the next call for that key runs again.
+"""
+
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into a single execution."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {"calls": 0, "executed": 0, "collapsed": 0}
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time; concurrent callers share the leader's outcome."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["collapsed"] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
@@ -0,0 +1,129 @@
+"""
+Per-request performance trace: stage latencies, tool calls and cache hits.
+
+chat() starts a trace; code deeper in the request (the search tool, prompt lookup) records
+into trace.current() without extra arguments. The trace lives in a contextvar, so work
+submitted to an executor must run via contextvars.copy_context().run to see it.
+The result is stored with the chat log row (see domu_ai/perf_report.py for queries).
+
+While tracemalloc is tracing (DOMU_TRACEMALLOC=1 or python -m domu_ai.memcheck), every
+stage also records its allocations into `allocations`: the net change in traced memory
+and the peak above the stage's starting point. Peaks are process-wide, so they are only
+exact when requests run one at a time. Without tracing this costs one is_tracing() call.
+"""
+
+import contextvars
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("domu_ai_trace", default=None)
+
+
+class AllocationStats:
+    """Per-stage allocation totals across requests (only fed while tracemalloc is tracing)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def record(self, name: str, net_bytes: int, peak_bytes: int) -> None:
+        with self._lock:
+            entry = self._stages.setdefault(name, {"count": 0, "net_bytes": 0, "peak_bytes_total": 0, "peak_bytes_max": 0})
+            entry["count"] += 1
+            entry["net_bytes"] += net_bytes
+            entry["peak_bytes_total"] += peak_bytes
+            entry["peak_bytes_max"] = max(entry["peak_bytes_max"], peak_bytes)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": e["count"],
+                    "avg_net_kb": round(e["net_bytes"] / e["count"] / 1024, 2),
+                    "avg_peak_kb": round(e["peak_bytes_total"] / e["count"] / 1024, 2),
+                    "max_peak_kb": round(e["peak_bytes_max"] / 1024, 2),
+                }
+                for name, e in self._stages.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+
+allocations = AllocationStats()
+
+
+class RequestTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stage_ms = {}
+        self.cache_flags = {}
+        self.tool_calls = 0
+        self.tool_rounds = 0
+        self._lock = threading.Lock()  # The search tool may record from another thread
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages (e.g. several searches) add up."""
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_ms(name, (time.perf_counter() - t0) * 1000)
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                allocations.record(name, current - before, max(0, peak - before))
+
+    def add_ms(self, name: str, ms: float) -> None:
+        with self._lock:
+            self.stage_ms[name] = round(self.stage_ms.get(name, 0.0) + ms, 2)
+
+    def flag(self, name: str, value=True) -> None:
+        with self._lock:
+            self.cache_flags[name] = value
+
+    def bump(self, name: str) -> None:
+        """Count an event (e.g. search cache hits) in cache_flags."""
+        with self._lock:
+            self.cache_flags[name] = self.cache_flags.get(name, 0) + 1
+
+    def tool_call(self) -> None:
+        with self._lock:
+            self.tool_calls += 1
+
+    def tool_round(self) -> None:
+        """One model turn whose function calls were executed (see the tool loop in api/index.py)."""
+        with self._lock:
+            self.tool_rounds += 1
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 2)
+
+    def as_row(self) -> dict:
+        """Chat log columns for this request (see the domu_ai_chat_log perf migration)."""
+        with self._lock:
+            return {
+                "total_ms": round(self.total_ms()),
+                "stage_ms": dict(self.stage_ms),
+                "tool_calls": self.tool_calls,
+                "tool_rounds": self.tool_rounds,
+                "cache_flags": dict(self.cache_flags),
+            }
+
+
+def start() -> RequestTrace:
+    trace = RequestTrace()
+    _current.set(trace)
+    return trace
+
+
+def current():
+    """The trace of the request being handled in this context, or None."""
+    return _current.get()
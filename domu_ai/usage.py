@@ -0,0 +1,178 @@
+"""
+Per-request token and cost accounting from Gemini's usage_metadata.
+
+- usage_from_response(): prompt, cached, output, thinking and tool-use token counts of one
+  model call; add_usage() sums them over the calls of a tool loop (every round is billed).
+- estimate_cost_usd(): list prices per 1M tokens (override with DOMU_MODEL_PRICES, inline
+  JSON like {"gemini-2.5-flash": {"input": 0.3, "cached": 0.075, "output": 2.5}}).
+- prompt_split(): which part of the prompt the tokens went to (system prompt, history,
+  current message, tool output). The API only reports a total, so the split is estimated
+  from character counts and scaled to the reported prompt_token_count.
+- UsageTotals: in-process counters for /stats.
+
+Report the split over an export of domu_ai_chat_log (JSONL or CSV):
+    python -m domu_ai.usage report chat_log.jsonl
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+
+# USD per 1M tokens (paid tier, prompts <= 200k tokens). Thinking tokens bill as output.
+DEFAULT_PRICES = {
+    "gemini-2.5-flash-lite": {"input": 0.10, "cached": 0.025, "output": 0.40},
+    "gemini-2.5-flash": {"input": 0.30, "cached": 0.075, "output": 2.50},
+    "gemini-2.5-pro": {"input": 1.25, "cached": 0.31, "output": 10.00},
+}
+SPLIT_PARTS = ("system", "history", "message", "tool")
+USAGE_FIELDS = ("prompt_tokens", "cached_tokens", "output_tokens", "thinking_tokens", "tool_tokens")
+
+_prices = None
+
+
+def _get_prices() -> dict:
+    global _prices
+    if _prices is None:
+        prices = dict(DEFAULT_PRICES)
+        raw = os.getenv("DOMU_MODEL_PRICES", "").strip()
+        if raw:
+            try:
+                prices.update(json.loads(raw))
+            except ValueError as e:
+                print("[Domu AI] Ignoring invalid DOMU_MODEL_PRICES:", e)
+        _prices = prices
+    return _prices
+
+
+def usage_from_response(response) -> dict:
+    """Token counts from a GenerateContentResponse (missing fields count as 0)."""
+    usage = getattr(response, "usage_metadata", None)
+
+    def count(name):
+        return int(getattr(usage, name, None) or 0)
+
+    return {
+        "prompt_tokens": count("prompt_token_count"),
+        "cached_tokens": count("cached_content_token_count"),
+        "output_tokens": count("candidates_token_count"),
+        "thinking_tokens": count("thoughts_token_count"),
+        "tool_tokens": count("tool_use_prompt_token_count"),
+    }
+
+
+def add_usage(total: dict, usage: dict) -> dict:
+    """Field-wise sum of two usage dicts (e.g. the rounds of one tool loop)."""
+    return {name: total.get(name, 0) + usage.get(name, 0) for name in USAGE_FIELDS}
+
+
+def estimate_cost_usd(model: str, usage: dict):
+    """List-price estimate for one request, or None for a model without known prices."""
+    prices = _get_prices().get(model)
+    if prices is None:
+        return None
+    cached = usage.get("cached_tokens", 0)
+    uncached_input = max(0, usage.get("prompt_tokens", 0) - cached) + usage.get("tool_tokens", 0)
+    output = usage.get("output_tokens", 0) + usage.get("thinking_tokens", 0)
+    cost = (uncached_input * prices["input"] + cached * prices.get("cached", prices["input"])
+            + output * prices["output"]) / 1_000_000
+    return round(cost, 8)
+
+
+def tool_output_chars(tool_turns) -> int:
+    """Characters of function calls/responses that the tool loop added to the prompt (a list of Contents)."""
+    total = 0
+    for content in tool_turns or []:
+        for part in content.parts or []:
+            if part.function_response is not None:
+                total += len(json.dumps(part.function_response.response or {}, ensure_ascii=False, default=str))
+            elif part.function_call is not None:
+                total += len(json.dumps(part.function_call.args or {}, ensure_ascii=False, default=str))
+    return total
+
+
+def prompt_split(system_chars: int, history_chars: int, message_chars: int, tool_chars: int,
+                 prompt_tokens: int = 0) -> dict:
+    """Estimated prompt tokens per part; scaled to prompt_tokens when known, else ~4 chars/token."""
+    chars = dict(zip(SPLIT_PARTS, (system_chars, history_chars, message_chars, tool_chars)))
+    total_chars = sum(chars.values()) or 1
+    scale = prompt_tokens / total_chars if prompt_tokens else 0.25
+    return {part: round(n * scale) for part, n in chars.items()}
+
+
+class UsageTotals:
+    """Thread-safe token/cost totals per model, plus the summed prompt split."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._split = dict.fromkeys(SPLIT_PARTS, 0)
+
+    def record(self, model: str, usage: dict, cost_usd=None, split=None) -> None:
+        with self._lock:
+            totals = self._models.setdefault(model, {"requests": 0, **dict.fromkeys(USAGE_FIELDS, 0), "cost_usd": 0.0})
+            totals["requests"] += 1
+            for name in USAGE_FIELDS:
+                totals[name] += usage.get(name, 0)
+            totals["cost_usd"] += cost_usd or 0.0
+            for part, tokens in (split or {}).items():
+                self._split[part] = self._split.get(part, 0) + tokens
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            models = {m: {**t, "cost_usd": round(t["cost_usd"], 6)} for m, t in self._models.items()}
+            split = dict(self._split)
+        return {"models": models, "prompt_split": _with_shares(split)}
+
+
+def _with_shares(split: dict) -> dict:
+    total = sum(split.values())
+    return {part: {"tokens": n, "share": round(n / total, 3) if total else 0.0} for part, n in split.items()}
+
+
+# --- Report over exported chat log rows ---
+
+
+def read_rows(path: str):
+    """Rows of a domu_ai_chat_log export (.jsonl, or .csv with a header)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def report(rows) -> dict:
+    totals = UsageTotals()
+    skipped = 0
+    for row in rows:
+        if row.get("prompt_tokens") in (None, ""):
+            skipped += 1  # Logged before usage columns existed, or answered without the model
+            continue
+        usage = {name: int(float(row.get(name) or 0)) for name in USAGE_FIELDS}
+        split = row.get("token_split") or {}
+        if isinstance(split, str):
+            split = json.loads(split) if split.strip() else {}
+        cost = row.get("cost_usd")
+        totals.record(row.get("model") or "unknown", usage, float(cost) if cost not in (None, "") else None,
+                      {part: int(split.get(part) or 0) for part in SPLIT_PARTS})
+    return {**totals.snapshot(), "rows_without_usage": skipped}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("report", help="Token/cost totals and prompt split over exported chat log rows")
+    p.add_argument("path", help="domu_ai_chat_log export (.jsonl or .csv)")
+    args = parser.parse_args(argv)
+
+    print(json.dumps(report(read_rows(args.path)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""
+Gunicorn config for self-hosting the Domu AI Flask service (api/index.py:app).
+
+Run with:  python -m domu_ai.serve   (or: gunicorn -c gunicorn.conf.py api.index:app)
+
+- preload_app: the master imports the app (Flask, google-genai, Supabase SDKs, knowledge.data)
+  once and compiles the prompt artifact; workers fork with those pages shared copy-on-write.
+- post_fork: each worker creates its own genai / Supabase clients, SQLite connection and
+  shared-cache handles (none of these may be shared across fork) and warms them before
+  accepting traffic.
+- gthread workers: /chat spends almost all of its time waiting on Gemini and search, so a
+  few processes with many threads each beat many single-threaded sync workers.
+
+Tune with env: PORT, DOMU_WORKERS (default: CPU count), DOMU_THREADS (default 16).
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("DOMU_WORKERS", str(multiprocessing.cpu_count())))
+worker_class = "gthread"
+threads = int(os.getenv("DOMU_THREADS", "16"))
+preload_app = True
+
+# Must exceed GEMINI_WALL_TIMEOUT_S (55s) so the app's own timeout answers first.
+timeout = 65
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound slow memory growth; jitter avoids restarting all at once.
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """Master, after preload: compile the prompts once; workers inherit them (and the shared cache gets them, if enabled)."""
+    from api.index import build_prompt_artifact
+
+    prompt = build_prompt_artifact()
+    server.log.info("[Domu AI] Prompt artifact built (%d chars)", len(prompt))
+
+
+def post_fork(server, worker):
+    """Worker, right after fork: fresh clients and connections, warmed before the first request."""
+    from api.index import init_worker
+
+    init_worker()
+    server.log.info("[Domu AI] Worker %s initialized", worker.pid)
@@ -0,0 +1,186 @@
+"""
+Deterministic FAQ table for Domu AI, derived from PLATFORM_MANUAL.
+
+Each entry points at a line of the manual (via `source`, a regex; an optional `fact` group
+picks the part used in the answer) instead of copying its text, so answers follow edits to data.py. Entries whose source line is missing from the
+current manual are dropped when the table is compiled.
+
+Matching is local and cheap: an entry matches only when one of its intent phrases occurs as
+a whole, with the verb next to its object ("delete my account", not "delete" anywhere plus
+"profile" anywhere). Between them only a few filler words are allowed ({f}: my, the, ...),
+and the object must end the clause ({end}), so "change my email notifications" does not
+match "change my email". A phrase preceded by a negation ("I don't want to delete my
+account") does not count. The confidence is scaled down for long messages (which usually
+ask more than one thing). Callers answer locally only above a threshold; everything else
+goes to the model.
+"""
+
+import re
+
+FAQ_ENTRIES = [
+    {
+        "id": "reset_password",
+        "source": r"To reset password:\s*(?P<fact>.*)",
+        "phrases": [
+            r"(reset|forgot|forgotten|change|lost|recover) {f}password{end}",
+            r"(new password|password reset){end}",
+        ],
+        "answer": "You can reset your password yourself. {fact}",
+    },
+    {
+        "id": "delete_account",
+        "source": r"To delete account:\s*(?P<fact>.*)",
+        "phrases": [
+            r"(delete|remove|close|deactivate|cancel) {f}(account|profile){end}",
+            r"(delete|remove|erase) {f}(personal )?data{end}",
+            r"account (deletion|removal){end}",
+        ],
+        "answer": "To delete your account: {fact} Doing this by email makes sure nobody else can remove your account.",
+    },
+    {
+        "id": "change_email",
+        "source": r"To change email:\s*(?P<fact>.*)",
+        "phrases": [
+            r"(change|update|switch) {f}(email|e-mail)( address)?{end}",
+            r"new (email|e-mail) address{end}",
+        ],
+        "answer": "To change your email address: {fact}",
+    },
+    {
+        "id": "retake_questionnaire",
+        "source": r"Changing answers:\s*(?P<fact>.*)",
+        "phrases": [
+            r"(retake|redo|change|update|edit) {f}(questionnaire|answers|match profile|quiz){end}",
+            r"(take|do|fill in|fill out) {f}(questionnaire|quiz) again{end}",
+        ],
+        "answer": "{fact}",
+    },
+    {
+        "id": "questionnaire_duration",
+        "source": r"The questionnaire typically takes.*",
+        "phrases": [
+            r"how (long|much time) (does|will|is) {f}(questionnaire|onboarding|quiz)( take)?{end}",
+            r"how long (to|does it take to|will it take to) (complete|finish|do|fill in|fill out) {f}(questionnaire|onboarding|quiz){end}",
+        ],
+        "answer": "{fact} Your progress is saved automatically, so you can pause and come back later.",
+    },
+    {
+        "id": "onboarding_sections",
+        "source": r"New users complete an onboarding questionnaire with sections:.*",
+        "phrases": [
+            r"(what|which) (sections|parts|topics) (are|does|is) (in )?{f}(questionnaire|onboarding)( have)?{end}",
+            r"what('s| is) in {f}(questionnaire|onboarding){end}",
+            r"(sections|parts) of {f}(questionnaire|onboarding){end}",
+            r"what does {f}(questionnaire|onboarding) (cover|ask|include){end}",
+        ],
+        "answer": "{fact}",
+    },
+    {
+        "id": "match_timing",
+        "source": r"After onboarding, match suggestions appear within.*",
+        "phrases": [
+            r"when (will|do|can) i (get|see|receive) {f}(first )?(matches|match suggestions|suggestions){end}",
+            r"how (long|soon) (until|before|till) i (get|see|receive) {f}(first )?(matches|suggestions){end}",
+            r"(no|not getting any|not seeing any|still no) (matches|match suggestions)( yet)?{end}",
+        ],
+        "answer": "{fact} If it has been longer than that, contact domumatch@gmail.com and we'll take a look.",
+    },
+    {
+        "id": "support_response_time",
+        "source": r"Support typically responds.*",
+        "phrases": [
+            r"how (long|soon) (does|will|until|before) {f}(support|team|you guys|domu)( take)?( to)? (respond|reply|answer|get back){end}",
+            r"how (long|soon) does it take (for )?{f}(support|team|you guys) to (respond|reply|answer|get back){end}",
+            r"how (long|soon) (until|before|till) i hear back{end}",
+            r"when will (support|the team|you guys|you) (respond|reply|answer|get back){end}",
+            r"(support|team) response time{end}",
+        ],
+        "answer": "{fact}",
+    },
+    {
+        "id": "contact_support",
+        "source": r"Contact: domumatch@gmail\.com.*",
+        "phrases": [
+            r"(contact|reach|get in touch with|talk to|speak to|email) {f}(support|team|someone|a human|human|domu|you guys){end}",
+            r"how (can|do) i contact you{end}",
+            r"support (email|e-mail|address|contact){end}",
+        ],
+        "answer": "You can reach the team at domumatch@gmail.com for account issues, verification help, deletion requests, or general support.",
+    },
+]
+
+# Filler allowed between a verb and its object (at most two words).
+_FILLER = r"(?:(?:my|the|a|an|your|our|this|that|whole|entire|domu|current|old)\s+){0,2}"
+# The object must end the clause: end of message, punctuation, or a word that starts a new part.
+_END = (
+    r"(?=\s*(?:$|[?.!,;:)]|\s(?:to|on|in|at|for|from|with|and|or|but|so|please|now|yet|asap|again|"
+    r"permanently|completely|forever|anymore|myself|if|because|since)\b))"
+)
+# A negation in the few words before a phrase ("I don't want to delete my account").
+_NEGATION = re.compile(r"\b(don'?t|do not|doesn'?t|does not|didn'?t|did not|won'?t|will not|never|not|no longer|rather not)\b")
+_NEGATION_WINDOW_WORDS = 4
+
+# Messages with more words than this lose confidence proportionally.
+_SHORT_MESSAGE_WORDS = 14
+
+_compiled = {"manual": None, "table": []}
+
+
+def _phrase_pattern(phrases):
+    return re.compile(
+        "|".join(r"\b(?:" + p.format(f=_FILLER, end=_END) + ")" for p in phrases)
+    )
+
+
+def compile_faq(manual: str) -> list:
+    """Resolve each entry's source line in the manual and precompile its intent phrases."""
+    table = []
+    for entry in FAQ_ENTRIES:
+        found = re.search(r"^-\s*(" + entry["source"] + r")$", manual, re.MULTILINE)
+        if not found:
+            continue
+        fact = found.group("fact") if "fact" in found.re.groupindex else found.group(1)
+        table.append(
+            {
+                "id": entry["id"],
+                "answer": entry["answer"].format(fact=fact.strip()),
+                "phrases": _phrase_pattern(entry["phrases"]),
+            }
+        )
+    return table
+
+
+def _affirmed(pattern, text: str) -> bool:
+    """True when a phrase occurs without a negation in the words right before it."""
+    for found in pattern.finditer(text):
+        before = text[: found.start()].split()[-_NEGATION_WINDOW_WORDS:]
+        if not _NEGATION.search(" ".join(before)):
+            return True
+    return False
+
+
+def get_faq_table(manual: str) -> list:
+    """Compiled table for this manual text; recompiled only when the manual changes."""
+    if _compiled["manual"] is not manual and _compiled["manual"] != manual:
+        _compiled["table"] = compile_faq(manual)
+        _compiled["manual"] = manual
+    return _compiled["table"]
+
+
+def match_faq(message: str, manual: str):
+    """
+    Return (entry_id, answer, confidence) for the matching FAQ entry, or None if nothing matches.
+    Confidence is 1.0 for a short message that contains an intent phrase of exactly one entry;
+    long messages and messages matching several entries score lower.
+    """
+    lowered = re.sub(r"\s+", " ", (message or "").lower().replace("\u2019", "'")).strip()
+    if not lowered:
+        return None
+
+    hits = [e for e in get_faq_table(manual) if _affirmed(e["phrases"], lowered)]
+    if not hits:
+        return None
+
+    words = len(lowered.split(" "))
+    confidence = min(1.0, _SHORT_MESSAGE_WORDS / words) / len(hits)
+    return hits[0]["id"], hits[0]["answer"], round(confidence, 3)
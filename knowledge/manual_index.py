@@ -0,0 +1,99 @@
+"""
+Local keyword index over PLATFORM_MANUAL sections.
+
+Used when the model is unavailable: the best-matching manual section is shown to the
+user instead of a generic apology. Sections that only contain instructions for the
+assistant (algorithm secrecy, what to never reveal) are not indexed, and assistant-only
+remarks are stripped from the remaining lines.
+
+A section is only returned when it is a real match: its BM25 score must reach MIN_SCORE and it
+must contain at least MIN_COVERAGE of the query's terms. A question that merely shares one word
+with the manual ("any concerts in rotterdam this weekend?") gets no section.
+"""
+
+import math
+import re
+from collections import Counter
+
+# Sections addressed to the assistant rather than the user.
+_EXCLUDED_SECTIONS = {"THE ALGORITHM", "WHAT TO NEVER REVEAL"}
+_ASSISTANT_ONLY_LINE = re.compile(r"\bnever (reveal|explain)\b", re.IGNORECASE)
+_SECTION_HEADING = re.compile(r"^(\d+)\.\s+(.+)$", re.MULTILINE)
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = frozenset(
+    "a an and are can do does for from how i in is it me my of on or the to what when where which who why "
+    "with you your this that there be have has will would should could any some about at by if so "
+    "am was were been its im dont don cant wont won isn get just".split()
+)
+
+# A section must score at least this much and contain at least this share of the query terms.
+MIN_SCORE = 1.5
+MIN_COVERAGE = 0.5
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+_compiled = {"manual": None, "index": None}
+
+
+def _tokens(text: str) -> list:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in _STOPWORDS]
+
+
+def build_index(manual: str) -> dict:
+    """Split the manual into numbered sections and precompute BM25 statistics."""
+    sections = []
+    headings = list(_SECTION_HEADING.finditer(manual))
+    for i, heading in enumerate(headings):
+        title = heading.group(2).strip()
+        if title.upper() in _EXCLUDED_SECTIONS:
+            continue
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(manual)
+        lines = [
+            line.strip()
+            for line in manual[heading.end():end].splitlines()
+            if line.strip() and not _ASSISTANT_ONLY_LINE.search(line)
+        ]
+        if not lines:
+            continue
+        body = "\n".join(lines)
+        terms = Counter(_tokens(title) * 2 + _tokens(body))  # title words count double
+        sections.append({"title": title, "body": body, "terms": terms, "length": sum(terms.values())})
+
+    doc_freq = Counter()
+    for section in sections:
+        doc_freq.update(section["terms"].keys())
+    count = len(sections) or 1
+    idf = {t: math.log(1 + (count - n + 0.5) / (n + 0.5)) for t, n in doc_freq.items()}
+    avg_length = sum(s["length"] for s in sections) / count
+    return {"sections": sections, "idf": idf, "avg_length": avg_length or 1.0}
+
+
+def get_index(manual: str) -> dict:
+    """Index for this manual text; rebuilt only when the manual changes."""
+    if _compiled["manual"] is not manual and _compiled["manual"] != manual:
+        _compiled["index"] = build_index(manual)
+        _compiled["manual"] = manual
+    return _compiled["index"]
+
+
+def best_section(message: str, manual: str):
+    """
+    Return (title, body, score) of the best-matching section, or None when no section reaches
+    MIN_SCORE while covering MIN_COVERAGE of the query terms.
+    """
+    index = get_index(manual)
+    query = set(_tokens(message or ""))
+    best = None
+    for section in index["sections"]:
+        terms = section["terms"]
+        matched = [t for t in query if t in terms]
+        if len(matched) < MIN_COVERAGE * len(query):
+            continue
+        norm = _K1 * (1 - _B + _B * section["length"] / index["avg_length"])
+        score = sum(index["idf"][t] * terms[t] * (_K1 + 1) / (terms[t] + norm) for t in matched)
+        if score >= MIN_SCORE and (best is None or score > best[2]):
+            best = (section["title"], section["body"], round(score, 3))
+    return best
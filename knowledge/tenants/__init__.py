@@ -0,0 +1,96 @@
+"""
+Per-institution knowledge overlays for Domu AI.
+
+Each module in this package describes one institution. The module name is the institution id
+from data/nl-institutions.v1.json:
+    NAME = "Universiteit van Amsterdam (UvA)"
+    ALIASES = ("uva", "university of amsterdam", ...)  # What the chat payload may send
+    HOUSING_NOTES = \"\"\"...\"\"\"                      # Local housing specifics, manual style
+
+When the prompt is compiled, the base prompt is built once per tenant with that tenant's
+overlay merged in (api/index.py). A request carries an "institution" field and gets its
+tenant's prompt, or the default one. A request never includes more than one overlay, so
+its prompt size does not grow as tenants are added. Overlays longer than
+MAX_OVERLAY_CHARS are dropped, with a warning.
+
+Modules are reloaded when a file in this package changes, the same way knowledge.data is.
+The package directory is checked at most once every SOURCE_CHECK_S seconds, because the
+check runs on every request.
+"""
+
+import importlib
+import os
+import pkgutil
+import re
+import time
+
+MAX_OVERLAY_CHARS = 2500
+SOURCE_CHECK_S = 1.0
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+_loaded = {"key": None, "tenants": {}, "aliases": {}}
+_source = {"key": None, "checked_at": 0.0}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"\s+", " ", (name or "").lower()).strip()
+
+
+def source_key() -> str:
+    """Changes whenever an overlay module is added, removed or edited."""
+    now = time.monotonic()
+    if _source["key"] is None or now - _source["checked_at"] >= SOURCE_CHECK_S:
+        parts = []
+        for name in sorted(os.listdir(_DIR)):
+            if name.endswith(".py"):
+                st = os.stat(os.path.join(_DIR, name))
+                parts.append(f"{name}:{st.st_mtime_ns}:{st.st_size}")
+        _source.update(key=",".join(parts), checked_at=now)
+    return _source["key"]
+
+
+def _load() -> dict:
+    tenants = {}
+    for info in pkgutil.iter_modules([_DIR]):
+        module = importlib.reload(importlib.import_module(f"{__name__}.{info.name}"))
+        notes = getattr(module, "HOUSING_NOTES", "").strip()
+        if not notes:
+            continue
+        if len(notes) > MAX_OVERLAY_CHARS:
+            print(f"[Domu AI] Tenant overlay {info.name} is {len(notes)} chars (max {MAX_OVERLAY_CHARS}); skipped")
+            continue
+        tenants[info.name] = {
+            "name": getattr(module, "NAME", info.name),
+            "aliases": tuple(getattr(module, "ALIASES", ())),
+            "notes": notes,
+        }
+    return tenants
+
+
+def get_tenants() -> dict:
+    """tenant id -> {"name", "aliases", "notes"}; reloaded only when the package changes."""
+    key = source_key()
+    if _loaded["key"] != key:
+        tenants = _load()
+        aliases = {}
+        for tenant_id, tenant in tenants.items():
+            for alias in (tenant_id, tenant["name"], *tenant["aliases"]):
+                aliases[_normalize(alias)] = tenant_id
+        _loaded.update(key=key, tenants=tenants, aliases=aliases)
+    return _loaded["tenants"]
+
+
+def resolve(institution) -> str:
+    """Tenant id for an institution id, name or alias from the payload; None if unknown."""
+    if not isinstance(institution, str) or not institution.strip():
+        return None
+    get_tenants()
+    return _loaded["aliases"].get(_normalize(institution))
+
+
+def overlay_section(tenant: dict) -> str:
+    """Prompt section merged into the base prompt for one tenant."""
+    return f"""INSTITUTION-SPECIFIC NOTES ({tenant["name"]}):
+The user studies at {tenant["name"]}. Prefer these notes over general advice where they apply,
+and still point to the institution's own pages for anything that may have changed.
+{tenant["notes"]}"""
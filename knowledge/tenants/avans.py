@@ -0,0 +1,13 @@
+"""Overlay: Avans Hogeschool."""
+
+NAME = "Avans Hogeschool"
+ALIASES = ("avans", "avans university of applied sciences", "avans hogeschool")
+
+HOUSING_NOTES = """
+- Locations: Avans teaches in several cities, mainly Breda, 's-Hertogenbosch (Den Bosch) and Tilburg. Check where your programme is taught before you start looking; some students live in one city and commute by train to another.
+- Market: these cities are smaller than the Randstad markets, but rooms still become scarce around August and September. Searching from spring onwards gives the most choice.
+- Breda: Avans students share the market with BUas students, so the same listings and house-sharing groups apply.
+- International students: contact the Avans international office early about housing support for incoming students. Places are limited.
+- Registration: you must register your address with the municipality (BRP). Ask the landlord whether registration is allowed before you sign.
+- Scams: never pay before viewing the room and signing a contract.
+"""
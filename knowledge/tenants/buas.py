@@ -0,0 +1,12 @@
+"""Overlay: Breda University of Applied Sciences (BUas)."""
+
+NAME = "Breda University of Applied Sciences (BUas)"
+ALIASES = ("buas", "breda university of applied sciences", "breda university", "nhtv")
+
+HOUSING_NOTES = """
+- City: Breda. It is compact and easy to cycle, so most of the city is within about 15 minutes of campus by bike.
+- Market: BUas and Avans Breda students look for rooms in the same market. Demand peaks just before the academic year starts, so search early for a September start.
+- International students: BUas has a large international intake. Its housing information lists the options and partner providers for first-year international students. Reserve as early as you can, because places are limited.
+- Registration: you must register your address with the municipality (BRP). Check that a room allows registration before signing.
+- Scams: never pay before viewing the room and signing a contract. Be careful with listings that only communicate by chat and ask for a deposit upfront.
+"""
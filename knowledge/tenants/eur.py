@@ -0,0 +1,13 @@
+"""Overlay: Erasmus Universiteit Rotterdam (EUR)."""
+
+NAME = "Erasmus Universiteit Rotterdam (EUR)"
+ALIASES = ("eur", "erasmus", "erasmus university", "erasmus university rotterdam", "erasmus universiteit")
+
+HOUSING_NOTES = """
+- City: Rotterdam. Main campuses: Woudestein (most faculties) and Erasmus MC (medicine, near the centre). Woudestein has tram and metro stops nearby, so many students live along those lines rather than next to campus.
+- Neighbourhoods: Kralingen (next to Woudestein) is the classic student area and fills up first. The centre, Crooswijk and areas along the metro lines are common alternatives.
+- Market: Rotterdam is generally less tight than Amsterdam or Utrecht, but demand peaks in July–September. Start early if you arrive for the autumn intake.
+- International students: EUR's housing pages list the providers it works with for incoming international students. Reserve early, because the contingent is limited and is often short-stay.
+- Registration: you must register your address with the municipality (BRP). Check that a room allows registration before you sign.
+- Scams: never pay before viewing the room and signing a contract. Be wary of "landlords abroad" who ask for a deposit by bank transfer.
+"""
@@ -0,0 +1,13 @@
+"""Overlay: Universiteit van Amsterdam (UvA)."""
+
+NAME = "Universiteit van Amsterdam (UvA)"
+ALIASES = ("uva", "university of amsterdam", "universiteit van amsterdam")
+
+HOUSING_NOTES = """
+- City: Amsterdam. Main campuses: Roeterseiland, Science Park, Amsterdam UMC and the city centre (Binnenstad). Check which campus your programme uses before choosing a neighbourhood.
+- Market: Amsterdam is one of the tightest student housing markets in the Netherlands. Start searching months ahead, and expect rooms in the wider region (Amstelveen, Diemen, Zaandam) to be easier to find.
+- Student housing providers (DUWO, De Key, Stadgenoot and others) let rooms through ROOM.nl. Registration time counts, so register as early as possible, even before you are admitted.
+- International students: the UvA reserves a limited number of rooms for incoming international students. Apply through the UvA housing service as soon as you are admitted, because the places run out quickly.
+- Registration: you must register your address with the municipality (BRP). Be careful with rooms where registration is "not possible"; that is a common warning sign.
+- Scams: never pay a deposit or rent before viewing the room (in person or via a live video call) and signing a contract.
+"""
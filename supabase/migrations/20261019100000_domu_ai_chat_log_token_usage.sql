@@ -0,0 +1,14 @@
+-- Migration: Token and cost accounting on domu_ai_chat_log
+-- Written by api/index.py (domu_ai/usage.py) from Gemini's usage_metadata. All columns are
+-- nullable: FAQ fast-path and degraded answers make no model call and leave them empty.
+
+ALTER TABLE public.domu_ai_chat_log
+  ADD COLUMN IF NOT EXISTS model TEXT,
+  ADD COLUMN IF NOT EXISTS prompt_tokens INTEGER,
+  ADD COLUMN IF NOT EXISTS cached_tokens INTEGER,
+  ADD COLUMN IF NOT EXISTS output_tokens INTEGER,
+  ADD COLUMN IF NOT EXISTS thinking_tokens INTEGER,
+  ADD COLUMN IF NOT EXISTS tool_tokens INTEGER,
+  ADD COLUMN IF NOT EXISTS cost_usd NUMERIC(12, 8),
+  -- Estimated prompt tokens per part: {"system": n, "history": n, "message": n, "tool": n}
+  ADD COLUMN IF NOT EXISTS token_split JSONB;
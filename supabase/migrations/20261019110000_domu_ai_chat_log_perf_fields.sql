@@ -0,0 +1,74 @@
+-- Migration: Performance fields on domu_ai_chat_log + daily latency/cache report
+-- Written by api/index.py (domu_ai/trace.py) for every answered /chat request.
+-- Queried by domu_ai/perf_report.py through public.domu_ai_perf_daily().
+
+-- 1. Columns (nullable: older rows and the Next.js route don't set them)
+ALTER TABLE public.domu_ai_chat_log
+  ADD COLUMN IF NOT EXISTS request_class TEXT,
+  -- ok | faq | degraded | timeout | error
+  ADD COLUMN IF NOT EXISTS status TEXT,
+  ADD COLUMN IF NOT EXISTS total_ms INTEGER,
+  -- Stage latencies in ms: {"parse", "guard", "faq", "prompt", "model" (includes tools), "search"}
+  ADD COLUMN IF NOT EXISTS stage_ms JSONB,
+  ADD COLUMN IF NOT EXISTS prompt_version TEXT,
+  ADD COLUMN IF NOT EXISTS tool_calls SMALLINT,
+  -- {"prompt_shared": bool, "coalesced": bool, "search_shared_hits": n, "search_store_hits": n, "search_misses": n}
+  ADD COLUMN IF NOT EXISTS cache_flags JSONB;
+
+-- 2. Indexes. The table is append-only and time-ordered, so a BRIN index covers day-range
+--    scans at a fraction of a btree's size. Not partitioned: the primary key (id) and the
+--    retention purge by created_at work as they are.
+CREATE INDEX IF NOT EXISTS idx_domu_ai_chat_log_created_at_brin
+  ON public.domu_ai_chat_log USING BRIN (created_at);
+
+CREATE INDEX IF NOT EXISTS idx_domu_ai_chat_log_class_created_at
+  ON public.domu_ai_chat_log (request_class, created_at DESC)
+  WHERE request_class IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_domu_ai_chat_log_failures
+  ON public.domu_ai_chat_log (created_at DESC)
+  WHERE status IN ('timeout', 'error', 'degraded');
+
+-- 3. Daily report per request class: latency percentiles, stage medians and cache effectiveness
+CREATE OR REPLACE FUNCTION public.domu_ai_perf_daily(p_since TIMESTAMPTZ DEFAULT now() - INTERVAL '7 days')
+RETURNS TABLE (
+  day DATE,
+  request_class TEXT,
+  requests BIGINT,
+  p50_ms DOUBLE PRECISION,
+  p95_ms DOUBLE PRECISION,
+  model_p50_ms DOUBLE PRECISION,
+  search_p50_ms DOUBLE PRECISION,
+  failure_rate DOUBLE PRECISION,
+  prompt_shared_rate DOUBLE PRECISION,
+  coalesced_rate DOUBLE PRECISION,
+  search_hit_rate DOUBLE PRECISION,
+  avg_tool_calls DOUBLE PRECISION
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    (l.created_at AT TIME ZONE 'UTC')::date AS day,
+    l.request_class,
+    count(*) AS requests,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY l.total_ms) AS p50_ms,
+    percentile_cont(0.95) WITHIN GROUP (ORDER BY l.total_ms) AS p95_ms,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY (l.stage_ms->>'model')::float) AS model_p50_ms,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY (l.stage_ms->>'search')::float) AS search_p50_ms,
+    avg((l.status IN ('timeout', 'error', 'degraded'))::int) AS failure_rate,
+    avg((l.cache_flags->>'prompt_shared')::boolean::int) AS prompt_shared_rate,
+    avg(coalesce((l.cache_flags->>'coalesced')::boolean, false)::int) AS coalesced_rate,
+    sum(coalesce((l.cache_flags->>'search_shared_hits')::int, 0) + coalesce((l.cache_flags->>'search_store_hits')::int, 0))::float
+      / nullif(sum(coalesce((l.cache_flags->>'search_shared_hits')::int, 0) + coalesce((l.cache_flags->>'search_store_hits')::int, 0)
+                   + coalesce((l.cache_flags->>'search_misses')::int, 0)), 0) AS search_hit_rate,
+    avg(l.tool_calls) AS avg_tool_calls
+  FROM public.domu_ai_chat_log l
+  WHERE l.created_at >= p_since
+    AND l.total_ms IS NOT NULL
+  GROUP BY 1, 2
+  ORDER BY 1 DESC, p95_ms DESC;
+$$;
+
+-- Service role only, like the table itself
+REVOKE ALL ON FUNCTION public.domu_ai_perf_daily(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,57 @@
+-- Migration: Tool-loop rounds on domu_ai_chat_log + report columns
+-- api/index.py drives function calling itself: tool_rounds counts the model turns whose
+-- function calls were executed; cache_flags.tool_cap is "rounds" or "time" when a cap stopped the loop.
+
+-- 1. Column (nullable: older rows and the Next.js route don't set it)
+ALTER TABLE public.domu_ai_chat_log
+  ADD COLUMN IF NOT EXISTS tool_rounds SMALLINT;
+
+-- 2. Daily report gains avg_tool_rounds and tool_cap_rate (return type changes, so drop first)
+DROP FUNCTION IF EXISTS public.domu_ai_perf_daily(TIMESTAMPTZ);
+
+CREATE FUNCTION public.domu_ai_perf_daily(p_since TIMESTAMPTZ DEFAULT now() - INTERVAL '7 days')
+RETURNS TABLE (
+  day DATE,
+  request_class TEXT,
+  requests BIGINT,
+  p50_ms DOUBLE PRECISION,
+  p95_ms DOUBLE PRECISION,
+  model_p50_ms DOUBLE PRECISION,
+  search_p50_ms DOUBLE PRECISION,
+  failure_rate DOUBLE PRECISION,
+  prompt_shared_rate DOUBLE PRECISION,
+  coalesced_rate DOUBLE PRECISION,
+  search_hit_rate DOUBLE PRECISION,
+  avg_tool_calls DOUBLE PRECISION,
+  avg_tool_rounds DOUBLE PRECISION,
+  tool_cap_rate DOUBLE PRECISION
+)
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT
+    (l.created_at AT TIME ZONE 'UTC')::date AS day,
+    l.request_class,
+    count(*) AS requests,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY l.total_ms) AS p50_ms,
+    percentile_cont(0.95) WITHIN GROUP (ORDER BY l.total_ms) AS p95_ms,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY (l.stage_ms->>'model')::float) AS model_p50_ms,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY (l.stage_ms->>'search')::float) AS search_p50_ms,
+    avg((l.status IN ('timeout', 'error', 'degraded'))::int) AS failure_rate,
+    avg((l.cache_flags->>'prompt_shared')::boolean::int) AS prompt_shared_rate,
+    avg(coalesce((l.cache_flags->>'coalesced')::boolean, false)::int) AS coalesced_rate,
+    sum(coalesce((l.cache_flags->>'search_shared_hits')::int, 0) + coalesce((l.cache_flags->>'search_store_hits')::int, 0))::float
+      / nullif(sum(coalesce((l.cache_flags->>'search_shared_hits')::int, 0) + coalesce((l.cache_flags->>'search_store_hits')::int, 0)
+                   + coalesce((l.cache_flags->>'search_misses')::int, 0)), 0) AS search_hit_rate,
+    avg(l.tool_calls) AS avg_tool_calls,
+    avg(l.tool_rounds) AS avg_tool_rounds,
+    avg(coalesce(l.cache_flags ? 'tool_cap', false)::int) FILTER (WHERE l.tool_rounds IS NOT NULL) AS tool_cap_rate
+  FROM public.domu_ai_chat_log l
+  WHERE l.created_at >= p_since
+    AND l.total_ms IS NOT NULL
+  GROUP BY 1, 2
+  ORDER BY 1 DESC, p95_ms DESC;
+$$;
+
+-- Service role only, like the table itself
+REVOKE ALL ON FUNCTION public.domu_ai_perf_daily(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,21 @@
+"""
+pytest setup for the Python chat service (api/index.py, domu_ai/, knowledge/).
+
+    python -m pytest tests/python -q
+
+Importing api.index needs no network: Supabase is left unconfigured, the search store
+is off, and GEMINI_API_KEY is a placeholder (no test reaches the real model).
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+for name in ("NEXT_PUBLIC_SUPABASE_URL", "SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY"):
+    os.environ.pop(name, None)
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("DOMU_SEARCH_DB", "0")
+os.environ.setdefault("DOMU_DIGEST_PATH", "0")
+os.environ.setdefault("DOMU_CORPUS_PATH", "0")
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+import api.index as svc
+from domu_ai.breaker import CircuitBreaker, InflightLimiter
+from domu_ai.keys import KeyPool
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    monkeypatch.setattr(svc, "_key_pool", KeyPool(["key-aaaaaaaa01", "key-aaaaaaaa02"]))
+    return svc.app.test_client()
+
+
+def _uses():
+    return sum(s["uses"] for s in svc._key_pool.stats().values())
+
+
+def test_shed_requests_do_not_use_a_key(client, monkeypatch):
+    monkeypatch.setattr(svc, "_model_limiter", InflightLimiter(0))
+    client.post("/chat", json={"message": "tell me about student life in Delft"})
+    assert _uses() == 0
+
+
+def test_breaker_open_requests_do_not_use_a_key(client, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after_s=60)
+    breaker.record_failure()
+    monkeypatch.setattr(svc, "_breaker", breaker)
+    client.post("/chat", json={"message": "tell me about student life in Delft"})
+    assert _uses() == 0
+
+
+def test_cancel_frees_the_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after_s=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()  # Probe in flight
+    breaker.cancel()
+    assert breaker.allow()
+
+
+def test_breaker_opens_after_the_threshold_and_closes_after_a_good_probe():
+    breaker = CircuitBreaker(failure_threshold=3, reset_after_s=0.05)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state() == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state() == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state() == "half_open"
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "times_opened": 1}
+
+
+def test_a_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=3, reset_after_s=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state() == "open" and not breaker.allow()
+    assert breaker.stats()["times_opened"] == 1  # Still the same outage
+
+
+def test_a_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_after_s=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state() == "closed"
@@ -0,0 +1,81 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import api.index as svc
+
+
+class FakeSupabase:
+    """sb.table(...).insert(row).execute() that can block, and rejects rows with unknown columns."""
+
+    def __init__(self, columns=("user_message", "assistant_reply"), gate=None):
+        self.columns = set(columns)
+        self.gate = gate
+        self.rows = []
+
+    def table(self, name):
+        return self
+
+    def insert(self, row):
+        self._row = row
+        return self
+
+    def execute(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        unknown = set(self._row) - self.columns
+        if unknown:
+            raise ValueError(f"400 column {sorted(unknown)[0]} does not exist")
+        self.rows.append(self._row)
+
+
+@pytest.fixture
+def log_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(svc, "_log_pool", pool)
+    monkeypatch.setattr(svc, "_log_slots", threading.BoundedSemaphore(2))
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def _use(monkeypatch, sb):
+    monkeypatch.setattr(svc, "_get_supabase", lambda: sb)
+    return sb
+
+
+def test_save_returns_before_the_insert_finishes(monkeypatch, log_pool):
+    gate = threading.Event()
+    sb = _use(monkeypatch, FakeSupabase(gate=gate))
+    started = time.perf_counter()
+    svc._save_to_supabase("hi", "hello")
+    assert time.perf_counter() - started < 0.5
+    assert sb.rows == []
+    gate.set()
+    log_pool.shutdown(wait=True)
+    assert sb.rows == [{"user_message": "hi", "assistant_reply": "hello"}]
+
+
+def test_extra_columns_fall_back_to_the_plain_row(monkeypatch, log_pool):
+    sb = _use(monkeypatch, FakeSupabase())
+    svc._save_to_supabase("hi", "hello", extra={"cost_usd": 0.1})
+    log_pool.shutdown(wait=True)
+    assert sb.rows == [{"user_message": "hi", "assistant_reply": "hello"}]
+
+
+def test_rows_beyond_the_queue_are_dropped(monkeypatch, log_pool):
+    gate = threading.Event()
+    sb = _use(monkeypatch, FakeSupabase(gate=gate))
+    for i in range(4):
+        svc._save_to_supabase(f"message {i}", "reply")
+    gate.set()
+    log_pool.shutdown(wait=True)
+    assert len(sb.rows) == 2
+    assert svc._log_slots.acquire(blocking=False)  # Slots are given back once rows are written
+
+
+def test_no_supabase_config_writes_nothing(monkeypatch, log_pool):
+    monkeypatch.setattr(svc, "_get_supabase", lambda: None)
+    svc._save_to_supabase("hi", "hello")
+    log_pool.shutdown(wait=True)
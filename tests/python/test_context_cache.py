@@ -0,0 +1,173 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from domu_ai.context_cache import ContextCacheManager, is_cache_error
+from domu_ai.fake_model import FakeModelServer
+from domu_ai.keys import KeyPool
+
+
+class FakeCaches:
+    def __init__(self, fail_create=False):
+        self.fail_create = fail_create
+        self.created, self.deleted = [], []
+
+    def list(self):
+        return []
+
+    def create(self, model, config):
+        if self.fail_create:
+            raise RuntimeError("400 INVALID_ARGUMENT: cached content is too small")
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append((model, config.display_name))
+        return SimpleNamespace(name=name)
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+def _build():
+    return {}
+
+
+def _wait_for(condition, timeout_s=2.0):
+    deadline = time.monotonic() + timeout_s
+    while not condition():
+        assert time.monotonic() < deadline, "background cache work did not finish"
+        time.sleep(0.005)
+
+
+def _manager(caches, **kwargs):
+    client = SimpleNamespace(caches=caches)
+    return ContextCacheManager(lambda key: client, **kwargs)
+
+
+def test_first_request_is_uncached_then_the_cache_is_used():
+    caches = FakeCaches()
+    mgr = _manager(caches)
+    assert mgr.lookup("k", "m", "hash1", _build) is None
+    _wait_for(lambda: mgr.stats()["creates"] == 1)
+    assert mgr.lookup("k", "m", "hash1", _build) == "cachedContents/0"
+    assert caches.created == [("m", "domu-ai:hash1")]
+
+
+def test_a_new_prompt_version_gets_its_own_cache():
+    caches = FakeCaches()
+    mgr = _manager(caches)
+    mgr.lookup("k", "m", "v1", _build)
+    _wait_for(lambda: mgr.stats()["creates"] == 1)
+    assert mgr.lookup("k", "m", "v2", _build) is None  # Different prompt hash: not the v1 cache
+    _wait_for(lambda: mgr.stats()["creates"] == 2)
+    assert mgr.lookup("k", "m", "v2", _build) == "cachedContents/1"
+
+
+def test_knowledge_change_deletes_every_cache():
+    caches = FakeCaches()
+    mgr = _manager(caches)
+    mgr.sync("source-1")
+    mgr.lookup("k", "m", "v1", _build)
+    _wait_for(lambda: mgr.stats()["creates"] == 1)
+
+    mgr.sync("source-1")  # Unchanged: nothing happens
+    assert mgr.lookup("k", "m", "v1", _build) == "cachedContents/0"
+
+    mgr.sync("source-2")
+    _wait_for(lambda: caches.deleted == ["cachedContents/0"])
+    assert mgr.stats()["entries"] == 0
+    assert mgr.lookup("k", "m", "v1", _build) is None
+
+
+def test_failed_creation_falls_back_to_uncached_and_is_not_retried_at_once():
+    caches = FakeCaches(fail_create=True)
+    mgr = _manager(caches, retry_after_s=60)
+    assert mgr.lookup("k", "m", "v1", _build) is None
+    _wait_for(lambda: mgr.stats()["failures"] == 1)
+    assert mgr.lookup("k", "m", "v1", _build) is None
+    time.sleep(0.05)
+    assert mgr.stats()["failures"] == 1  # No second attempt inside retry_after_s
+
+
+def test_rejected_cache_is_forgotten():
+    caches = FakeCaches()
+    mgr = _manager(caches)
+    mgr.lookup("k", "m", "v1", _build)
+    _wait_for(lambda: mgr.stats()["creates"] == 1)
+    mgr.invalidate("k", "m", "v1")
+    assert mgr.lookup("k", "m", "v1", _build) is None
+
+
+def test_cache_errors_are_recognized():
+    assert is_cache_error("404 NOT_FOUND. CachedContent not found (or permission denied)")
+    assert is_cache_error("403 PERMISSION_DENIED: cached content access denied")
+    assert not is_cache_error("429 RESOURCE_EXHAUSTED: quota exceeded")
+    assert not is_cache_error("404 NOT_FOUND: model not found")
+
+
+# --- End to end: /chat against the local fake model server (real HTTP, cachedContents API) ---
+
+
+@pytest.fixture
+def served(monkeypatch):
+    import api.index as svc
+
+    server = FakeModelServer(prefill_ms_per_1k=100.0).start()
+    pool = KeyPool(["fake-key-cache-01"], base_url=server.base_url)
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    monkeypatch.setattr(svc, "_key_pool", pool)
+    monkeypatch.setattr(svc, "_context_cache", ContextCacheManager(pool.client))
+    yield svc, server
+    server.stop()
+
+
+def _chat(svc, text):
+    started = time.perf_counter()
+    response = svc.app.test_client().post("/chat", json={"message": text})
+    assert response.status_code == 200 and not response.get_json().get("degraded")
+    return time.perf_counter() - started
+
+
+def test_create_then_cached_requests_then_invalidate(served):
+    svc, server = served
+    uncached_s = _chat(svc, "tell me about student life, first question")
+    _wait_for(lambda: server.cache_counts["created"] == 1)
+    assert server.cache_counts["cached_requests"] == 0
+
+    cached_s = _chat(svc, "tell me about student life, second question")
+    assert server.cache_counts["cached_requests"] == 1
+    assert cached_s < uncached_s  # The system prompt is not prefilled again
+
+    # Expired or deleted upstream: the request is retried uncached, and the next one creates a new cache.
+    server._caches.clear()
+    _chat(svc, "tell me about student life, third question")
+    assert svc._context_cache.stats()["invalidations"] == 1
+    _chat(svc, "tell me about student life, fourth question")
+    _wait_for(lambda: server.cache_counts["created"] == 2)
+    _chat(svc, "tell me about student life, fifth question")
+    assert server.cache_counts["cached_requests"] == 2
+
+
+def test_a_new_worker_adopts_the_existing_cache(served):
+    svc, server = served
+    _chat(svc, "tell me about student life, first question")
+    _wait_for(lambda: server.cache_counts["created"] == 1)
+
+    svc._context_cache = ContextCacheManager(svc._key_pool.client)  # Restarted worker, same key and prompt
+    _chat(svc, "tell me about student life, second question")
+    _wait_for(lambda: svc._context_cache.stats()["adopted"] == 1)
+    _chat(svc, "tell me about student life, third question")
+    assert server.cache_counts["created"] == 1
+    assert server.cache_counts["cached_requests"] == 1
+
+
+def test_knowledge_change_deletes_the_upstream_cache(served, monkeypatch):
+    svc, server = served
+    _chat(svc, "tell me about student life, first question")
+    _wait_for(lambda: server.cache_counts["created"] == 1)
+
+    monkeypatch.setenv("DOMU_LEARNED_INSTRUCTIONS", "Always greet in Dutch.")  # Part of the knowledge source key
+    _chat(svc, "tell me about student life, second question")
+    _wait_for(lambda: server.cache_counts["deleted"] == 1)
+    _wait_for(lambda: server.cache_counts["created"] == 2)
+    assert len(server.list_caches()["cachedContents"]) == 1
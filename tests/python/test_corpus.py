@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+import pytest
+
+from domu_ai.corpus import Corpus, ingest, passages_from_html
+
+PAGES = {
+    "https://www.rijksoverheid.nl/onderwerpen/huurtoeslag": (
+        "Huurtoeslag",
+        "Huurtoeslag is a monthly allowance towards your rent. The income limit depends on your household, "
+        "and students over 18 can apply when the rent and income limit rules are met for the whole year.",
+    ),
+    "https://www.government.nl/topics/personal-data/citizen-service-number-bsn": (
+        "Citizen service number BSN",
+        "You get a BSN when you register with the municipality. Registration needs an address, a valid "
+        "passport and a rental contract, and the appointment is usually within two weeks of arrival.",
+    ),
+    "https://www.huurcommissie.nl/": (
+        "Huurcommissie",
+        "The Huurcommissie settles disputes between tenants and landlords about rent, service costs and "
+        "maintenance. A WWS points check shows the maximum rent for a room or an independent home.",
+    ),
+}
+
+
+def _html(title, body):
+    return (f"<html><head><title>{title}</title><script>var tracking = 1;</script></head><body>"
+            f"<nav>Home Menu Contact Search Login</nav><h2>{title}</h2><p>{body}</p>"
+            f"<footer>Cookies Privacy Sitemap</footer></body></html>")
+
+
+def _fetch(url):
+    return _html(*PAGES[url])
+
+
+@pytest.fixture
+def corpus_path(tmp_path):
+    path = str(tmp_path / "corpus.json")
+    ingest(path, dict.fromkeys(PAGES, "test"), fetch_page=_fetch)
+    return path
+
+
+def test_page_furniture_is_not_indexed():
+    title, passages = passages_from_html(_html(*PAGES["https://www.huurcommissie.nl/"]))
+    assert title == "Huurcommissie"
+    assert len(passages) == 1
+    assert "Cookies" not in passages[0][1] and "tracking" not in passages[0][1] and "Login" not in passages[0][1]
+
+
+def test_long_sections_are_split_into_overlapping_passages():
+    words = " ".join(f"w{i}" for i in range(250))
+    _, passages = passages_from_html(f"<title>T</title><p>{words}</p>")
+    assert [body.split()[0] for _, body in passages] == ["w0", "w100", "w200"]
+    assert passages[0][1].split()[-1] == "w119"  # 20 words overlap with the next window
+    assert passages[-1][1].split()[-1] == "w249"
+
+
+def test_strong_recall_is_answered_locally(corpus_path):
+    corpus = Corpus(corpus_path)
+    results = corpus.search("huurtoeslag income limits")
+    assert results and results[0]["href"] == "https://www.rijksoverheid.nl/onderwerpen/huurtoeslag"
+    assert corpus.stats()["hits"] == 1
+
+
+@pytest.mark.parametrize("query", ["cheap gyms breda", "huurtoeslag gyms breda nightlife"])
+def test_weak_recall_goes_to_the_network(corpus_path, query):
+    corpus = Corpus(corpus_path)
+    assert corpus.search(query) is None
+    assert corpus.stats()["weak"] == 1
+
+
+def test_coverage_threshold_is_configurable(corpus_path):
+    query = "huurtoeslag gym"  # One of two rare terms matches
+    coverage, _ = Corpus(corpus_path).rank(query, Corpus(corpus_path).load())
+    assert 0.3 < coverage < 0.7
+    assert Corpus(corpus_path).search(query) is None
+    assert Corpus(corpus_path, min_coverage=0.3).search(query)
+
+
+def test_stale_corpus_is_not_used(corpus_path):
+    with open(corpus_path) as f:
+        data = json.load(f)
+    data["fetched_at"] = time.time() - 3600
+    with open(corpus_path, "w") as f:
+        json.dump(data, f)
+
+    assert Corpus(corpus_path, max_age_s=7200).search("huurtoeslag income limit")
+    stale = Corpus(corpus_path, max_age_s=1800)
+    assert stale.search("huurtoeslag income limit") is None
+    assert stale.stats()["stale"] == 1
+
+
+def test_failed_fetch_keeps_the_last_good_copy_and_its_age(corpus_path):
+    with open(corpus_path) as f:
+        first = json.load(f)
+
+    def flaky(url):
+        if "huurcommissie" in url:
+            raise OSError("connection reset")
+        return _fetch(url)
+
+    time.sleep(0.01)
+    report = ingest(corpus_path, dict.fromkeys(PAGES, "test"), fetch_page=flaky)
+    with open(corpus_path) as f:
+        second = json.load(f)
+    assert all(report.values())
+    assert second["sources"]["https://www.huurcommissie.nl/"] == first["sources"]["https://www.huurcommissie.nl/"]
+    assert second["fetched_at"] == first["sources"]["https://www.huurcommissie.nl/"]["fetched_at"]
+    assert Corpus(corpus_path).search("wws points maximum rent")
+
+
+def test_disabled_and_missing_corpus(tmp_path, monkeypatch):
+    monkeypatch.setenv("DOMU_CORPUS_PATH", "0")
+    assert Corpus.from_env() is None
+    assert Corpus(os.path.join(tmp_path, "missing.json")).search("huurtoeslag") is None
@@ -0,0 +1,82 @@
+import pytest
+
+import api.index as svc
+from domu_ai.breaker import CircuitBreaker
+from domu_ai.fake_model import FakeModelServer
+from domu_ai.keys import KeyPool
+from knowledge import data as knowledge_data
+from knowledge.manual_index import best_section
+
+BUSY = "I’m getting a lot of requests right now and need a short break. Please try again in a minute."
+
+
+@pytest.mark.parametrize(
+    "message, title",
+    [
+        ("How do I reset my password?", "ACCOUNT & SETTINGS"),
+        ("How do I contact support?", "SUPPORT & HELP"),
+        ("why can't I see any matches", "MATCHES"),
+        ("which universities are supported", "UNIVERSITIES & LOCATIONS"),
+    ],
+)
+def test_best_section_finds_the_manual_section(message, title):
+    hit = best_section(message, knowledge_data.PLATFORM_MANUAL)
+    assert hit is not None and hit[0] == title
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "my landlord wont return my deposit",
+        "any concerts in rotterdam this weekend?",
+        "what's the weather like",
+        "",
+    ],
+)
+def test_best_section_rejects_weak_overlap(message):
+    assert best_section(message, knowledge_data.PLATFORM_MANUAL) is None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    return svc.app.test_client()
+
+
+@pytest.fixture
+def open_breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after_s=60)
+    breaker.record_failure()
+    monkeypatch.setattr(svc, "_breaker", breaker)
+
+
+def test_breaker_open_serves_the_manual_section(client, open_breaker):
+    response = client.post("/chat", json={"message": "How do I reset my password?"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["degraded"] is True
+    assert body["reply"].startswith(svc.DEGRADED_NOTICE)
+    assert "### Account & Settings" in body["reply"]
+
+
+@pytest.mark.parametrize("message", ["my landlord wont return my deposit", "any concerts in rotterdam this weekend?"])
+def test_breaker_open_without_a_relevant_section_is_unavailable(client, open_breaker, message):
+    response = client.post("/chat", json={"message": message})
+    assert response.status_code == 503
+    assert response.get_json() == {"reply": BUSY}
+
+
+def test_upstream_errors_open_the_breaker_and_degrade(client, monkeypatch):
+    server = FakeModelServer(error_rate=1.0).start()
+    try:
+        monkeypatch.setattr(svc, "_key_pool", KeyPool(["key-aaaaaaaa01"], base_url=server.base_url))
+        monkeypatch.setattr(svc, "_context_cache", None)
+        breaker = CircuitBreaker(failure_threshold=1, reset_after_s=60)
+        monkeypatch.setattr(svc, "_breaker", breaker)
+
+        response = client.post("/chat", json={"message": "How do I reset my password?"})
+        assert response.get_json().get("degraded") is True
+        assert breaker.state() == "open"
+    finally:
+        server.stop()
@@ -0,0 +1,35 @@
+import pytest
+
+from domu_ai.digest import match
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("any events in Rotterdam this weekend?", ("rotterdam", ["events"])),
+        ("What’s on in Utrecht tonight", ("utrecht", ["events"])),
+        ("are there NS strikes around Delft?", ("delft", ["transport"])),
+        ("is travelling to Leiden by train ok today", ("leiden", ["transport"])),
+        ("looking for rooms in Groningen", ("groningen", ["housing"])),
+        ("how much is rent in the hague", ("den-haag", ["housing"])),
+        ("concerts and cheap apartments in Nijmegen", ("nijmegen", ["events", "housing"])),
+    ],
+)
+def test_matches_city_and_topic(message, expected):
+    assert match(message) == expected
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "my parents are visiting me in Amsterdam",  # "rent"
+        "what is the current student population of Eindhoven",  # "rent"
+        "how do I prevent mold in my Tilburg flat",  # "event"
+        "that was embarrassing in Breda",
+        "I want to transfer to Maastricht University",
+        "Rotterdam",  # No topic
+        "any events this weekend?",  # No city
+    ],
+)
+def test_ignores_topic_words_inside_other_words(message):
+    assert match(message) is None
@@ -0,0 +1,52 @@
+import pytest
+
+from knowledge.data import PLATFORM_MANUAL
+from knowledge.faq import FAQ_ENTRIES, get_faq_table, match_faq
+
+
+def test_every_entry_resolves_in_the_manual():
+    assert {e["id"] for e in get_faq_table(PLATFORM_MANUAL)} == {e["id"] for e in FAQ_ENTRIES}
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("How do I delete my account?", "delete_account"),
+        ("I want to remove my profile", "delete_account"),
+        ("how can I reset my password", "reset_password"),
+        ("I forgot my password", "reset_password"),
+        ("How do I change my email address?", "change_email"),
+        ("can I retake the questionnaire", "retake_questionnaire"),
+        ("how long does the questionnaire take?", "questionnaire_duration"),
+        ("when will I get my first matches?", "match_timing"),
+        ("how long does support take to respond?", "support_response_time"),
+        ("how do I contact support", "contact_support"),
+    ],
+)
+def test_intent_phrases_take_the_fast_path(message, expected):
+    hit = match_faq(message, PLATFORM_MANUAL)
+    assert hit is not None and hit[0] == expected
+    assert hit[2] == 1.0
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "how do I remove a photo from my profile",
+        "how do I delete a match from my profile?",
+        "I dont want to delete my account",
+        "I don't want to delete my account, just pause it",
+        "can I change my email notifications?",
+        "how long should I wait before contacting my landlord by email",
+        "what's the average rent in Utrecht?",
+    ],
+)
+def test_loose_or_negated_mentions_do_not_match(message):
+    assert match_faq(message, PLATFORM_MANUAL) is None
+
+
+def test_long_messages_lose_confidence():
+    message = "I have been looking at rooms in Groningen for a while and I also wonder how to delete my account"
+    hit = match_faq(message, PLATFORM_MANUAL)
+    assert hit[0] == "delete_account"
+    assert hit[2] < 0.8
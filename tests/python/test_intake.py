@@ -0,0 +1,106 @@
+import gzip
+import io
+import json
+
+import pytest
+from flask import Flask
+
+import api.index as svc
+from domu_ai.intake import MAX_MESSAGE_CHARS, PayloadTooLarge, check_limits, decode_body, read_json_body
+
+LIMIT = 1024
+
+
+def _request(body: bytes, content_type="application/json", **headers):
+    app = Flask(__name__)
+    return app.test_request_context("/chat", method="POST", data=body, content_type=content_type, headers=headers)
+
+
+def _read(body: bytes, **kwargs):
+    with _request(body, **kwargs) as ctx:
+        return read_json_body(ctx.request, max_bytes=LIMIT)
+
+
+def test_reads_a_small_body():
+    assert _read(b'{"message": "hi"}') == {"message": "hi"}
+
+
+def test_rejects_a_declared_length_over_the_cap():
+    with pytest.raises(PayloadTooLarge) as info:
+        _read(b"x" * (LIMIT + 1))
+    assert info.value.limit == "body"
+
+
+def test_cuts_off_an_undeclared_body_at_the_cap():
+    with _request(b"") as ctx:
+        ctx.request.environ.pop("CONTENT_LENGTH", None)
+        ctx.request.environ["wsgi.input"] = io.BytesIO(b'{"m": "' + b"x" * LIMIT + b'"}')
+        ctx.request.environ["wsgi.input_terminated"] = True
+        with pytest.raises(PayloadTooLarge):
+            read_json_body(ctx.request, max_bytes=LIMIT)
+
+
+def test_inflates_a_gzip_body():
+    body = gzip.compress(json.dumps({"message": "hi"}).encode())
+    assert _read(body, **{"Content-Encoding": "gzip"}) == {"message": "hi"}
+
+
+def test_gzip_bomb_is_capped_after_inflation():
+    bomb = gzip.compress(b'{"message": "' + b"a" * (100 * LIMIT) + b'"}')
+    assert len(bomb) < LIMIT
+    with pytest.raises(PayloadTooLarge):
+        _read(bomb, **{"Content-Encoding": "gzip"})
+
+
+@pytest.mark.parametrize(
+    "body, encoding",
+    [
+        (b'{"message": ', ""),  # Truncated JSON
+        (b"[1, 2, 3]", ""),  # Not an object
+        (b"not json at all", ""),
+        (b"\x1f\x8b\x08 not really gzip", "gzip"),
+        (gzip.compress(b'{"message": "hi"}')[:-8], "gzip"),  # Truncated gzip
+        (b'{"message": "hi"}', "br"),  # Unsupported encoding
+    ],
+)
+def test_malformed_bodies_raise_value_error(body, encoding):
+    with pytest.raises(ValueError):
+        decode_body(body, encoding, max_bytes=LIMIT)
+
+
+def test_wrong_content_type_is_rejected():
+    with pytest.raises(ValueError):
+        _read(b'{"message": "hi"}', content_type="text/plain")
+
+
+@pytest.mark.parametrize(
+    "data, limit",
+    [
+        ({"message": "x" * 11}, "message"),
+        ({"message": "hi", "history": [{}] * 4}, "history"),
+    ],
+)
+def test_check_limits(data, limit):
+    with pytest.raises(PayloadTooLarge) as info:
+        check_limits(data, max_message_chars=10, max_history_entries=3)
+    assert info.value.limit == limit
+
+
+def test_check_limits_accepts_requests_at_the_limit():
+    check_limits({"message": "x" * 10, "history": [{}] * 3}, max_message_chars=10, max_history_entries=3)
+
+
+@pytest.fixture
+def client():
+    return svc.app.test_client()
+
+
+def test_chat_answers_413_for_a_too_long_message(client):
+    response = client.post("/chat", json={"message": "x" * (MAX_MESSAGE_CHARS + 1)})
+    assert response.status_code == 413
+    assert "too long" in response.get_json()["reply"]
+
+
+def test_chat_answers_400_for_malformed_json(client):
+    response = client.post("/chat", data=b'{"message": ', content_type="application/json")
+    assert response.status_code == 400
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+import api.index as svc
+from domu_ai.fake_model import FakeModelServer
+from domu_ai.keys import KeyPool
+
+KEYS = [f"fake-key-{i:04d}" for i in range(3)]
+
+
+def test_acquire_takes_keys_in_turn():
+    pool = KeyPool(KEYS)
+    assert [pool.acquire() for _ in range(6)] == KEYS * 2
+
+
+def test_throttled_key_rejoins_the_rotation_after_its_cooldown():
+    pool = KeyPool(KEYS, cooldown_s=0.05)
+    pool.mark_throttled(KEYS[0])
+    assert KEYS[0] not in [pool.acquire() for _ in range(4)]
+    time.sleep(0.06)
+    picks = [pool.acquire() for _ in range(30)]
+    assert {k: picks.count(k) for k in KEYS} == dict.fromkeys(KEYS, 10)
+
+
+def test_every_key_cooling_down_means_no_key():
+    pool = KeyPool(KEYS[:1], cooldown_s=60)
+    pool.mark_throttled(KEYS[0])
+    assert pool.acquire() is None and not pool.available()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeModelServer().start()
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    monkeypatch.setattr(svc, "_context_cache", None)
+    monkeypatch.setattr(svc, "_key_pool", KeyPool(KEYS, cooldown_s=0.2, base_url=server.base_url))
+    yield server
+    server.stop()
+
+
+def _chat(count, offset=0):
+    client = svc.app.test_client()
+    for i in range(count):
+        response = client.post("/chat", json={"message": f"tell me about student life, question {offset + i}"})
+        assert response.status_code == 200
+
+
+def _ok_per_key(server):
+    return {key: server.stats().get(key, {}).get("ok", 0) for key in KEYS}
+
+
+def test_load_spreads_evenly_across_keys(server):
+    _chat(30)
+    assert _ok_per_key(server) == dict.fromkeys(KEYS, 10)
+
+
+def test_load_spreads_again_after_a_429(server):
+    server.throttle(KEYS[0])
+    _chat(3)  # The first call gets a 429 and is retried on the next key
+    assert server.stats()[KEYS[0]]["throttled"] == 1
+    time.sleep(0.25)  # Cool-down over
+
+    before = _ok_per_key(server)
+    _chat(30, offset=3)
+    after = _ok_per_key(server)
+    served = [after[key] - before[key] for key in KEYS]
+    assert sum(served) == 30
+    assert max(served) - min(served) <= 1
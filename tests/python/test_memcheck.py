@@ -0,0 +1,22 @@
+import api.index as svc
+from domu_ai import memcheck
+from domu_ai.metrics import LATENCY_SAMPLES
+
+# KB of traced-memory growth per 1000 requests once every bounded buffer is full
+GROWTH_BUDGET_KB_PER_1K = 64.0
+MEASURED_REQUESTS = 1000
+
+
+def test_memory_is_stable_after_warmup(monkeypatch):
+    # memcheck re-initializes the service's clients for its fake model; restore them afterwards.
+    for name in ("_supabase_client", "_key_pool", "_context_cache", "_tool_pool", "_search_store",
+                 "_search_store_failed", "_shared_cache", "_shared_cache_failed"):
+        monkeypatch.setattr(svc, name, getattr(svc, name))
+    for name in ("GEMINI_BASE_URL", "GEMINI_API_KEYS", "GEMINI_API_KEY", "GOOGLE_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    assert memcheck.DEFAULT_WARMUP >= LATENCY_SAMPLES
+    report = memcheck.run(requests=memcheck.DEFAULT_WARMUP + MEASURED_REQUESTS, warmup=memcheck.DEFAULT_WARMUP,
+                          frames=1)
+    assert report["growth_kb_per_1k_requests"] <= GROWTH_BUDGET_KB_PER_1K, report["top_growth"]
+    for name, stage in report["stages"].items():
+        assert stage["max_peak_kb"] <= 4096, name
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from domu_ai import microbench
+
+
+def _result(reference_ns, **benchmarks):
+    return {
+        "reference": {"min_ns": reference_ns, "median_ns": reference_ns},
+        "benchmarks": {name: {"min_ns": ns, "median_ns": ns} for name, ns in benchmarks.items()},
+    }
+
+
+BASELINE = _result(1000.0, parse_history=2000.0, is_malicious=500.0)
+
+
+def _compare_cli(tmp_path, current, *flags):
+    baseline_path, current_path = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline_path.write_text(json.dumps(BASELINE))
+    current_path.write_text(json.dumps(current))
+    return microbench.main(["compare", str(baseline_path), "--current", str(current_path), *flags])
+
+
+def test_regression_past_the_threshold_exits_1(tmp_path, capsys):
+    current = _result(1000.0, parse_history=2600.0, is_malicious=500.0)  # +30%
+    assert _compare_cli(tmp_path, current, "--threshold", "0.15") == 1
+    report = json.loads(capsys.readouterr().out)
+    assert report["regressions"] == ["parse_history"]
+    assert report["benchmarks"]["parse_history"]["change"] == 0.3
+
+
+def test_slowdown_within_the_threshold_exits_0(tmp_path):
+    current = _result(1000.0, parse_history=2200.0, is_malicious=450.0)  # +10%, -10%
+    assert _compare_cli(tmp_path, current, "--threshold", "0.15") == 0
+
+
+def test_a_slower_host_is_not_a_regression(tmp_path):
+    current = _result(1500.0, parse_history=3000.0, is_malicious=750.0)  # Everything 1.5x, reference too
+    assert _compare_cli(tmp_path, current) == 0
+    assert _compare_cli(tmp_path, current, "--absolute") == 1
+
+
+def test_new_benchmarks_have_no_baseline():
+    report = microbench.compare(BASELINE, _result(1000.0, intake_1kb=800.0), threshold=0.15)
+    assert report["benchmarks"]["intake_1kb"] == {"current_ns": 800.0, "baseline_ns": None, "change": None}
+    assert report["regressions"] == []
+
+
+@pytest.mark.parametrize("size", [100 * 1024, 1024 * 1024])
+def test_intake_body_is_about_the_requested_size(size):
+    body = microbench._intake_body(size)
+    assert 0.8 * size < len(body) < 1.2 * size
+    assert len(json.loads(body)["history"]) == 40
+
+
+def test_run_measures_the_selected_benchmarks():
+    result = microbench.run(["is_malicious"], repeat=2)
+    assert list(result["benchmarks"]) == ["is_malicious"]
+    assert result["benchmarks"]["is_malicious"]["min_ns"] > 0
+    assert result["reference"]["repeat"] == 2
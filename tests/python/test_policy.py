@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from domu_ai import policy
+from domu_ai.policy import DEFAULT_POLICY, detect_intents, load_policy, select_policy, validate_policy
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(policy, "_cache", {"source": None, "mtime": None, "table": DEFAULT_POLICY})
+
+
+def test_default_policy_is_valid():
+    assert validate_policy(DEFAULT_POLICY) is DEFAULT_POLICY
+
+
+@pytest.mark.parametrize(
+    "rule",
+    [
+        {"class": "x", "max_output_tokens": "lots"},
+        {"class": "x", "max_output_tokens": 0},
+        {"class": "x", "thinking_budget": -1},
+        {"class": "x", "max_history": 2.5},
+        {"class": "x", "min_message_chars": True},
+        {"class": "x", "intents": "local"},
+        {"class": "x", "model": 3},
+        {"max_output_tokens": 256},
+    ],
+)
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        validate_policy([rule])
+
+
+def test_strict_load_fails_on_a_bad_override(monkeypatch):
+    monkeypatch.setenv("DOMU_GENERATION_POLICY", json.dumps([{"class": "x", "max_output_tokens": "many"}]))
+    with pytest.raises(ValueError):
+        load_policy(strict=True)
+
+
+def test_lenient_load_keeps_the_last_valid_table(monkeypatch, tmp_path):
+    path = tmp_path / "policy.json"
+    good = [{"class": "short", "max_output_tokens": 128}]
+    path.write_text(json.dumps(good))
+    monkeypatch.setenv("DOMU_GENERATION_POLICY", str(path))
+    assert load_policy() == good
+
+    path.write_text(json.dumps([{"class": "short", "max_output_tokens": "oops"}]))
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_policy() == good
+    assert select_policy("hello", 0)["max_output_tokens"] == 128
+
+
+@pytest.mark.parametrize(
+    "message, intent",
+    [
+        ("any events in utrecht this weekend?", "local"),
+        ("is there a good bar near the station", "local"),
+        ("do I need to pay tax on my student job", "legal_money"),
+        ("my landlord keeps my deposit", "legal_money"),
+        ("how do I reset my password", "platform"),
+        ("when do I get new matches", "platform"),
+        ("which NS train goes to Leiden", "local"),
+    ],
+)
+def test_keywords_detect_intents(message, intent):
+    assert intent in detect_intents(message)
+
+
+@pytest.mark.parametrize(
+    "message, intent",
+    [
+        ("how can I prevent mold in my room", "local"),
+        ("I'm embarrassed to ask my flatmate", "local"),
+        ("python syntax error help", "legal_money"),
+        ("my parents visit next month", "legal_money"),
+        ("tips for a business student", "local"),
+        ("insns and outs", "local"),
+    ],
+)
+def test_substrings_inside_words_do_not_count(message, intent):
+    assert intent not in detect_intents(message)
@@ -0,0 +1,91 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from domu_ai import profiling
+from domu_ai.profiling import PROFILE_HEADER, ProfileHook, profiled, sign, verify
+
+SECRET = "profile-secret"
+
+
+def test_fresh_signature_verifies():
+    assert verify(sign(SECRET), SECRET)
+
+
+@pytest.mark.parametrize(
+    "value, secret",
+    [
+        (sign(SECRET), "other-secret"),  # Signed with another secret
+        (sign(SECRET, now=time.time() - 600), SECRET),  # Too old
+        (sign(SECRET, now=time.time() + 600), SECRET),  # From the future
+        (sign(SECRET).split(":")[0] + ":" + "0" * 64, SECRET),  # Forged digest
+        ("not-a-stamp:abcd", SECRET),
+        ("", SECRET),
+        (sign(""), ""),  # No secret configured: nothing verifies
+    ],
+)
+def test_bad_signatures_are_rejected(value, secret):
+    assert not verify(value, secret)
+
+
+def test_signature_is_bound_to_its_timestamp():
+    stamp, digest = sign(SECRET).split(":")
+    assert not verify(f"{int(stamp) - 1}:{digest}", SECRET)
+
+
+def _app(hook):
+    app = Flask(__name__)
+
+    @app.route("/chat", methods=["POST"])
+    @profiled(hook)
+    def chat():
+        time.sleep(0.03)
+        return {"reply": "ok"}
+
+    return app.test_client()
+
+
+def _profiles(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".folded")]
+
+
+def test_only_signed_requests_are_profiled(tmp_path):
+    hook = ProfileHook(str(tmp_path), secret=SECRET, interval_s=0.002)
+    client = _app(hook)
+    assert client.post("/chat", headers={PROFILE_HEADER: sign("wrong")}).get_json() == {"reply": "ok"}
+    assert _profiles(tmp_path) == []
+
+    assert client.post("/chat", headers={PROFILE_HEADER: sign(SECRET)}).get_json() == {"reply": "ok"}
+    [name] = _profiles(tmp_path)
+    assert "_chat_" in name
+    lines = (tmp_path / name).read_text().splitlines()
+    assert any("chat (test_profiling.py" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_retention_keeps_the_newest_profiles(tmp_path):
+    hook = ProfileHook(str(tmp_path), sample_rate=1.0, keep=2, interval_s=0.002)
+    for _ in range(4):
+        hook.run("view", lambda: time.sleep(0.005))
+        time.sleep(0.01)  # Distinct mtimes
+    assert len(_profiles(tmp_path)) == 2
+
+
+def test_disabled_profiling_leaves_the_view_alone(monkeypatch):
+    monkeypatch.delenv("DOMU_PROFILE", raising=False)
+    assert ProfileHook.from_env() is None
+
+    def view():
+        return "ok"
+
+    assert profiled(None)(view) is view
+
+
+def test_sign_cli_needs_a_secret(monkeypatch, capsys):
+    monkeypatch.delenv("DOMU_PROFILE_SECRET", raising=False)
+    assert profiling.main(["sign"]) == 1
+    monkeypatch.setenv("DOMU_PROFILE_SECRET", SECRET)
+    assert profiling.main(["sign"]) == 0
+    assert verify(capsys.readouterr().out.strip(), SECRET)
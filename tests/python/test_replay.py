@@ -0,0 +1,64 @@
+import json
+import os
+import random
+
+from domu_ai import replay
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _requests_file(tmp_path, messages):
+    path = tmp_path / "requests.jsonl"
+    path.write_text("\n".join(json.dumps({"message": m}) for m in messages) + "\n")
+    return str(path)
+
+
+def test_iter_requests_reads_chat_log_rows(tmp_path):
+    path = tmp_path / "chat_log.jsonl"
+    rows = [
+        {"user_message": " How do I delete my account? ", "history": json.dumps([{"role": "user", "content": "hi"}])},
+        {"user_message": ""},
+        {"message": "hi", "history": ""},
+    ]
+    path.write_text("\n".join(json.dumps(r) for r in rows))
+    assert list(replay.iter_requests(str(path))) == [
+        {"message": "How do I delete my account?", "history": [{"role": "user", "content": "hi"}]},
+        {"message": "hi", "history": []},
+    ]
+    assert len(list(replay.iter_requests(str(path), limit=1))) == 1
+
+
+def test_reservoir_keeps_exact_totals_with_a_bounded_sample():
+    random.seed(7)
+    sample = replay._Reservoir(100)
+    for value in range(10_000):
+        sample.add(float(value))
+    assert sample.count == 10_000 and sample.total == sum(range(10_000))
+    assert len(sample.values) == 100
+    assert max(sample.values) > 5_000  # Later values make it into the sample
+
+
+def test_delta_recurses_into_nested_numbers():
+    a = {"latency_ms": {"p50": 200.0, "p95": 300.0}, "cost_usd": 0.0, "model_calls": 4}
+    b = {"latency_ms": {"p50": 150.0, "p95": None}, "cost_usd": 0.01, "model_calls": 2}
+    assert replay._delta(a, b) == {
+        "latency_ms": {"p50": {"a": 200.0, "b": 150.0, "delta": -50.0, "pct": -25.0}, "p95": None},
+        "cost_usd": {"a": 0.0, "b": 0.01, "delta": 0.01, "pct": None},
+        "model_calls": {"a": 4, "b": 2, "delta": -2, "pct": -50.0},
+    }
+
+
+def test_compare_runs_both_configs_against_the_fake_backend(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(ROOT)
+    path = _requests_file(tmp_path, ["How do I delete my account?", "I forgot my password",
+                                     "how do I contact support"])
+    assert replay.main(["compare", path, "--latency-ms", "5", "--concurrency", "2",
+                        "--a", "DOMU_FAQ_FAST_PATH=1", "--b", "DOMU_FAQ_FAST_PATH=0"]) == 0
+    result = json.loads(capsys.readouterr().out)
+
+    assert result["a"]["env"] == {"DOMU_FAQ_FAST_PATH": "1"}
+    assert result["a"]["requests"] == result["b"]["requests"] == 3
+    assert result["a"]["status_codes"] == result["b"]["status_codes"] == {"200": 3}
+    # The FAQ fast path answers these without the model; B sends all three upstream.
+    assert result["delta_b_minus_a"]["model_calls"] == {"a": 0, "b": 3, "delta": 3, "pct": None}
+    assert result["delta_b_minus_a"]["tokens_per_request"]["prompt_tokens"]["b"] > 0
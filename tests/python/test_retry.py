@@ -0,0 +1,114 @@
+import time
+
+import pytest
+
+from domu_ai.retry import RetryBudget, backoff_delay, call_with_retry, is_retryable
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def _failing(times, code=503):
+    """fn(attempt) that fails `times` times with `code`, then returns the attempt number."""
+    attempts = []
+
+    def fn(attempt):
+        attempts.append(attempt)
+        if len(attempts) <= times:
+            raise UpstreamError(code)
+        return attempt
+
+    return fn, attempts
+
+
+def _far_deadline():
+    return time.monotonic() + 60
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (UpstreamError(503), True),
+        (UpstreamError(429), True),
+        (UpstreamError(400), False),
+        (UpstreamError(401), False),
+        (TimeoutError(), True),
+        (Exception("503 UNAVAILABLE"), True),
+        (ValueError("bad input"), False),
+    ],
+)
+def test_is_retryable(exc, expected):
+    assert is_retryable(exc) is expected
+
+
+def test_retries_until_success():
+    fn, attempts = _failing(2)
+    assert call_with_retry(fn, RetryBudget(), _far_deadline(), base_s=0) == 3
+    assert attempts == [1, 2, 3]
+
+
+def test_not_retryable_errors_fail_at_once():
+    fn, attempts = _failing(1, code=400)
+    budget = RetryBudget()
+    with pytest.raises(UpstreamError):
+        call_with_retry(fn, budget, _far_deadline(), base_s=0)
+    assert attempts == [1]
+    assert budget.stats()["not_retryable"] == 1
+
+
+def test_exhausted_budget_stops_retries():
+    budget = RetryBudget(ratio=0.0, burst=1.0)
+    fn, attempts = _failing(5)
+    with pytest.raises(UpstreamError):
+        call_with_retry(fn, budget, _far_deadline(), max_attempts=5, base_s=0)
+    assert attempts == [1, 2]  # The single burst token bought one retry
+    assert budget.stats()["retries"] == 1
+    assert budget.stats()["budget_exhausted"] == 1
+
+    fn, attempts = _failing(1)
+    with pytest.raises(UpstreamError):
+        call_with_retry(fn, budget, _far_deadline(), base_s=0)
+    assert attempts == [1]
+
+
+def test_calls_refill_the_budget():
+    budget = RetryBudget(ratio=0.25, burst=2.0)
+    assert budget.try_spend() and budget.try_spend()
+    assert not budget.try_spend()
+    for _ in range(3):
+        budget.record_call()
+    assert not budget.try_spend()  # 0.75 tokens
+    budget.record_call()
+    assert budget.try_spend()  # 1.0 token
+
+
+def test_refill_is_capped_at_the_burst():
+    budget = RetryBudget(ratio=1.0, burst=2.0)
+    for _ in range(10):
+        budget.record_call()
+    assert budget.stats()["tokens"] == 2.0
+
+
+def test_no_retry_past_the_deadline():
+    budget = RetryBudget()
+    fn, attempts = _failing(5)
+    with pytest.raises(UpstreamError):
+        call_with_retry(fn, budget, time.monotonic(), base_s=1.0)
+    assert attempts == [1]
+    assert budget.stats()["deadline_exceeded"] == 1
+
+
+def test_on_retry_sees_every_retry():
+    seen = []
+    fn, _ = _failing(2)
+    call_with_retry(fn, RetryBudget(), _far_deadline(), base_s=0, on_retry=lambda e, attempt: seen.append(attempt))
+    assert seen == [1, 2]
+
+
+@pytest.mark.parametrize("attempt, ceiling", [(1, 0.25), (2, 0.5), (3, 1.0), (10, 4.0)])
+def test_backoff_is_jittered_and_capped(attempt, ceiling):
+    delays = [backoff_delay(attempt) for _ in range(50)]
+    assert all(0 <= d <= ceiling for d in delays)
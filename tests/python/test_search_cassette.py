@@ -0,0 +1,61 @@
+import pytest
+
+import api.index as svc
+from domu_ai.cassette import Cassette
+
+LIVE = [{"title": "Live result", "body": "Concerts in Delft this week.", "href": "https://example.org/live"}]
+
+
+class FakeStore:
+    """Search store that already holds an answer for every query."""
+
+    def __init__(self):
+        self.gets, self.puts = [], []
+
+    def get(self, query):
+        self.gets.append(query)
+        return [{"title": "Stored result", "body": "Older cached answer.", "href": "https://example.org/stored"}]
+
+    def put(self, query, results):
+        self.puts.append(query)
+
+
+class FakeDDGS:
+    calls = 0
+
+    def text(self, query, max_results):
+        FakeDDGS.calls += 1
+        return list(LIVE)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(svc, "_search_store", store)
+    monkeypatch.setattr(svc, "_corpus", None)
+    monkeypatch.setattr(svc, "_shared_cache", None)
+    monkeypatch.setattr(svc, "DDGS", FakeDDGS)
+    FakeDDGS.calls = 0
+    return store
+
+
+def _use_cassette(monkeypatch, cassette):
+    monkeypatch.setattr(svc, "_search_cassette", cassette)
+
+
+def test_without_a_cassette_the_store_answers(store):
+    assert svc.search_internet("events in delft")["results"][0]["title"] == "Stored result"
+    assert FakeDDGS.calls == 0
+
+
+def test_record_and_replay_bypass_the_store(store, monkeypatch, tmp_path):
+    path = str(tmp_path / "search.jsonl")
+    _use_cassette(monkeypatch, Cassette(path, "record", time_scale=0))
+    recorded = svc.search_internet("events in delft")
+    assert FakeDDGS.calls == 1
+    assert recorded["results"][0]["title"] == "Live result"
+
+    _use_cassette(monkeypatch, Cassette(path, "replay", time_scale=0))
+    assert svc.search_internet("events in delft") == recorded
+    assert FakeDDGS.calls == 1
+    assert store.gets == [] and store.puts == []
@@ -0,0 +1,66 @@
+import pytest
+
+from domu_ai.search_rank import compact_results, domain_score, truncate_to_tokens
+
+
+@pytest.mark.parametrize(
+    "href, expected",
+    [
+        ("https://www.rijksoverheid.nl/onderwerpen/huurtoeslag", 3.0),
+        ("https://housing.tudelft.nl/rooms", 2.0),  # Subdomain of a trusted domain
+        ("https://www.pinterest.com/pin/123", -2.0),
+        ("https://example.org/", 0.0),
+        ("not a url", 0.0),
+    ],
+)
+def test_domain_score(href, expected):
+    assert domain_score(href) == expected
+
+
+def test_official_sources_outrank_aggregators():
+    raw = [
+        {"title": "Huurtoeslag tips", "body": "Huurtoeslag explained by a blogger.", "href": "https://blog.example.com/a"},
+        {"title": "Huurtoeslag", "body": "Huurtoeslag rules for students.", "href": "https://www.belastingdienst.nl/huurtoeslag"},
+        {"title": "Huurtoeslag board", "body": "Pins about huurtoeslag.", "href": "https://www.pinterest.com/pin/1"},
+    ]
+    hrefs = [r["href"] for r in compact_results("huurtoeslag students", raw)]
+    assert hrefs[0] == "https://www.belastingdienst.nl/huurtoeslag"
+    assert hrefs[-1] == "https://www.pinterest.com/pin/1"
+
+
+def test_duplicate_urls_and_snippets_are_dropped():
+    body = "Student rooms in Utrecht are scarce, so register with SSH and Room.nl as early as you can."
+    raw = [
+        {"title": "Rooms Utrecht", "body": body, "href": "https://www.uu.nl/housing/"},
+        {"title": "Rooms Utrecht (copy)", "body": "Other text.", "href": "https://uu.nl/housing"},  # Same URL
+        {"title": "Mirror", "body": body + " Updated.", "href": "https://mirror.example.com/rooms"},  # Same text
+        {"title": "Different", "body": "Bike rental options in Utrecht.", "href": "https://example.org/bikes"},
+    ]
+    titles = [r["title"] for r in compact_results("rooms utrecht", raw, limit=5)]
+    assert titles == ["Rooms Utrecht", "Different"]
+
+
+def test_results_are_limited_and_trimmed():
+    raw = [
+        {"title": f"Result {i}", "body": " ".join(f"word{i}x{j}" for j in range(500)), "href": f"https://example.org/{i}"}
+        for i in range(8)
+    ]
+    compact = compact_results("word", raw, limit=3, body_tokens=20)
+    assert len(compact) == 3
+    assert all(len(r["body"]) <= 20 * 4 + 1 for r in compact)
+
+
+def test_empty_results_are_skipped():
+    assert compact_results("q", [{"title": "", "body": "", "href": "https://example.org"}, {}]) == []
+
+
+@pytest.mark.parametrize(
+    "text, tokens, expected",
+    [
+        ("Short text.", 10, "Short text."),
+        ("First sentence here. Second sentence that runs on and on.", 6, "First sentence here."),
+        ("one two three four five six seven eight nine ten", 4, "one two three…"),
+    ],
+)
+def test_truncate_to_tokens(text, tokens, expected):
+    assert truncate_to_tokens(text, tokens) == expected
@@ -0,0 +1,58 @@
+import pytest
+
+from domu_ai.search_store import SearchStore, main, normalize_terms
+
+STORED = "vegan pizza restaurant amsterdam open late sunday"
+RESULTS = [{"title": "Vegan pizza Amsterdam", "body": "Open until 1am on Sundays.", "href": "https://example.org/a"}]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SearchStore(str(tmp_path / "search.sqlite3"))
+    store.put(STORED, RESULTS)
+    return store
+
+
+def test_normalize_terms():
+    assert normalize_terms("Cheap gyms in Breda") == normalize_terms("breda cheap gym") == ["breda", "cheap", "gym"]
+
+
+def test_exact_hit_ignores_word_order_and_plurals(store):
+    assert store.get("sunday late open amsterdam restaurants pizza vegan") == RESULTS
+    assert store.stats()["exact_hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "vegan pizza restaurant amsterdam open late sunday tonight",  # One word added
+        "vegan pizza restaurant amsterdam open late",  # One word dropped
+    ],
+)
+def test_near_hit_when_words_are_only_added_or_dropped(store, query):
+    assert store.get(query) == RESULTS
+    assert store.stats()["near_hits"] == 1
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "vegan pizza restaurant rotterdam open late sunday",  # City swapped
+        "vegan sushi restaurant amsterdam open late sunday",  # Dish swapped
+        "pizza",  # Too far from the stored query
+    ],
+)
+def test_swapped_or_distant_terms_miss(store, query):
+    assert store.get(query) is None
+    assert store.stats()["misses"] == 1
+
+
+def test_expired_rows_miss(tmp_path):
+    store = SearchStore(str(tmp_path / "search.sqlite3"), ttl_s=-1)
+    store.put(STORED, RESULTS)
+    assert store.get(STORED) is None
+
+
+def test_cli_takes_the_db_before_the_command(tmp_path, capsys):
+    assert main(["--db", str(tmp_path / "bench.sqlite3"), "bench", "--rows", "200", "--lookups", "20"]) == 0
+    assert '"rows": 200' in capsys.readouterr().out
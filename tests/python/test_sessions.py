@@ -0,0 +1,49 @@
+import pytest
+
+import api.index as svc
+from domu_ai.sessions import MemorySessionStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = MemorySessionStore(max_messages=svc.MAX_HISTORY_MESSAGES)
+    monkeypatch.setattr(svc, "_session_store", store)
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", True)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    return svc.app.test_client(), store
+
+
+# Answered by the FAQ fast path, so no model call is needed
+FAQ_MESSAGE = "How do I delete my account?"
+
+
+def test_plain_message_does_not_use_the_store(client):
+    c, store = client
+    r = c.post("/chat", json={"message": FAQ_MESSAGE})
+    assert r.status_code == 200
+    assert "conversation_id" not in r.get_json()
+    assert store.stats()["sessions"] == 0
+
+
+def test_full_history_mode_does_not_use_the_store(client):
+    c, store = client
+    r = c.post("/chat", json={"message": FAQ_MESSAGE, "history": [], "session": True})
+    assert "conversation_id" not in r.get_json()
+    assert store.stats()["sessions"] == 0
+
+
+def test_opt_in_starts_a_session_and_keeps_turns(client):
+    c, store = client
+    first = c.post("/chat", json={"message": FAQ_MESSAGE, "session": True}).get_json()
+    conversation_id = first["conversation_id"]
+    assert [t["role"] for t in store.get(conversation_id)] == ["user", "assistant"]
+
+    second = c.post("/chat", json={"message": FAQ_MESSAGE, "conversation_id": conversation_id}).get_json()
+    assert second["conversation_id"] == conversation_id
+    assert len(store.get(conversation_id)) == 4
+
+
+def test_invalid_conversation_id_is_rejected(client):
+    c, _ = client
+    r = c.post("/chat", json={"message": FAQ_MESSAGE, "conversation_id": "../../etc"})
+    assert r.status_code == 400
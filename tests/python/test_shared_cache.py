@@ -0,0 +1,115 @@
+import pytest
+
+import api.index as svc
+from domu_ai.shared_cache import SharedCache
+
+
+def _cache(path):
+    return SharedCache(str(path), prompt_region=64 << 10, slot_count=8, slot_size=1 << 10)
+
+
+def test_any_worker_can_publish_and_others_read(tmp_path):
+    a, b = _cache(tmp_path / "c"), _cache(tmp_path / "c")
+    assert b.get_prompt("v1") is None
+    assert b.put_prompts("v1", {"default": "prompt v1"})
+    assert a.get_prompt("v1") == "prompt v1"
+    assert a.get_prompt("v0") is None
+
+
+def test_publishing_a_version_that_is_already_there_is_skipped(tmp_path):
+    a, b = _cache(tmp_path / "c"), _cache(tmp_path / "c")
+    assert a.put_prompts("v1", {"default": "from a"})
+    assert not b.put_prompts("v1", {"default": "from b"})
+    assert b.get_prompt("v1") == "from a"
+    assert b.stats()["prompt_write_skips"] == 1
+    assert b.put_prompts("v2", {"default": "from b"})
+    assert a.get_prompt("v2") == "from b"
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch):
+    """This process as one worker of a shared-cache deployment, with counted prompt builds."""
+    shared = _cache(tmp_path / "c")
+    builds = []
+
+    def build():
+        builds.append(key["value"])
+        return {"default": f"prompt {key['value']}"}
+
+    key = {"value": "v1"}
+    monkeypatch.setattr(svc, "_shared_cache", shared)
+    monkeypatch.setattr(svc, "_local_prompts", (None, None))
+    monkeypatch.setattr(svc, "_knowledge_key", None)
+    monkeypatch.setattr(svc, "_build_prompts", build)
+    monkeypatch.setattr(svc, "_knowledge_source_key", lambda: key["value"])
+    return shared, builds, key
+
+
+@pytest.fixture
+def reloads(monkeypatch):
+    """Modules passed to importlib.reload (without reloading them)."""
+    seen = []
+    monkeypatch.setattr(svc.importlib, "reload", lambda module: seen.append(module.__name__) or module)
+    return seen
+
+
+def test_stale_shared_copy_is_rebuilt_once_per_version_and_published(worker, tmp_path):
+    shared, builds, key = worker
+    other = _cache(tmp_path / "c")
+    other.put_prompts("v0", {"default": "old"})
+
+    assert [svc.get_combined_context() for _ in range(5)] == ["prompt v1"] * 5
+    assert builds == ["v1"]
+    assert other.get_prompt("v1") == "prompt v1"
+
+    key["value"] = "v2"
+    assert svc.get_combined_context() == "prompt v2"
+    assert builds == ["v1", "v2"]
+
+
+def test_worker_keeps_its_build_when_it_cannot_publish(worker, monkeypatch):
+    shared, builds, _ = worker
+    monkeypatch.setattr(shared, "put_prompts", lambda key, prompts: False)
+    for _ in range(3):
+        assert svc.get_combined_context() == "prompt v1"
+    assert builds == ["v1"]
+
+
+def test_adopting_a_newer_shared_version_reloads_knowledge(worker, reloads, tmp_path):
+    shared, builds, key = worker
+    assert svc.get_combined_context() == "prompt v1"
+    assert reloads == ["knowledge.data"]
+
+    key["value"] = "v2"
+    _cache(tmp_path / "c").put_prompts("v2", {"default": "published v2"})  # Another worker rebuilt first
+    assert svc.get_combined_context() == "published v2"
+    assert builds == ["v1"]
+    assert reloads == ["knowledge.data"] * 2  # FAQ and degraded answers read the new data.py too
+
+    svc.get_combined_context()
+    assert reloads == ["knowledge.data"] * 2
+
+
+def test_faq_fast_path_reloads_changed_knowledge(worker, reloads, monkeypatch):
+    _, _, key = worker
+    monkeypatch.setattr(svc, "FAQ_FAST_PATH_ENABLED", True)
+    monkeypatch.setattr(svc, "_save_to_supabase", lambda *args, **kwargs: None)
+    client = svc.app.test_client()
+    client.post("/chat", json={"message": "How do I delete my account?"})
+    key["value"] = "v2"
+    client.post("/chat", json={"message": "How do I delete my account?"})
+    assert reloads == ["knowledge.data"] * 2
+
+
+def test_artifact_built_before_fork_is_reused_without_a_shared_cache(monkeypatch):
+    builds = []
+    build = svc._build_prompts
+    monkeypatch.setattr(svc, "_build_prompts", lambda: builds.append(1) or build())
+    monkeypatch.setattr(svc, "_shared_cache", None)
+    monkeypatch.setattr(svc, "_shared_cache_failed", True)
+    monkeypatch.setattr(svc, "_local_prompts", (None, None))
+
+    prompt = svc.build_prompt_artifact()  # In the master (gunicorn when_ready)
+    assert svc.get_combined_context() == prompt
+    assert svc.get_combined_context("uva") != prompt
+    assert builds == [1]  # Workers inherit the build instead of compiling their own
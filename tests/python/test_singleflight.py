@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from domu_ai.singleflight import SingleFlight
+
+
+def _run_concurrently(flight, key, fn, followers):
+    """Start a leader, wait until it is running, then start `followers` callers for the same key."""
+    outcomes, lock = [], threading.Lock()
+
+    def call():
+        try:
+            result = ("ok", flight.do(key, fn))
+        except Exception as e:
+            result = ("error", e)
+        with lock:
+            outcomes.append(result)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    while flight.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    threads = [threading.Thread(target=call) for _ in range(followers)]
+    for t in threads:
+        t.start()
+    while flight.stats()["collapsed"] < followers:
+        time.sleep(0.001)
+    return leader, threads, outcomes
+
+
+def test_followers_share_the_leaders_result():
+    flight, release, runs = SingleFlight("test"), threading.Event(), []
+
+    def work():
+        runs.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    leader, threads, outcomes = _run_concurrently(flight, "k", work, followers=4)
+    release.set()
+    for t in [leader, *threads]:
+        t.join(5)
+    assert len(runs) == 1
+    assert len(outcomes) == 5
+    assert all(kind == "ok" for kind, _ in outcomes)
+    assert len({id(result) for _, result in outcomes}) == 1  # The very same object
+    assert flight.stats() == {"calls": 5, "executed": 1, "collapsed": 4, "in_flight": 0}
+
+
+def test_leader_exception_reaches_every_follower():
+    flight, release = SingleFlight("test"), threading.Event()
+    error = RuntimeError("upstream down")
+
+    def work():
+        release.wait(5)
+        raise error
+
+    leader, threads, outcomes = _run_concurrently(flight, "k", work, followers=3)
+    release.set()
+    for t in [leader, *threads]:
+        t.join(5)
+    assert outcomes == [("error", error)] * 4
+
+
+@pytest.mark.parametrize("fails", [False, True])
+def test_key_is_released_after_the_call(fails):
+    flight = SingleFlight("test")
+
+    def work():
+        if fails:
+            raise ValueError("boom")
+        return "first"
+
+    try:
+        flight.do("k", work)
+    except ValueError:
+        pass
+    assert flight.stats()["in_flight"] == 0
+    assert flight.do("k", lambda: "second") == "second"  # Nothing is cached
+    assert flight.stats()["executed"] == 2
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight("test")
+    assert [flight.do(k, lambda k=k: k.upper()) for k in ("a", "b")] == ["A", "B"]
+    assert flight.stats()["collapsed"] == 0
@@ -0,0 +1,74 @@
+import sys
+
+import pytest
+
+import api.index as svc
+from knowledge import tenants
+
+
+@pytest.mark.parametrize(
+    "institution, expected",
+    [
+        ("uva", "uva"),
+        ("  University   of Amsterdam ", "uva"),
+        ("Erasmus Universiteit Rotterdam (EUR)", "eur"),  # The display name
+        ("NHTV", "buas"),
+        ("avans", "avans"),
+        ("Hogeschool Utrecht", None),
+        ("", None),
+        (None, None),
+        (["uva"], None),
+    ],
+)
+def test_resolve(institution, expected):
+    assert tenants.resolve(institution) == expected
+
+
+@pytest.fixture
+def overlay_dir(tmp_path, monkeypatch):
+    """Point the package at an empty directory of overlay modules."""
+    monkeypatch.setattr(tenants, "_DIR", str(tmp_path))
+    monkeypatch.setattr(tenants, "__path__", [str(tmp_path)])
+    monkeypatch.setattr(tenants, "_loaded", {"key": None, "tenants": {}, "aliases": {}})
+    monkeypatch.setattr(tenants, "_source", {"key": None, "checked_at": 0.0})
+    monkeypatch.setattr(tenants, "SOURCE_CHECK_S", 0.0)
+    yield tmp_path
+    for name in [m for m in sys.modules if m.startswith("knowledge.tenants.") and m.split(".")[-1].startswith("t_")]:
+        del sys.modules[name]
+
+
+def _write(directory, module, notes, aliases=()):
+    (directory / f"{module}.py").write_text(f"NAME = {module.upper()!r}\nALIASES = {aliases!r}\nHOUSING_NOTES = {notes!r}\n")
+
+
+def test_overlay_over_the_cap_is_skipped(overlay_dir, capsys):
+    _write(overlay_dir, "t_small", "Short note.", ("small college",))
+    _write(overlay_dir, "t_big", "x" * (tenants.MAX_OVERLAY_CHARS + 1), ("big college",))
+    _write(overlay_dir, "t_empty", "   ")
+    assert set(tenants.get_tenants()) == {"t_small"}
+    assert "t_big is 2501 chars" in capsys.readouterr().out
+    assert tenants.resolve("small college") == "t_small"
+    assert tenants.resolve("big college") is None
+
+
+def test_overlay_at_the_cap_is_kept(overlay_dir):
+    _write(overlay_dir, "t_edge", "x" * tenants.MAX_OVERLAY_CHARS)
+    assert set(tenants.get_tenants()) == {"t_edge"}
+
+
+def test_edited_overlays_are_picked_up(overlay_dir):
+    _write(overlay_dir, "t_school", "First version.", ("school",))
+    assert tenants.get_tenants()["t_school"]["notes"] == "First version."
+    _write(overlay_dir, "t_school", "Second, longer version.", ("school", "the school"))
+    assert tenants.get_tenants()["t_school"]["notes"] == "Second, longer version."
+    assert tenants.resolve("the school") == "t_school"
+
+
+def test_each_prompt_carries_only_its_own_overlay():
+    uva = svc.get_combined_context("uva")
+    eur = svc.get_combined_context("eur")
+    default = svc.get_combined_context()
+    assert tenants.get_tenants()["uva"]["name"] in uva and tenants.get_tenants()["eur"]["name"] not in uva
+    assert "INSTITUTION-SPECIFIC NOTES" not in default
+    assert len(uva) - len(default) <= tenants.MAX_OVERLAY_CHARS + 500
+    assert svc.get_combined_context("unknown-tenant") == default
@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+import api.index as svc
+from domu_ai.usage import tool_output_chars
+
+
+def _call(query):
+    return types.FunctionCall(name="search_internet", args={"query": query})
+
+
+class FakeClient:
+    """Answers with the queued function calls first, then with plain text."""
+
+    def __init__(self, rounds):
+        self.rounds = list(rounds)
+        self.models = self
+
+    def generate_content(self, model, contents, config):
+        calls = self.rounds.pop(0) if self.rounds else []
+        parts = [types.Part(function_call=c) for c in calls] or [types.Part(text="done")]
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=100 * len(contents), candidates_token_count=10,
+            ),
+        )
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    seen = []
+
+    def fake_search(query, timeout_s=svc.SEARCH_TOOL_TIMEOUT_S):
+        seen.append((query, timeout_s))
+        return {"results": [{"title": query}]}
+
+    monkeypatch.setattr(svc, "search_internet", fake_search)
+    return seen
+
+
+def test_tool_turns_are_returned_not_attached(searches):
+    contents = [types.Content(role="user", parts=[types.Part(text="hi")])]
+    client = FakeClient([[_call("rent in delft")]])
+    response, tool_turns, _ = svc._generate_with_tools(client, "m", contents, types.GenerateContentConfig())
+    assert response.text == "done"
+    assert not response.automatic_function_calling_history
+    assert len(tool_turns) == 2  # the model's call and our response
+    assert len(contents) == 1
+    assert tool_output_chars(tool_turns) > 0
+    assert searches[0][0] == "rent in delft"
+
+
+def test_no_tool_calls_means_no_tool_turns(searches):
+    contents = [types.Content(role="user", parts=[types.Part(text="hi")])]
+    _, tool_turns, usage = svc._generate_with_tools(FakeClient([]), "m", contents, types.GenerateContentConfig())
+    assert tool_turns == []
+    assert tool_output_chars(tool_turns) == 0
+    assert usage["prompt_tokens"] == 100 and usage["output_tokens"] == 10
+
+
+def test_usage_adds_up_every_model_round(searches):
+    contents = [types.Content(role="user", parts=[types.Part(text="hi")])]
+    client = FakeClient([[_call("a")], [_call("b")]])
+    _, _, usage = svc._generate_with_tools(client, "m", contents, types.GenerateContentConfig())
+    # Three calls with 1, 3 and 5 contents in the prompt
+    assert usage["prompt_tokens"] == 100 + 300 + 500
+    assert usage["output_tokens"] == 30
+
+
+def test_tool_calls_get_the_remaining_budget(searches):
+    svc._run_tool_calls([_call("a")], 5.0)
+    assert 0 < searches[0][1] <= 5.0
+
+
+def test_queued_tool_calls_are_cancelled_after_the_budget(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def stuck_search(query, timeout_s=svc.SEARCH_TOOL_TIMEOUT_S):
+        started.append(query)
+        release.wait(5)
+        return {"results": []}
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(svc, "_tool_pool", pool)
+    monkeypatch.setattr(svc, "search_internet", stuck_search)
+    try:
+        results = svc._run_tool_calls([_call("first"), _call("second")], 0.2)
+        release.set()
+        pool.shutdown(wait=True)
+    finally:
+        release.set()
+    assert results == [{"error": "Tool timed out", "results": []}] * 2
+    assert started == ["first"]  # The queued call never ran
+
+
+def test_a_call_that_starts_past_the_deadline_does_not_run(searches):
+    assert svc._call_tool(_call("late"), time.monotonic() - 1) == {"error": "Tool timed out", "results": []}
+    assert searches == []
+
+
+def test_unknown_tool():
+    result = svc._call_tool(SimpleNamespace(name="nope", args={}), time.monotonic() + 1)
+    assert result == {"error": "Unknown tool nope"}
@@ -0,0 +1,89 @@
+import contextvars
+import json
+import threading
+
+from google.genai import types
+
+import api.index as svc
+from domu_ai import perf_report
+from domu_ai import trace as request_trace
+
+
+def _in_new_context(fn):
+    """Run fn with a fresh trace, without leaking it into the other tests."""
+    return contextvars.copy_context().run(lambda: fn(request_trace.start()))
+
+
+def test_search_tool_records_into_the_request_trace_from_the_pool(monkeypatch):
+    threads = []
+
+    def fake_search(query, trace, timeout_s):
+        threads.append(threading.current_thread().name)
+        trace.bump("search_misses")
+        return {"results": []}
+
+    monkeypatch.setattr(svc, "_search_internet", fake_search)
+    calls = [types.FunctionCall(name="search_internet", args={"query": q}) for q in ("rent", "bikes")]
+
+    def run(trace):
+        svc._run_tool_calls(calls, 5.0)
+        return trace.as_row()
+
+    row = _in_new_context(run)
+    assert all(name.startswith("domu-tool") for name in threads)
+    assert row["tool_calls"] == 2
+    assert row["cache_flags"] == {"search_misses": 2}
+    assert "search" in row["stage_ms"]
+
+
+def test_without_a_trace_the_tool_still_runs(monkeypatch):
+    seen = []
+    monkeypatch.setattr(svc, "_search_internet", lambda query, trace, timeout_s: seen.append(trace) or {"results": []})
+    contextvars.Context().run(svc.search_internet, "rent")  # Empty context: no request trace
+    assert seen == [None]
+
+
+def test_repeated_stages_add_up():
+    def run(trace):
+        trace.add_ms("search", 10.0)
+        trace.add_ms("search", 5.5)
+        trace.tool_round()
+        return trace.as_row()
+
+    row = _in_new_context(run)
+    assert row["stage_ms"] == {"search": 15.5}
+    assert row["tool_rounds"] == 1
+
+
+def _row(day, request_class, total_ms, **extra):
+    return {"created_at": f"{day}T12:00:00+00:00", "request_class": request_class, "total_ms": total_ms, **extra}
+
+
+def test_daily_aggregates_per_day_and_class():
+    rows = [
+        _row("2026-10-01", "chat", 1000, stage_ms={"model": 800, "search": 150}, tool_rounds=1,
+             cache_flags={"prompt_shared": True, "search_misses": 1, "tool_cap": "calls"}, tool_calls=3),
+        _row("2026-10-01", "chat", 3000, stage_ms=json.dumps({"model": 2500}), tool_rounds=0, status="timeout",
+             cache_flags=json.dumps({"prompt_shared": False, "search_store_hits": 1})),
+        _row("2026-10-01", "faq", 20),
+        {"created_at": "2026-10-01", "request_class": "chat", "total_ms": None},  # No perf fields
+    ]
+    by_class = {r["request_class"]: r for r in perf_report.daily(rows)}
+    chat = by_class["chat"]
+    assert chat["requests"] == 2
+    assert chat["failure_rate"] == 0.5
+    assert chat["prompt_shared_rate"] == 0.5
+    assert chat["search_hit_rate"] == 0.5
+    assert chat["avg_tool_calls"] == 1.5
+    assert chat["tool_cap_rate"] == 0.5
+    assert by_class["faq"]["model_p50_ms"] is None
+
+
+def test_slowest_ranks_classes_by_p95():
+    rows = perf_report.daily([
+        _row("2026-10-02", "faq", 30), _row("2026-10-02", "chat", 2000), _row("2026-10-02", "digest", 400),
+        _row("2026-10-01", "chat", 900),
+    ])
+    ranked = perf_report.slowest(rows, top=2)
+    assert list(ranked) == ["2026-10-02", "2026-10-01"]
+    assert [r["request_class"] for r in ranked["2026-10-02"]] == ["chat", "digest"]
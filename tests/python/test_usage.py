@@ -0,0 +1,92 @@
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from domu_ai import usage as usage_mod
+from domu_ai.usage import UsageTotals, estimate_cost_usd, prompt_split, read_rows, report, usage_from_response
+
+
+def test_missing_usage_fields_count_as_zero():
+    response = SimpleNamespace(usage_metadata=SimpleNamespace(prompt_token_count=120, candidates_token_count=None))
+    assert usage_from_response(response) == {
+        "prompt_tokens": 120, "cached_tokens": 0, "output_tokens": 0, "thinking_tokens": 0, "tool_tokens": 0,
+    }
+    assert usage_from_response(SimpleNamespace())["prompt_tokens"] == 0
+
+
+def test_cost_bills_cached_tokens_at_the_cached_price():
+    usage = {"prompt_tokens": 1_000_000, "cached_tokens": 400_000, "output_tokens": 100_000, "thinking_tokens": 100_000}
+    # 600k uncached at 0.30, 400k cached at 0.075, 200k output (incl. thinking) at 2.50
+    assert estimate_cost_usd("gemini-2.5-flash", usage) == pytest.approx(0.18 + 0.03 + 0.5)
+
+
+def test_unknown_model_has_no_cost():
+    assert estimate_cost_usd("some-other-model", {"prompt_tokens": 10}) is None
+
+
+def test_price_override_from_env(monkeypatch):
+    monkeypatch.setattr(usage_mod, "_prices", None)
+    monkeypatch.setenv("DOMU_MODEL_PRICES", json.dumps({"house-model": {"input": 1.0, "output": 2.0}}))
+    assert estimate_cost_usd("house-model", {"prompt_tokens": 1_000_000, "cached_tokens": 500_000}) == 1.0
+    assert estimate_cost_usd("gemini-2.5-flash", {"prompt_tokens": 1_000_000}) == 0.3
+
+
+def test_prompt_split_scales_to_reported_tokens():
+    assert prompt_split(3000, 600, 200, 200, prompt_tokens=1000) == {
+        "system": 750, "history": 150, "message": 50, "tool": 50,
+    }
+    assert prompt_split(400, 0, 40, 0) == {"system": 100, "history": 0, "message": 10, "tool": 0}
+
+
+def test_totals_snapshot_has_shares():
+    totals = UsageTotals()
+    totals.record("m", {"prompt_tokens": 100, "output_tokens": 10}, 0.5, {"system": 75, "message": 25})
+    totals.record("m", {"prompt_tokens": 50}, None, {"system": 25, "message": 25})
+    snap = totals.snapshot()
+    assert snap["models"]["m"]["requests"] == 2
+    assert snap["models"]["m"]["prompt_tokens"] == 150
+    assert snap["models"]["m"]["cost_usd"] == 0.5
+    assert snap["prompt_split"]["system"] == {"tokens": 100, "share": 0.667}
+    assert snap["prompt_split"]["tool"] == {"tokens": 0, "share": 0.0}
+
+
+ROWS = [
+    {"model": "gemini-2.5-flash", "prompt_tokens": 200, "output_tokens": 20, "cost_usd": 0.001,
+     "token_split": {"system": 150, "history": 0, "message": 20, "tool": 30}},
+    {"model": "gemini-2.5-flash", "prompt_tokens": 100, "output_tokens": 10, "cost_usd": 0.0005,
+     "token_split": {"system": 50, "history": 30, "message": 20, "tool": 0}},
+    {"model": None, "prompt_tokens": None, "user_message": "faq hit"},
+]
+
+
+def test_report_over_jsonl(tmp_path):
+    path = tmp_path / "chat_log.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in ROWS) + "\n\n")
+    result = report(read_rows(str(path)))
+    flash = result["models"]["gemini-2.5-flash"]
+    assert (flash["requests"], flash["prompt_tokens"], flash["cost_usd"]) == (2, 300, 0.0015)
+    assert result["prompt_split"]["system"]["tokens"] == 200
+    assert result["rows_without_usage"] == 1
+
+
+def test_report_over_csv_matches_jsonl(tmp_path):
+    path = tmp_path / "chat_log.csv"
+    fields = ["model", "prompt_tokens", "output_tokens", "cost_usd", "token_split"]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        for row in ROWS:
+            writer.writerow({**row, "token_split": json.dumps(row["token_split"]) if "token_split" in row else ""})
+    result = report(read_rows(str(path)))
+    assert result["models"]["gemini-2.5-flash"]["prompt_tokens"] == 300
+    assert result["prompt_split"]["history"]["tokens"] == 30
+    assert result["rows_without_usage"] == 1
+
+
+def test_report_cli_prints_json(tmp_path, capsys):
+    path = tmp_path / "chat_log.jsonl"
+    path.write_text(json.dumps(ROWS[0]))
+    assert usage_mod.main(["report", str(path)]) == 0
+    assert json.loads(capsys.readouterr().out)["models"]["gemini-2.5-flash"]["output_tokens"] == 20